@@ -0,0 +1,218 @@
+"""
+anomaly.py — streaming detector for suspicious submissions.
+
+Detector.observe() takes answers one at a time, in id order, and keeps only
+compact windowed state:
+
+  • per question: exponentially weighted mean / variance of log(answer time)
+  • per student: their last `sequence_length` answers, a weighted accuracy
+    and the current run of correct answers
+  • per question: how often each option has been chosen
+  • per shared answer pattern: which students produced it in the last
+    `sequence_window` seconds
+
+It returns alerts of these kinds:
+
+  fast_solve       the answer was already flagged is_suspicious (correct in < 2 s)
+  time_outlier     correct, and far faster than this question's own times
+                   (z-score of log time below -time_z)
+  shared_sequence  `sequence_students` or more students gave identical options
+                   to the same `sequence_length` questions, at least one of them
+                   wrong, within the window, and that many matches are unlikely
+                   by chance given how popular each option is (Poisson tail
+                   below sequence_p)
+  streak           a run of correct answers that the student's accuracy before
+                   the run makes improbable (p ** run < streak_p)
+
+Answers without a timestamp (legacy rows) are outside every window: they
+never join a shared_sequence pattern but still count for the other kinds.
+
+Nothing here touches the database. app.py feeds it new Answer rows from a
+scheduled task and stores the alerts in the anomaly_alert table. `observed`
+holds the ids seen so far, so that answers committed after a higher id was
+scanned can be fed in late without counting anything twice; app.py prunes it.
+"""
+
+import math
+from collections import Counter, deque, namedtuple
+
+Event = namedtuple('Event', 'answer_id student_id question_id option is_correct time_taken at suspicious expired')
+
+KIND_LABELS = {
+    'fast_solve': 'Fast solve',
+    'time_outlier': 'Unusual answer time',
+    'shared_sequence': 'Shared answers',
+    'streak': 'Improbable streak',
+}
+
+
+class _Student:
+    __slots__ = ('recent', 'n', 'acc', 'streak', 'base_acc', 'base_n', 'flagged')
+
+    def __init__(self, sequence_length):
+        self.recent = deque(maxlen=sequence_length)  # (question_id, option, is_correct)
+        self.n = 0
+        self.acc = 0.5
+        self.streak = 0
+        self.base_acc = 0.5
+        self.base_n = 0
+        self.flagged = False
+
+
+class Detector:
+    def __init__(self, time_z=3.0, min_samples=20, alpha=0.05, min_log_sd=0.25,
+                 sequence_length=4, sequence_window=900, sequence_students=3, sequence_p=0.001,
+                 streak_min=6, streak_p=0.001, min_history=10):
+        self.time_z = time_z
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.min_log_sd = min_log_sd
+        self.sequence_length = sequence_length
+        self.sequence_window = sequence_window
+        self.sequence_students = sequence_students
+        self.sequence_p = sequence_p
+        self.streak_min = streak_min
+        self.streak_p = streak_p
+        self.min_history = min_history
+
+        self.questions = {}   # question_id -> [n, mean, var] of log1p(seconds)
+        self.options = {}     # question_id -> Counter of options chosen
+        self.students = {}    # student_id -> _Student
+        self.sequences = {}   # pattern -> ({student_id: last seen}, {flagged student_ids})
+        self.cursor = 0       # highest answer id observed
+        self.observed = set()  # answer ids observed (app.py keeps only the recent ones)
+        self._since_sweep = 0
+
+    def observe(self, e):
+        """Update the state with one answer and return the alerts it raises (a list of dicts)."""
+        self.cursor = max(self.cursor, e.answer_id)
+        self.observed.add(e.answer_id)
+        if e.expired:
+            return []
+        alerts = []
+        if e.suspicious:
+            alerts.append(self._alert('fast_solve', e, float(e.time_taken or 0),
+                                      f"Extremely fast solve: {e.time_taken}s for Question #{e.question_id}"))
+        alerts += self._time(e)
+        alerts += self._sequence(e)
+        alerts += self._streak(e)
+        return alerts
+
+    @staticmethod
+    def _alert(kind, e, score, message, student_id=None, details=None):
+        return {'kind': kind, 'student_id': e.student_id if student_id is None else student_id,
+                'question_id': e.question_id, 'answer_id': e.answer_id, 'at': e.at,
+                'score': round(score, 4), 'message': message[:255], 'details': details}
+
+    def _ew_weight(self, n):
+        # Plain running average until there are 1/alpha samples, then a fixed window
+        return max(self.alpha, 1.0 / n)
+
+    def _time(self, e):
+        if not e.time_taken or e.time_taken <= 0:
+            return []  # answered without a timed start
+        x = math.log1p(e.time_taken)
+        stats = self.questions.setdefault(e.question_id, [0, 0.0, 0.0])
+        n, mean, var = stats
+        alerts = []
+        if e.is_correct and n >= self.min_samples:
+            z = (x - mean) / max(math.sqrt(var), self.min_log_sd)
+            if z < -self.time_z:
+                alerts.append(self._alert(
+                    'time_outlier', e, z,
+                    f"Solved Question #{e.question_id} in {e.time_taken}s; "
+                    f"typical is {math.expm1(mean):.0f}s (z = {z:.1f})"))
+        n += 1
+        a = self._ew_weight(n)
+        d = x - mean
+        mean += a * d
+        var = (1 - a) * (var + a * d * d)
+        stats[:] = [n, mean, var]
+        return alerts
+
+    def _chance(self, pattern, matches):
+        """P(at least `matches` students share `pattern` by chance) — Poisson tail.
+
+        Option popularity is estimated leaving out all but one of the matching
+        students, so a group copying a rare answer cannot make it look common.
+        """
+        p, n = 1.0, None
+        for qid, option in pattern:
+            counts = self.options[qid]
+            total = sum(counts.values())
+            others = max(counts[option] - (matches - 1), 0)
+            p *= (others + 1) / (max(total - (matches - 1), 0) + len(counts))  # add-one smoothing
+            n = total if n is None else min(n, total)
+        if n < self.min_samples:
+            return 1.0  # too few answers yet to tell a rare option from a common one
+        lam = n * p
+        below = sum(math.exp(-lam) * lam ** i / math.factorial(i) for i in range(matches))
+        return max(0.0, 1.0 - below)
+
+    def _sequence(self, e):
+        if e.at is None:
+            return []  # no time, so in no window
+        self.options.setdefault(e.question_id, Counter())[e.option] += 1
+        st = self._student(e.student_id)
+        st.recent.append((e.question_id, e.option, bool(e.is_correct)))
+        latest = {}
+        for qid, option, correct in st.recent:  # a re-attempt replaces the earlier answer
+            latest[qid] = (option, correct)
+        if len(latest) < self.sequence_length or all(c for _, c in latest.values()):
+            return []  # everyone who is right looks alike; shared wrong answers are the signal
+
+        self._since_sweep += 1
+        if self._since_sweep >= 1000:
+            self._sweep(e.at)
+        pattern = tuple(sorted((qid, option) for qid, (option, _) in latest.items()))
+        seen, flagged = self.sequences.setdefault(pattern, ({}, set()))
+        for sid, at in list(seen.items()):
+            if (e.at - at).total_seconds() > self.sequence_window:
+                del seen[sid]
+        seen[e.student_id] = e.at
+        if len(seen) < self.sequence_students or not set(seen) - flagged:
+            return []
+        chance = self._chance(pattern, len(seen))
+        if chance >= self.sequence_p:
+            return []
+        questions = ', '.join(f"#{qid}" for qid, _ in pattern)
+        alerts = []
+        for sid in sorted(set(seen) - flagged):
+            flagged.add(sid)
+            alerts.append(self._alert(
+                'shared_sequence', e, chance,
+                f"Same answers as {len(seen) - 1} other students on Questions {questions} "
+                f"(chance {chance:.1e})",
+                student_id=sid, details={'students': sorted(seen), 'pattern': [list(p) for p in pattern]}))
+        return alerts
+
+    def _sweep(self, now):
+        """Drop answer patterns nobody has produced within the window."""
+        self._since_sweep = 0
+        for pattern in [p for p, (seen, _) in self.sequences.items()
+                        if all((now - at).total_seconds() > self.sequence_window for at in seen.values())]:
+            del self.sequences[pattern]
+
+    def _student(self, student_id):
+        return self.students.setdefault(student_id, _Student(self.sequence_length))
+
+    def _streak(self, e):
+        st = self._student(e.student_id)
+        alerts = []
+        if e.is_correct:
+            if st.streak == 0:
+                st.base_acc, st.base_n = st.acc, st.n  # judge the run against the accuracy before it
+            st.streak += 1
+            p = min(max(st.base_acc, 0.05), 0.95) ** st.streak
+            if (not st.flagged and st.streak >= self.streak_min and st.base_n >= self.min_history
+                    and p < self.streak_p):
+                st.flagged = True
+                alerts.append(self._alert(
+                    'streak', e, p,
+                    f"{st.streak} correct in a row; unlikely at their usual {st.base_acc:.0%} accuracy"))
+        else:
+            st.streak = 0
+            st.flagged = False
+        st.n += 1
+        st.acc += self._ew_weight(st.n) * ((1.0 if e.is_correct else 0.0) - st.acc)
+        return alerts
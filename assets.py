@@ -0,0 +1,62 @@
+"""
+assets.py — fingerprinted URLs and long-lived caching for static files.
+
+Templates call static_url('css/style.css') instead of
+url_for('static', filename=...). It returns
+/static/css/style.css?v=<hash of the file's content>, so the URL changes
+whenever the file does.
+
+A static request whose ?v= matches the file's current hash is sent with
+Cache-Control: public, max-age=31536000, immutable, and browsers never ask
+for it again. Any other static request (no ?v=, or a stale one) keeps
+Flask's default and revalidates with the ETag.
+
+Hashes are cached per (path, size, mtime), so editing a file in development
+changes its URL on the next render, and production pays one os.stat() per
+URL.
+"""
+
+import hashlib
+import os
+
+from flask import current_app, request, url_for
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_hashes = {}  # path -> (size, mtime_ns, digest)
+
+
+def fingerprint(filename):
+    """Short content hash of a file in the static folder, or None if it does not exist."""
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cached = _hashes.get(path)
+    if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+        return cached[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    _hashes[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+
+def static_url(filename):
+    digest = fingerprint(filename)
+    return url_for('static', filename=filename, v=digest) if digest else url_for('static', filename=filename)
+
+
+def _cache_headers(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        v = request.args.get('v')
+        if v and v == fingerprint((request.view_args or {}).get('filename', '')):
+            response.headers['Cache-Control'] = IMMUTABLE
+            response.expires = None
+    return response
+
+
+def init_app(app):
+    """Expose static_url() to templates and mark fingerprinted static responses immutable."""
+    app.jinja_env.globals['static_url'] = static_url
+    app.after_request(_cache_headers)
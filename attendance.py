@@ -0,0 +1,104 @@
+"""
+attendance.py — online-time intervals and their weekly / monthly rollups.
+
+A student's time online is stored as intervals (started_at, ended_at): a
+login or heartbeat extends the latest interval when it ended at most `gap`
+seconds ago, otherwise it opens a new one. One row per continuous session
+replaces one counter per day, and minutes are never lost to rounding.
+
+From the intervals of one student this module computes, per period:
+
+  days_present    days touched by at least one interval (a login alone counts)
+  minutes         time covered by the merged intervals, split at midnight
+  longest_streak  longest run of consecutive days present within the period
+  last_present    the latest day present
+
+Periods are ISO weeks (starting Monday) and calendar months. Nothing here
+touches the database; app.py feeds it AttendanceSession rows and stores the
+results in the attendance_rollup table.
+"""
+
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+PERIODS = ('week', 'month')
+
+Summary = namedtuple('Summary', 'days_present minutes longest_streak last_present')
+
+
+def merge(intervals, gap=0):
+    """Sorted, non-overlapping intervals; ones at most `gap` seconds apart are joined."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and (start - merged[-1][1]).total_seconds() <= gap:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def seconds_per_day(intervals):
+    """{date: seconds online} over merged `intervals`, split at midnight."""
+    days = {}
+    for start, end in merge(intervals):
+        day = start.date()
+        while True:
+            midnight = datetime.combine(day + timedelta(days=1), time.min)
+            days[day] = days.get(day, 0) + (min(end, midnight) - start).total_seconds()
+            if end <= midnight:
+                break
+            day, start = day + timedelta(days=1), midnight
+    return days
+
+
+def period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown period: {period}")
+
+
+def period_end(start, period):
+    """First day of the next period."""
+    if period == 'week':
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def periods_touched(start, end):
+    """(period, period_start) of every week and month the interval start–end overlaps."""
+    touched = set()
+    for period in PERIODS:
+        first = period_start(start.date(), period)
+        while first <= end.date():
+            touched.add((period, first))
+            first = period_end(first, period)
+    return touched
+
+
+def longest_run(days):
+    """Longest run of consecutive dates in `days`."""
+    best = run = 0
+    previous = None
+    for day in sorted(days):
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        best = max(best, run)
+        previous = day
+    return best
+
+
+def summarize(days):
+    """Summary of `days` ({date: seconds}, see seconds_per_day)."""
+    return Summary(days_present=len(days), minutes=int(sum(days.values()) // 60),
+                   longest_streak=longest_run(days), last_present=max(days) if days else None)
+
+
+def rollups(intervals, keys=None):
+    """{(period, period_start): Summary} for `keys`, or for every period the intervals touch."""
+    grouped = {}
+    for day, seconds in seconds_per_day(intervals).items():
+        for period in PERIODS:
+            grouped.setdefault((period, period_start(day, period)), {})[day] = seconds
+    return {key: summarize(grouped.get(key, {})) for key in (grouped if keys is None else keys)}
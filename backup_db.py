@@ -5,46 +5,720 @@ Run this BEFORE every deployment or code update:
 
     python backup_db.py
 
-Creates a timestamped copy of the database in the /backups folder.
-Safe to run while the app is stopped. Never deletes existing data.
+Creates a timestamped, gzip-compressed snapshot in the /backups folder.
+Safe to run while the app is serving requests. Never deletes existing data.
+
+SQLite snapshots use the online backup API, copying BACKUP_STEP_PAGES pages
+per step and sleeping BACKUP_STEP_SLEEP_MS between steps so live requests
+keep their I/O. In WAL mode the copy runs inside one read transaction, so
+it is a consistent snapshot and writers are never blocked. MariaDB/MySQL
+is dumped with `mysqldump --single-transaction`, streamed through gzip.
+
+Other commands:
+
+    python backup_db.py list
+    python backup_db.py verify backups/aptipro_20260301_101500.db.gz
+    python backup_db.py restore backups/aptipro_20260301_101500.db.gz [--force]
+    python backup_db.py ship-wal                  # continuous WAL shipping (SQLite)
+    python backup_db.py restore backups/wal/<generation> --until "2026-03-01 10:15"
+
+WAL shipping copies every committed WAL frame into backups/wal/<generation>/
+every BACKUP_WAL_INTERVAL seconds, on top of a base snapshot. A restore
+replays the frames up to --until (point-in-time). A new generation (fresh
+base snapshot) starts every BACKUP_WAL_GENERATION_HOURS, or whenever
+frames might have been checkpointed away before they were shipped.
+
+Every restore is checked before it is installed: checksums from the
+manifest, `PRAGMA integrity_check`, and for WAL replay that SQLite accepted
+every shipped frame. The database it replaces is kept as
+<db>.pre-restore-<timestamp>. Stop the app before restoring.
 """
 
+import argparse
+import gzip
+import hashlib
+import json
 import os
 import shutil
+import sqlite3
+import struct
+import subprocess
+import sys
+import time
 from datetime import datetime
+from urllib.parse import unquote, urlparse
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
 
 # ── Paths ────────────────────────────────────────────────────────────────────
 BASE_DIR    = os.path.dirname(os.path.abspath(__file__))
 DB_PATH     = os.path.join(BASE_DIR, "instance", "aptipro.db")
-BACKUP_DIR  = os.path.join(BASE_DIR, "backups")
+BACKUP_DIR  = os.environ.get("BACKUP_DIR") or os.path.join(BASE_DIR, "backups")
+WAL_DIR     = os.path.join(BACKUP_DIR, "wal")
+# ── Tuning ───────────────────────────────────────────────────────────────────
+KEEP_SNAPSHOTS      = int(os.environ.get("BACKUP_KEEP", 10))
+STEP_PAGES          = int(os.environ.get("BACKUP_STEP_PAGES", 256))
+STEP_SLEEP_MS       = float(os.environ.get("BACKUP_STEP_SLEEP_MS", 10))
+WAL_INTERVAL        = float(os.environ.get("BACKUP_WAL_INTERVAL", 1))
+WAL_RESTART_BYTES   = int(os.environ.get("BACKUP_WAL_RESTART_BYTES", 4 * 1024 * 1024))
+WAL_GENERATION_HOURS = float(os.environ.get("BACKUP_WAL_GENERATION_HOURS", 24))
+KEEP_GENERATIONS    = int(os.environ.get("BACKUP_WAL_GENERATIONS", 2))
+CHUNK               = 1024 * 1024
 # ─────────────────────────────────────────────────────────────────────────────
 
-def backup():
-    if not os.path.exists(DB_PATH):
-        print(f"[BACKUP] No database found at {DB_PATH}. Nothing to back up.")
-        return
 
-    os.makedirs(BACKUP_DIR, exist_ok=True)
+def database_target(url=None):
+    """('sqlite', path) | ('mysql', parsed url) | ('postgresql', parsed url) for DATABASE_URL."""
+    url = url if url is not None else os.environ.get("DATABASE_URL")
+    if not url:
+        return "sqlite", DB_PATH
+    if url.startswith("sqlite:///"):
+        return "sqlite", url[len("sqlite:///"):]
+    parsed = urlparse(url)
+    if parsed.scheme.split("+")[0] in ("mariadb", "mysql"):
+        return "mysql", parsed
+    return "postgresql", parsed
+
+
+def _stamp():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def _gzip_file(src, dst):
+    """Compress src → dst; returns the sha256 of the uncompressed bytes."""
+    h = hashlib.sha256()
+    with open(src, "rb") as fin, gzip.open(dst + ".part", "wb", compresslevel=6) as fout:
+        for block in iter(lambda: fin.read(CHUNK), b""):
+            h.update(block)
+            fout.write(block)
+    os.replace(dst + ".part", dst)
+    return h.hexdigest()
 
-    timestamp   = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"aptipro_{timestamp}.db"
-    backup_path = os.path.join(BACKUP_DIR, backup_name)
 
-    shutil.copy2(DB_PATH, backup_path)
-    size_kb = os.path.getsize(backup_path) // 1024
+def _gunzip_file(src, dst):
+    h = hashlib.sha256()
+    with gzip.open(src, "rb") as fin, open(dst, "wb") as fout:
+        for block in iter(lambda: fin.read(CHUNK), b""):
+            h.update(block)
+            fout.write(block)
+    return h.hexdigest()
+
+
+def _write_manifest(path, manifest):
+    with open(path + ".json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _read_manifest(path):
+    with open(path + ".json") as f:
+        return json.load(f)
+
+
+def _integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise RuntimeError(f"integrity_check failed for {path}: {result}")
+    return pages
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SNAPSHOTS
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _copy_sqlite(db_path, dest):
+    """Paced online copy of db_path into the plain file dest; returns the WAL salt seen during the copy."""
+    src = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    dst = sqlite3.connect(dest)
+    try:
+        wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        salt = None
+        if wal:
+            # One read transaction for the whole copy: a consistent snapshot that
+            # never restarts when other connections commit, and never blocks them.
+            src.execute("BEGIN")
+            src.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            salt = _wal_salt(db_path)
+        src.backup(dst, pages=STEP_PAGES, sleep=STEP_SLEEP_MS / 1000.0)
+        if wal:
+            src.execute("COMMIT")
+        return salt
+    finally:
+        dst.close()
+        src.close()
+
+
+def snapshot_sqlite(db_path, dest_dir=BACKUP_DIR, name=None):
+    os.makedirs(dest_dir, exist_ok=True)
+    name = name or f"aptipro_{_stamp()}.db.gz"
+    final = os.path.join(dest_dir, name)
+    tmp = final + ".tmp.db"
+    t0 = time.perf_counter()
+    try:
+        salt = _copy_sqlite(db_path, tmp)
+        pages = _integrity_check(tmp)
+        raw_size = os.path.getsize(tmp)
+        sha = _gzip_file(tmp, final)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    manifest = {
+        "kind": "sqlite",
+        "source": db_path,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "sha256": sha,
+        "size": raw_size,
+        "compressed_size": os.path.getsize(final),
+        "page_count": pages,
+        "wal_salt": salt,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+    _write_manifest(final, manifest)
+    return final, manifest
+
+
+def snapshot_mysql(url, dest_dir=BACKUP_DIR):
+    """Stream `mysqldump --single-transaction` through gzip (consistent for InnoDB, no table locks)."""
+    os.makedirs(dest_dir, exist_ok=True)
+    final = os.path.join(dest_dir, f"aptipro_{_stamp()}.sql.gz")
+    cmd = ["mysqldump", "--single-transaction", "--quick", "--routines", "--triggers",
+           "--hex-blob", "-h", url.hostname or "localhost", "-P", str(url.port or 3306),
+           "-u", unquote(url.username or ""), url.path.lstrip("/")]
+    env = dict(os.environ, MYSQL_PWD=unquote(url.password or ""))
+    t0 = time.perf_counter()
+    h = hashlib.sha256()
+    tail = b""
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    with gzip.open(final + ".part", "wb", compresslevel=6) as out:
+        for block in iter(lambda: proc.stdout.read(CHUNK), b""):
+            h.update(block)
+            out.write(block)
+            tail = (tail + block)[-4096:]
+    err = proc.stderr.read().decode(errors="replace")
+    if proc.wait() != 0 or b"-- Dump completed" not in tail:
+        os.remove(final + ".part")
+        raise RuntimeError(f"mysqldump failed: {err.strip() or 'dump incomplete'}")
+    os.replace(final + ".part", final)
+    manifest = {
+        "kind": "mysql",
+        "source": f"{url.hostname}:{url.port or 3306}/{url.path.lstrip('/')}",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "sha256": h.hexdigest(),
+        "compressed_size": os.path.getsize(final),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+    _write_manifest(final, manifest)
+    return final, manifest
+
+
+def snapshots():
+    """(path, manifest) for every snapshot in BACKUP_DIR, oldest first."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    out = []
+    for name in sorted(os.listdir(BACKUP_DIR)):
+        if name.startswith("aptipro_") and name.endswith((".db.gz", ".sql.gz")):
+            path = os.path.join(BACKUP_DIR, name)
+            try:
+                out.append((path, _read_manifest(path)))
+            except (OSError, ValueError):
+                out.append((path, {}))
+    return out
+
+
+def rotate(keep=KEEP_SNAPSHOTS):
+    existing = snapshots()
+    for path, _ in existing[:max(0, len(existing) - keep)]:
+        for p in (path, path + ".json"):
+            if os.path.exists(p):
+                os.remove(p)
+        print(f"[BACKUP] 🗑️  Removed old backup: {path}")
+
+
+def backup():
+    kind, target = database_target()
+    if kind == "sqlite":
+        if not os.path.exists(target):
+            print(f"[BACKUP] No database found at {target}. Nothing to back up.")
+            return None
+        path, manifest = snapshot_sqlite(target)
+    elif kind == "mysql":
+        path, manifest = snapshot_mysql(target)
+    else:
+        print("[BACKUP] PostgreSQL: use the provider's backups (Render Dashboard → Your DB → Backups).")
+        return None
 
     print(f"[BACKUP] ✅ Database backed up successfully.")
-    print(f"         Source : {DB_PATH}")
-    print(f"         Backup : {backup_path}  ({size_kb} KB)")
-
-    # ── Keep only the 10 most recent backups to save disk space ──────────────
-    backups = sorted(
-        [f for f in os.listdir(BACKUP_DIR) if f.startswith("aptipro_") and f.endswith(".db")]
-    )
-    while len(backups) > 10:
-        oldest = os.path.join(BACKUP_DIR, backups.pop(0))
-        os.remove(oldest)
-        print(f"[BACKUP] 🗑️  Removed old backup: {oldest}")
+    print(f"         Source : {manifest['source']}")
+    print(f"         Backup : {path}  ({manifest['compressed_size'] // 1024} KB, {manifest['seconds']} s)")
+
+    # ── Keep only the most recent backups to save disk space ──────────────────
+    rotate()
+    return path
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# WAL SHIPPING (SQLite)
+# ─────────────────────────────────────────────────────────────────────────────
+# WAL file: 32-byte header (magic, version, page size, checkpoint seq, salt-1,
+# salt-2, checksum) then frames of 24-byte header (page no, db size after
+# commit — non-zero on commit frames —, salt-1, salt-2, checksum) + page.
+# Checksums chain from the header through every frame, so a frame is only
+# valid if all frames before it are; salt-1 changes whenever SQLite restarts
+# the WAL from the beginning.
+
+WAL_HEADER = 32
+FRAME_HEADER = 24
+
+
+def _wal_checksum(data, s0, s1, big_endian):
+    words = iter(struct.unpack((">" if big_endian else "<") + f"{len(data) // 4}I", data))
+    for a, b in zip(words, words):
+        s0 = (s0 + a + s1) & 0xFFFFFFFF
+        s1 = (s1 + b + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def _read_wal_header(db_path):
+    try:
+        with open(db_path + "-wal", "rb") as f:
+            raw = f.read(WAL_HEADER)
+    except FileNotFoundError:
+        return None
+    if len(raw) < WAL_HEADER:
+        return None
+    magic, _, page_size, _, salt1, salt2, c1, c2 = struct.unpack(">8I", raw)
+    if magic not in (0x377F0682, 0x377F0683):
+        return None
+    return {"raw": raw, "page_size": page_size, "big_endian": magic & 1 == 1,
+            "salt": [salt1, salt2], "cksum": (c1, c2)}
+
+
+def _wal_salt(db_path):
+    hdr = _read_wal_header(db_path)
+    return hdr["salt"] if hdr else None
+
+
+class WalShipper:
+    """
+    Ships committed WAL frames of `db_path` into `wal_dir/<generation>/`.
+
+    Each generation is a base snapshot plus segments.jsonl, one line per
+    gzip'd segment of consecutive frames ending on a commit frame. A
+    long-lived read transaction keeps SQLite from restarting the WAL behind
+    our back, and our connections staying open keep the last app connection
+    to close from checkpointing and deleting it. Once the WAL passes
+    BACKUP_WAL_RESTART_BYTES we ship what is left and run a RESTART
+    checkpoint ourselves. A salt change (or a vanished WAL) we cannot
+    account for means frames may have been lost, so a new generation starts.
+    """
+
+    def __init__(self, db_path, wal_dir=WAL_DIR, restart_bytes=WAL_RESTART_BYTES,
+                 generation_hours=WAL_GENERATION_HOURS, keep_generations=KEEP_GENERATIONS):
+        self.db_path = db_path
+        self.wal_dir = wal_dir
+        self.restart_bytes = restart_bytes
+        self.generation_seconds = generation_hours * 3600
+        self.keep_generations = keep_generations
+        self.gen_dir = None
+        self._pins = []  # two connections; one of them always holds the read transaction
+
+    # ── generation bookkeeping ───────────────────────────────────────────────
+    def new_generation(self, reason):
+        gen = _stamp()
+        gen_dir = os.path.join(self.wal_dir, gen)
+        if self.gen_dir and os.path.basename(self.gen_dir) == gen:
+            time.sleep(1)
+            return self.new_generation(reason)
+        os.makedirs(gen_dir, exist_ok=True)
+        while True:
+            before = _wal_salt(self.db_path)
+            _, manifest = snapshot_sqlite(self.db_path, gen_dir, name="base.db.gz")
+            hdr = _read_wal_header(self.db_path)
+            # salt-1 only changes on a WAL restart: same salt before and after
+            # means every frame newer than the snapshot is still in this WAL
+            if manifest["wal_salt"] == before == (hdr["salt"] if hdr else None):
+                break
+        self.gen_dir = gen_dir
+        self.gen_started = time.time()
+        self.seq = 0
+        self.wal_index = -1
+        self.salt = None
+        self.header = None
+        self.next_frame = 1
+        self.expect_restart = False
+        if hdr is not None:
+            self._start_wal(hdr)
+        print(f"[BACKUP] 🧬 New WAL generation {gen} ({reason})")
+        self._prune_generations()
+
+    def _start_wal(self, hdr):
+        self.wal_index += 1
+        self.salt = hdr["salt"]
+        self.header = hdr
+        self.next_frame = 1
+        self.cksum = hdr["cksum"]
+        self.expect_restart = False
+
+    def _prune_generations(self):
+        gens = sorted(d for d in os.listdir(self.wal_dir) if os.path.isdir(os.path.join(self.wal_dir, d)))
+        for old in gens[:max(0, len(gens) - self.keep_generations)]:
+            shutil.rmtree(os.path.join(self.wal_dir, old), ignore_errors=True)
+
+    # ── WAL pinning ──────────────────────────────────────────────────────────
+    def _repin(self):
+        """Start a read transaction on the idle connection, then end the other one (no unpinned gap)."""
+        if not self._pins:
+            self._pins = [sqlite3.connect(self.db_path, isolation_level=None, timeout=5) for _ in range(2)]
+        fresh, old = self._pins
+        fresh.execute("BEGIN")
+        fresh.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        if old.in_transaction:
+            old.execute("ROLLBACK")
+        self._pins = [old, fresh]
+
+    def _unpin(self):
+        """End the read transaction but keep the connections open."""
+        for conn in self._pins:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+    def close(self):
+        for conn in self._pins:
+            conn.close()
+        self._pins = []
+
+    # ── frame copying ────────────────────────────────────────────────────────
+    def _ship_frames(self):
+        hdr = self.header
+        page_size = hdr["page_size"]
+        frame_size = FRAME_HEADER + page_size
+        shipped, pending = [], []
+        s0, s1 = self.cksum
+        n = self.next_frame
+        commit = None
+        try:
+            f = open(self.db_path + "-wal", "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            f.seek(WAL_HEADER + (n - 1) * frame_size)
+            while True:
+                frame = f.read(frame_size)
+                if len(frame) < frame_size:
+                    break
+                _, db_size, salt1, salt2, c1, c2 = struct.unpack(">6I", frame[:FRAME_HEADER])
+                if [salt1, salt2] != self.salt:
+                    break
+                s0, s1 = _wal_checksum(frame[:8], s0, s1, hdr["big_endian"])
+                s0, s1 = _wal_checksum(frame[FRAME_HEADER:], s0, s1, hdr["big_endian"])
+                if (s0, s1) != (c1, c2):
+                    break  # torn or stale frame: stop at the last valid commit
+                pending.append(frame)
+                if db_size:
+                    shipped.extend(pending)
+                    pending = []
+                    commit = (n, s0, s1)
+                n += 1
+        if commit is None:
+            return 0
+        first = self.next_frame
+        self.seq += 1
+        name = f"{self.seq:08d}_{self.wal_index:04d}_{first:08d}-{commit[0]:08d}.frames.gz"
+        path = os.path.join(self.gen_dir, name)
+        data = b"".join(shipped)
+        with gzip.open(path + ".part", "wb", compresslevel=6) as out:
+            out.write(data)
+        os.replace(path + ".part", path)
+        entry = {"seq": self.seq, "wal_index": self.wal_index, "header": hdr["raw"].hex(),
+                 "first": first, "last": commit[0], "file": name,
+                 "sha256": hashlib.sha256(data).hexdigest(),
+                 "shipped_at": datetime.now().isoformat(timespec="seconds")}
+        with open(os.path.join(self.gen_dir, "segments.jsonl"), "a") as idx:
+            idx.write(json.dumps(entry) + "\n")
+            idx.flush()
+            os.fsync(idx.fileno())
+        self.next_frame = commit[0] + 1
+        self.cksum = (commit[1], commit[2])
+        self.expect_restart = False
+        return commit[0] - first + 1
+
+    def _restart_wal(self):
+        """Ship the tail, then RESTART-checkpoint so the next writer starts a fresh WAL."""
+        self._unpin()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=0.5)
+        try:
+            # Backfill without blocking anyone first, so RESTART (which holds
+            # off writers while it runs) only has the last few frames to copy
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            busy, log, _ = conn.execute("PRAGMA wal_checkpoint(RESTART)").fetchone()
+        finally:
+            conn.close()
+        if busy:
+            return  # a reader was still on the old WAL; try again next tick
+        # Frames committed after our last copy are still in the file unless a
+        # writer already restarted the WAL (their salt would no longer match)
+        self._ship_frames()
+        if self.next_frame - 1 >= log:
+            self.expect_restart = True
+        else:
+            self.new_generation("frames were checkpointed before they were shipped")
+
+    # ── main loop ────────────────────────────────────────────────────────────
+    def tick(self):
+        if self.gen_dir is None or time.time() - self.gen_started >= self.generation_seconds:
+            self.new_generation("scheduled" if self.gen_dir else "startup")
+        self._repin()
+        hdr = _read_wal_header(self.db_path)
+        if hdr is None:
+            if self.salt is not None:
+                self.new_generation("WAL file was removed")
+            return 0
+        if hdr["salt"] != self.salt:
+            # Accept exactly one restart (salt-1 + 1) and only one we performed ourselves
+            if self.salt is None or (self.expect_restart and hdr["salt"][0] == (self.salt[0] + 1) & 0xFFFFFFFF):
+                self._start_wal(hdr)
+            else:
+                self.new_generation("WAL restarted outside the shipper")
+                return 0
+        shipped = self._ship_frames()
+        try:
+            if os.path.getsize(self.db_path + "-wal") >= self.restart_bytes:
+                self._restart_wal()
+        except FileNotFoundError:
+            pass
+        return shipped
+
+    def run(self, interval=WAL_INTERVAL):
+        print(f"[BACKUP] 📦 Shipping WAL of {self.db_path} to {self.wal_dir} every {interval:g} s (Ctrl+C to stop)")
+        try:
+            while True:
+                self.tick()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+
+def generations(wal_dir=WAL_DIR):
+    """[(path, base manifest, segment entries)] oldest first."""
+    if not os.path.isdir(wal_dir):
+        return []
+    out = []
+    for gen in sorted(os.listdir(wal_dir)):
+        path = os.path.join(wal_dir, gen)
+        try:
+            base = _read_manifest(os.path.join(path, "base.db.gz"))
+        except (OSError, ValueError):
+            continue
+        out.append((path, base, _segments(path)))
+    return out
+
+
+def _segments(gen_dir):
+    try:
+        with open(os.path.join(gen_dir, "segments.jsonl")) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# VERIFY & RESTORE
+# ─────────────────────────────────────────────────────────────────────────────
+
+def verify(path):
+    """Check a snapshot against its manifest; returns the manifest."""
+    manifest = _read_manifest(path)
+    if manifest["kind"] == "sqlite":
+        tmp = path + ".verify.db"
+        try:
+            sha = _gunzip_file(path, tmp)
+            if sha != manifest["sha256"]:
+                raise RuntimeError(f"checksum mismatch for {path}")
+            _integrity_check(tmp)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    else:
+        tail = b""
+        with gzip.open(path, "rb") as f:
+            h = hashlib.sha256()
+            for block in iter(lambda: f.read(CHUNK), b""):
+                h.update(block)
+                tail = (tail + block)[-4096:]
+        if h.hexdigest() != manifest["sha256"] or b"-- Dump completed" not in tail:
+            raise RuntimeError(f"{path} is incomplete or corrupted")
+    return manifest
+
+
+def _replay_wal(db_file, header, frames, expected):
+    # The file must be in WAL mode for SQLite to pick up the -wal we write next
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    with open(db_file + "-wal", "wb") as f:
+        f.write(header)
+        f.write(frames)
+    conn = sqlite3.connect(db_file)
+    try:
+        # Opening runs WAL recovery, which keeps only checksum-valid frames
+        busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if busy or log != expected or done != expected:
+            raise RuntimeError(f"WAL replay accepted {done}/{expected} frames")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def _restore_generation(gen_dir, tmp, until=None):
+    base = os.path.join(gen_dir, "base.db.gz")
+    manifest = _read_manifest(base)
+    if _gunzip_file(base, tmp) != manifest["sha256"]:
+        raise RuntimeError(f"checksum mismatch for {base}")
+    cutoff = until.isoformat(timespec="seconds") if until else None
+    groups = []  # [(wal_index, header, [frames...], frame count)]
+    for seg in _segments(gen_dir):
+        if cutoff and seg["shipped_at"] > cutoff:
+            break
+        with gzip.open(os.path.join(gen_dir, seg["file"]), "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != seg["sha256"]:
+            raise RuntimeError(f"checksum mismatch for segment {seg['file']}")
+        if not groups or groups[-1][0] != seg["wal_index"]:
+            if seg["first"] != 1:
+                raise RuntimeError(f"segment {seg['file']} does not start a WAL")
+            groups.append([seg["wal_index"], bytes.fromhex(seg["header"]), [], 0])
+        elif seg["first"] != groups[-1][3] + 1:
+            raise RuntimeError(f"gap before segment {seg['file']}")
+        groups[-1][2].append(data)
+        groups[-1][3] = seg["last"]
+    for _, header, chunks, count in groups:
+        _replay_wal(tmp, header, b"".join(chunks), count)
+    return sum(g[3] for g in groups)
+
+
+def _install(tmp, target, force):
+    if os.path.exists(target):
+        if not force:
+            raise RuntimeError(f"{target} exists — pass --force to replace it (it is kept as a .pre-restore copy)")
+        keep = f"{target}.pre-restore-{_stamp()}"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(target + suffix):
+                os.replace(target + suffix, keep + suffix)
+        print(f"[BACKUP] Previous database kept as {keep}")
+    os.replace(tmp, target)
+
+
+def restore(source, target=None, until=None, force=False):
+    """Restore a snapshot file or a WAL generation directory into the SQLite database at `target`."""
+    if not os.path.isdir(source) and _read_manifest(source)["kind"] == "mysql":
+        return _restore_mysql(source, force)
+    target = target or database_target()[1]
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    tmp = f"{target}.restore-{os.getpid()}.tmp"
+    try:
+        if os.path.isdir(source):
+            frames = _restore_generation(source, tmp, until)
+            detail = f"base + {frames} WAL frames" + (f" up to {until}" if until else "")
+        else:
+            manifest = _read_manifest(source)
+            if _gunzip_file(source, tmp) != manifest["sha256"]:
+                raise RuntimeError(f"checksum mismatch for {source}")
+            detail = f"snapshot of {manifest['created_at']}"
+        _integrity_check(tmp)
+        _install(tmp, target, force)
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(tmp + suffix):
+                os.remove(tmp + suffix)
+    print(f"[BACKUP] ✅ Restored {target} from {source} ({detail}); integrity_check ok.")
+    return target
+
+
+def _restore_mysql(path, force):
+    kind, url = database_target()
+    if kind != "mysql":
+        raise RuntimeError("DATABASE_URL must point at the MariaDB/MySQL database to restore into")
+    if not force:
+        raise RuntimeError("restoring a dump overwrites the tables in DATABASE_URL — pass --force")
+    verify(path)
+    cmd = ["mysql", "-h", url.hostname or "localhost", "-P", str(url.port or 3306),
+           "-u", unquote(url.username or ""), url.path.lstrip("/")]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, env=dict(os.environ, MYSQL_PWD=unquote(url.password or "")))
+    with gzip.open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            proc.stdin.write(block)
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError("mysql client reported an error during restore")
+    print(f"[BACKUP] ✅ Restored {url.path.lstrip('/')} from {path}.")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _list():
+    for path, m in snapshots():
+        print(f"{os.path.basename(path):40} {m.get('kind', '?'):7} {m.get('created_at', '?'):20} "
+              f"{m.get('compressed_size', os.path.getsize(path)) // 1024:>8} KB")
+    for path, base, segs in generations():
+        last = segs[-1]["shipped_at"] if segs else base["created_at"]
+        print(f"wal/{os.path.basename(path):36} restorable {base['created_at']} → {last} ({len(segs)} segments)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AptitudePro backups")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("snapshot", help="take a compressed online snapshot (default)")
+    sub.add_parser("list", help="list snapshots and WAL generations")
+    p = sub.add_parser("verify", help="check a snapshot against its manifest")
+    p.add_argument("backup")
+    p = sub.add_parser("ship-wal", help="continuously ship SQLite WAL frames")
+    p.add_argument("--interval", type=float, default=WAL_INTERVAL)
+    p = sub.add_parser("restore", help="restore a snapshot or a WAL generation")
+    p.add_argument("backup", help="snapshot file or backups/wal/<generation> directory")
+    p.add_argument("--until", help='point in time for WAL restores, e.g. "2026-03-01 10:15"')
+    p.add_argument("--target", help="database file to write (default: the app's SQLite database)")
+    p.add_argument("--force", action="store_true", help="replace an existing database")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command in (None, "snapshot"):
+            backup()
+        elif args.command == "list":
+            _list()
+        elif args.command == "verify":
+            m = verify(args.backup)
+            print(f"[BACKUP] ✅ {args.backup} verified ({m['kind']}, {m['created_at']}).")
+        elif args.command == "ship-wal":
+            kind, target = database_target()
+            if kind != "sqlite":
+                raise RuntimeError("WAL shipping is for SQLite; MariaDB/MySQL use binlog replication")
+            conn = sqlite3.connect(target)
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            conn.close()
+            if mode.lower() != "wal":
+                raise RuntimeError(f"{target} is in journal_mode={mode}; WAL shipping needs SQLITE_WAL=true")
+            WalShipper(target).run(args.interval)
+        elif args.command == "restore":
+            until = datetime.fromisoformat(args.until) if args.until else None
+            restore(args.backup, target=args.target, until=until, force=args.force)
+    except (RuntimeError, OSError, sqlite3.Error) as e:
+        print(f"[BACKUP] ❌ {e}")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    backup()
+    main()
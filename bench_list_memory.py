@@ -0,0 +1,130 @@
+"""
+bench_list_memory.py — memory per request of the admin list pages
+===================================================================
+Renders the admin list pages (dashboard and its lazily loaded summary and
+panels, members, questions, history, stats) through Flask's test client against a synthetic dataset and
+measures, per request, the peak Python heap (tracemalloc) and the number
+of ORM entities loaded into the session.
+
+    python bench_list_memory.py                          # small dataset, 5 runs per page
+    python bench_list_memory.py --scale medium --runs 3
+    python bench_list_memory.py --db sqlite:////tmp/aptipro_large.db --out after.json
+
+    # compare two runs (e.g. before and after a change)
+    python bench_list_memory.py --compare before.json after.json
+
+Prints one JSON line per page: median peak KB, median time and ORM
+entities loaded. The peak includes the rendered page, so on pages that
+print thousands of rows the HTML itself is most of it.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import event
+
+PAGES = [
+    ('admin_dashboard', '/admin/dashboard'),
+    ('dashboard_summary', '/admin/dashboard/summary'),
+    ('dashboard_panel', '/admin/dashboard/panel/questions'),
+    ('admin_members', '/admin/members'),
+    ('admin_questions', '/admin/questions'),
+    ('history', '/history'),
+    ('admin_stats', '/admin/stats'),
+]
+
+
+def measure(m, client, path, runs):
+    """Median (peak KB, ms, ORM objects loaded) of `runs` requests to `path`, after one warm-up."""
+    client.get(path)
+    loaded = {'n': 0}
+
+    def count_loaded(session, instance):
+        loaded['n'] += 1
+
+    peaks, times, objects = [], [], []
+    event.listen(m.db.session, 'loaded_as_persistent', count_loaded)
+    try:
+        for _ in range(runs):
+            gc.collect()
+            loaded['n'] = 0
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            status = client.get(path).status_code
+            elapsed = (time.perf_counter() - t0) * 1000
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if status != 200:
+                raise SystemExit(f"{path} returned {status}")
+            peaks.append(peak / 1024)
+            times.append(elapsed)
+            objects.append(loaded['n'])
+    finally:
+        event.remove(m.db.session, 'loaded_as_persistent', count_loaded)
+    return statistics.median(peaks), statistics.median(times), statistics.median(objects)
+
+
+def run(opts):
+    if opts.db:
+        os.environ['DATABASE_URL'] = opts.db
+    else:
+        from generate_dataset import fixture_db_url
+        os.environ['DATABASE_URL'] = fixture_db_url(opts.scale)
+    os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+    import app as m
+
+    client = m.app.test_client()
+    with m.app.app_context():
+        admin_id = m.db.session.query(m.User.id).filter(m.User.role == 'admin').scalar()
+    if admin_id is None:
+        raise SystemExit("No admin user in the dataset")
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+
+    results = {}
+    for name, path in PAGES:
+        peak, ms, objects = measure(m, client, path, opts.runs)
+        results[name] = {'peak_kb': round(peak, 1), 'ms': round(ms, 1), 'orm_objects': objects}
+        print(json.dumps({'page': name, **results[name]}))
+    if opts.out:
+        with open(opts.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'page':<18}{'peak KB before':>16}{'after':>10}{'ms before':>12}{'after':>8}{'objects':>10}{'after':>8}")
+    for page in before:
+        if page not in after:
+            continue
+        b, a = before[page], after[page]
+        print(f"{page:<18}{b['peak_kb']:>16}{a['peak_kb']:>10}{b['ms']:>12}{a['ms']:>8}"
+              f"{b['orm_objects']:>10}{a['orm_objects']:>8}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Memory per request of the admin list pages")
+    p.add_argument('--db', help="Database URL (default: a copy of the generated --scale dataset)")
+    p.add_argument('--scale', default='small', choices=['tiny', 'small', 'medium', 'large'])
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('--out', help="Write the results as JSON for --compare")
+    p.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    opts = p.parse_args(argv)
+    if opts.compare:
+        compare(*opts.compare)
+    else:
+        run(opts)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
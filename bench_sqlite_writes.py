@@ -0,0 +1,135 @@
+"""
+bench_sqlite_writes.py — SQLite write-concurrency benchmark
+=============================================================
+Simulates gunicorn workers hammering the same SQLite file with the two
+hot write paths — heartbeat (read attendance row → update) and answer
+submission (read attempt → insert answer + activity + notification) —
+and compares the old default engine against sqlite_tuning's profile.
+
+    python bench_sqlite_writes.py                     # 4 procs x 10 s, both modes
+    python bench_sqlite_writes.py --procs 8 --seconds 20 --mode tuned
+
+Prints one JSON line per mode: committed transactions, throughput,
+lock errors that reached the caller, and retries absorbed.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import sqlite_tuning
+
+SCHEMA = [
+    "CREATE TABLE attendance (id INTEGER PRIMARY KEY, user_id INTEGER, last_active REAL, minutes INTEGER)",
+    "CREATE TABLE attempt (id INTEGER PRIMARY KEY, student_id INTEGER, question_id INTEGER, submission_count INTEGER)",
+    "CREATE TABLE answer (id INTEGER PRIMARY KEY, student_id INTEGER, question_id INTEGER, option TEXT, "
+    "is_correct BOOLEAN, submitted_at REAL)",
+    "CREATE TABLE activity_log (id INTEGER PRIMARY KEY, user_id INTEGER, action TEXT, details TEXT)",
+    "CREATE TABLE notification (id INTEGER PRIMARY KEY, student_id INTEGER, question_id INTEGER, text TEXT)",
+]
+STUDENTS = 500
+QUESTIONS = 20
+
+
+def setup(path):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for ddl in SCHEMA:
+            conn.exec_driver_sql(ddl)
+        conn.execute(text("INSERT INTO attendance (user_id, last_active, minutes) VALUES (:u, 0, 0)"),
+                     [{'u': u} for u in range(STUDENTS)])
+        conn.execute(text("INSERT INTO attempt (student_id, question_id, submission_count) VALUES (:s, :q, 0)"),
+                     [{'s': s, 'q': q} for s in range(STUDENTS) for q in range(QUESTIONS)])
+    engine.dispose()
+
+
+def heartbeat(conn, rng):
+    uid = rng.randrange(STUDENTS)
+    row = conn.execute(text("SELECT id, minutes FROM attendance WHERE user_id = :u"), {'u': uid}).fetchone()
+    conn.execute(text("UPDATE attendance SET last_active = :t, minutes = :m WHERE id = :id"),
+                 {'t': time.time(), 'm': row[1] + 1, 'id': row[0]})
+
+
+def submission(conn, rng):
+    sid, qid = rng.randrange(STUDENTS), rng.randrange(QUESTIONS)
+    row = conn.execute(text("SELECT id, submission_count FROM attempt WHERE student_id = :s AND question_id = :q"),
+                       {'s': sid, 'q': qid}).fetchone()
+    conn.execute(text("UPDATE attempt SET submission_count = :c WHERE id = :id"), {'c': row[1] + 1, 'id': row[0]})
+    conn.execute(text("INSERT INTO answer (student_id, question_id, option, is_correct, submitted_at) "
+                      "VALUES (:s, :q, :o, :c, :t)"),
+                 {'s': sid, 'q': qid, 'o': rng.choice('ABCD'), 'c': rng.random() < 0.5, 't': time.time()})
+    conn.execute(text("INSERT INTO activity_log (user_id, action, details) VALUES (:u, 'SUBMISSION', 'bench')"),
+                 {'u': sid})
+    conn.execute(text("INSERT INTO notification (student_id, question_id, text) VALUES (:s, :q, 'bench')"),
+                 {'s': sid, 'q': qid})
+
+
+def worker(path, mode, seconds, seed, out):
+    engine = create_engine(f"sqlite:///{path}")
+    if mode == 'tuned':
+        sqlite_tuning.configure_engine(engine)
+    rng = random.Random(seed)
+    committed = errors = retries = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        op = heartbeat if rng.random() < 0.7 else submission
+        tries = sqlite_tuning.DEFAULTS['DB_LOCK_RETRIES'] if mode == 'tuned' else 0
+        for n in range(tries + 1):
+            try:
+                with engine.begin() as conn:
+                    op(conn, rng)
+                committed += 1
+                break
+            except OperationalError as exc:
+                if n == tries or not sqlite_tuning.is_lock_error(exc):
+                    errors += 1
+                    break
+                retries += 1
+                time.sleep(0.02 * (2 ** n) * (0.5 + rng.random()))
+    engine.dispose()
+    out.put((committed, errors, retries))
+
+
+def run(mode, procs, seconds):
+    path = os.path.join(tempfile.mkdtemp(prefix='aptipro_bench_'), 'bench.db')
+    setup(path)
+    out = multiprocessing.Queue()
+    ps = [multiprocessing.Process(target=worker, args=(path, mode, seconds, i, out)) for i in range(procs)]
+    t0 = time.perf_counter()
+    for p in ps:
+        p.start()
+    results = [out.get() for _ in ps]
+    for p in ps:
+        p.join()
+    wall = time.perf_counter() - t0
+    committed = sum(r[0] for r in results)
+    return {
+        'mode': mode,
+        'procs': procs,
+        'seconds': round(wall, 2),
+        'committed': committed,
+        'tx_per_sec': round(committed / wall, 1),
+        'lock_errors': sum(r[1] for r in results),
+        'retries': sum(r[2] for r in results),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="SQLite write-concurrency benchmark")
+    p.add_argument('--procs', type=int, default=4)
+    p.add_argument('--seconds', type=float, default=10)
+    p.add_argument('--mode', choices=['default', 'tuned', 'both'], default='both')
+    opts = p.parse_args()
+    for mode in (['default', 'tuned'] if opts.mode == 'both' else [opts.mode]):
+        print(json.dumps(run(mode, opts.procs, opts.seconds)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Points app.py at a throwaway SQLite database before anything imports it, so
+the app-level tests never read or write instance/aptipro.db, and keeps the
+scheduler, inline job workers and rate limits out of the test process.
+
+The generic modules keep their configuration in module-level dicts, and
+each module's own tests re-point them at a throwaway app when collected.
+App-level tests use the `app_state` fixture to get app.py's back:
+
+    pytestmark = pytest.mark.usefixtures('app_state')
+
+and the `ctx` fixture (an app context, rolled back afterwards) with the
+make_student / make_question / login factories below:
+
+    def test_submit(ctx, make_student, make_question, login):
+        client = login(make_student())
+"""
+
+import importlib
+import itertools
+import os
+import tempfile
+
+import pytest
+
+_dir = tempfile.mkdtemp(prefix='aptipro_app_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_dir, 'app.db'))
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+os.environ.setdefault('JOB_INLINE_WORKERS', '0')
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+os.environ.setdefault('RATE_LIMIT_STORAGE', 'memory')
+os.environ.setdefault('PROFILE_DIR', os.path.join(_dir, 'profiles'))
+os.environ.setdefault('SQL_SLOW_LOG', os.path.join(_dir, 'slow_sql.log'))
+
+# module -> the module-level dicts its init_app() fills in
+_SHARED = {
+    'versions': ('_state', '_content'),
+    'search': ('_state', '_kinds', '_by_code', '_memory'),
+    'job_queue': ('_state',),
+    'scheduler': ('_state',),
+    'rate_limit': ('_state',),
+    'request_profiler': ('_state',),
+    'db_routing': ('_state',),
+    'compression': ('_state',),
+    'sql_instrumentation': ('_thresholds',),
+}
+
+
+def _snapshot():
+    return {(module, name): dict(getattr(importlib.import_module(module), name))
+            for module, names in _SHARED.items() for name in names}
+
+
+def _restore(snapshot):
+    for (module, name), values in snapshot.items():
+        shared = getattr(importlib.import_module(module), name)
+        shared.clear()
+        shared.update(values)
+
+
+import app  # noqa: E402  (after the environment above)
+
+_APP_STATE = _snapshot()
+
+
+@pytest.fixture(scope='module')
+def app_state():
+    """Point the shared modules at app.py for one test module, then put back what was there."""
+    saved = _snapshot()
+    _restore(_APP_STATE)
+    yield app
+    _restore(saved)
+
+
+_ids = itertools.count(1)
+
+
+@pytest.fixture
+def ctx(app_state):
+    with app.app.app_context():
+        yield
+        app.db.session.rollback()
+
+
+@pytest.fixture
+def make_student(ctx):
+    """make_student(**fields): a committed student with a username no other test uses."""
+    def make(role='student', **fields):
+        user = app.User(username=f'test_{role}_{next(_ids)}', password='x', role=role, **fields)
+        app.db.session.add(user)
+        app.db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def make_question(ctx):
+    """make_question(**fields): a committed untimed question, "2 + 2?" with B (4) correct."""
+    def make(**fields):
+        question = app.Question(**{'text': '2 + 2?', 'option_a': '3', 'option_b': '4', 'correct_answer': 'B',
+                                   'time_limit': 0, **fields})
+        app.db.session.add(question)
+        app.db.session.commit()
+        return question
+    return make
+
+
+@pytest.fixture
+def login(ctx):
+    """login(user): a test client with `user` logged in."""
+    def client_for(user):
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+    return client_for
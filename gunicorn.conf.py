@@ -0,0 +1,53 @@
+"""
+gunicorn.conf.py — picked up automatically by `gunicorn app:app`.
+
+Sets up prometheus_client's multiprocess directory so /metrics aggregates
+every worker, and cleans up after workers that exit.
+
+GUNICORN_PRELOAD=true imports the app once in the master (init_db and
+template warm-up run once, workers fork with everything loaded). Workers
+then drop the master's pooled DB connections right after the fork so no
+socket is shared between processes.
+"""
+
+import os
+import shutil
+import tempfile
+
+_metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'aptipro_metrics')
+)
+
+# Imported after the env var is set (prometheus_client reads it at import time)
+try:
+    from prometheus_client import multiprocess
+except ImportError:
+    multiprocess = None
+
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+if preload_app:
+    os.environ.setdefault('WARM_TEMPLATES', 'true')
+
+
+def on_starting(server):
+    # Stale files from a previous master would be merged into the new totals
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if multiprocess is not None:
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import app, db
+    import metrics
+    with app.app_context():
+        # close=False: leave the parent's connections alone, just forget them here
+        for engine in db.engines.values():  # primary and, if configured, the read replica
+            engine.dispose(close=False)
+        metrics.instrument_pool(db.engine)
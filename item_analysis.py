@@ -0,0 +1,201 @@
+"""
+item_analysis.py — psychometric item analysis of the question bank, in NumPy.
+
+The input is the sparse (student x question) response matrix, one entry per
+student per question (their first answer), as column arrays:
+
+  question   question id
+  student    student id
+  option     index of the option chosen (A=0 .. D=3), -1 for none / expired
+  seconds    time taken, NaN when unknown or expired
+
+plus each question's key (the index of its correct option) and every
+student's totals over the whole bank (questions answered, answered
+correctly). From these it computes, per question:
+
+  difficulty      share of respondents choosing the key (the p-value)
+  discrimination  point-biserial correlation between choosing the key and the
+                  student's rest score: their accuracy on the other questions
+                  they answered
+  options         per option, the share of respondents choosing it and its own
+                  point-biserial; a working distractor is chosen by some and
+                  correlates negatively
+  times           25th, 50th, 75th and 90th percentile of on-time seconds
+
+and flags the questions worth a look:
+
+  negative_discrimination  stronger students get it wrong more often: likely
+                           a wrong key or an ambiguous question
+  key_beaten               a distractor correlates with ability better than the
+                           key does: likely a wrong key
+  low_discrimination       the question barely separates strong from weak
+  too_easy / too_hard      difficulty above EASY / below HARD
+  dead_distractors         a distractor almost nobody chooses
+
+Questions with fewer than `min_responses` respondents get no flags. Every
+step is a bincount or a sort over the response arrays, so the cost grows
+with the number of answers, not with students x questions.
+
+Nothing here touches the database. app.py feeds it Answer rows and student
+totals from a scheduled task and stores the results in the item_analysis
+table. NumPy is optional — without it available() is False and the task
+does nothing.
+"""
+
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+OPTIONS = 'ABCD'
+QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+EASY = 0.9
+HARD = 0.2
+LOW_DISCRIMINATION = 0.15
+DISTRACTOR_MIN_SHARE = 0.05
+
+FLAG_LABELS = {
+    'negative_discrimination': 'Negative discrimination',
+    'key_beaten': 'Distractor beats key',
+    'low_discrimination': 'Low discrimination',
+    'too_easy': 'Too easy',
+    'too_hard': 'Too hard',
+    'dead_distractors': 'Unused distractors',
+}
+
+Item = namedtuple('Item', 'question_id responses difficulty discrimination options times flags')
+Option = namedtuple('Option', 'option share discrimination')
+
+
+def available():
+    return np is not None
+
+
+def option_index(letter):
+    """0-3 for 'A'-'D' (either case), -1 for anything else."""
+    return OPTIONS.find(letter.upper()) if letter and len(letter) == 1 else -1
+
+
+def responses(rows):
+    """Column arrays (question, student, option, seconds) from (question_id, student_id,
+    selected_option, time_taken_sec, is_expired) rows in submission order, keeping the
+    first answer of each student to each question."""
+    rows = list(rows)
+    question = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    student = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    option = np.fromiter((-1 if r[4] else option_index(r[2]) for r in rows), dtype=np.int8, count=len(rows))
+    seconds = np.fromiter((np.nan if r[4] or r[3] is None else r[3] for r in rows), dtype=np.float64,
+                          count=len(rows))
+    if len(rows):
+        pair = (question - question.min()) * (int(student.max()) + 1) + student
+        _, first = np.unique(pair, return_index=True)
+        first.sort()
+        question, student, option, seconds = question[first], student[first], option[first], seconds[first]
+    return question, student, option, seconds
+
+
+def totals(rows):
+    """Sorted arrays (student ids, answered, correct) from (student_id, answered, correct) rows."""
+    data = np.array([tuple(int(v or 0) for v in r) for r in rows], dtype=np.int64).reshape(-1, 3)
+    data = data[np.argsort(data[:, 0])]
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def _point_biserial(group, x, y, k):
+    """Per group, the Pearson correlation of x and y (NaN when either is constant)."""
+    n = np.bincount(group, minlength=k).astype(np.float64)
+    sx = np.bincount(group, weights=x, minlength=k)
+    sy = np.bincount(group, weights=y, minlength=k)
+    sxy = np.bincount(group, weights=x * y, minlength=k)
+    sxx = np.bincount(group, weights=x * x, minlength=k)
+    syy = np.bincount(group, weights=y * y, minlength=k)
+    var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = (n * sxy - sx * sy) / np.sqrt(var)
+    return np.where(var > 1e-12, r, np.nan)
+
+
+def _quantiles(group, values, k):
+    """(k x len(QUANTILES)) linearly interpolated quantiles of values per group, NaN when empty."""
+    out = np.full((k, len(QUANTILES)), np.nan)
+    if not len(values):
+        return out
+    order = np.lexsort((values, group))
+    group, values = group[order], values[order]
+    counts = np.bincount(group, minlength=k)
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+    for j, q in enumerate(QUANTILES):
+        pos = q * (counts[present] - 1)
+        lo, hi = np.floor(pos).astype(np.int64), np.ceil(pos).astype(np.int64)
+        base = starts[present]
+        out[present, j] = values[base + lo] + (values[base + hi] - values[base + lo]) * (pos - lo)
+    return out
+
+
+def analyse(data, keys, student_totals, min_responses=30):
+    """[Item] for every question in `data` (from responses()); keys maps question id to
+    its correct option index; student_totals comes from totals()."""
+    question, student, option, seconds = data
+    if not len(question):
+        return []
+    qids, group = np.unique(question, return_inverse=True)
+    k = len(qids)
+    key = np.array([keys.get(int(q), -1) for q in qids], dtype=np.int8)
+    x = (option == key[group]).astype(np.float64)
+    n = np.bincount(group, minlength=k)
+    difficulty = np.bincount(group, weights=x, minlength=k) / n
+
+    # Rest score: the student's accuracy on the other questions they answered
+    ids, answered, correct = student_totals
+    at = np.searchsorted(ids, student)
+    known = at < len(ids)
+    known[known] = ids[at[known]] == student[known]
+    others, right = np.zeros(len(student)), np.zeros(len(student))
+    others[known] = answered[at[known]] - 1
+    right[known] = correct[at[known]] - x[known]
+    rest = np.clip(right / np.maximum(others, 1), 0, 1)
+    scored = others > 0
+    g, rest = group[scored], rest[scored]
+    discrimination = _point_biserial(g, x[scored], rest, k)
+
+    share = np.stack([np.bincount(group, weights=(option == j).astype(np.float64), minlength=k) / n
+                      for j in range(len(OPTIONS))], axis=1)
+    option_disc = np.stack([_point_biserial(g, (option[scored] == j).astype(np.float64), rest, k)
+                            for j in range(len(OPTIONS))], axis=1)
+    on_time = ~np.isnan(seconds)
+    times = _quantiles(group[on_time], seconds[on_time], k)
+
+    items = []
+    for i, qid in enumerate(qids):
+        d = float(discrimination[i])
+        options = tuple(Option(OPTIONS[j], float(share[i, j]), float(option_disc[i, j]))
+                        for j in range(len(OPTIONS)))
+        items.append(Item(int(qid), int(n[i]), float(difficulty[i]), d, options,
+                          tuple(float(t) for t in times[i]),
+                          _flags(int(n[i]), float(difficulty[i]), d, options, int(key[i]), min_responses)))
+    return items
+
+
+def _flags(responses, difficulty, discrimination, options, key, min_responses):
+    if responses < min_responses or key < 0:
+        return ()
+    flags = []
+    distractors = [o for j, o in enumerate(options) if j != key]
+    if discrimination == discrimination:  # not NaN
+        if discrimination < 0:
+            flags.append('negative_discrimination')
+        elif discrimination < LOW_DISCRIMINATION:
+            flags.append('low_discrimination')
+    if discrimination == discrimination and any(o.discrimination > max(discrimination, 0) for o in distractors):
+        flags.append('key_beaten')
+    if difficulty > EASY:
+        flags.append('too_easy')
+    elif difficulty < HARD:
+        flags.append('too_hard')
+    if any(o.share < DISTRACTOR_MIN_SHARE for o in distractors) and difficulty <= EASY:
+        flags.append('dead_distractors')
+    return tuple(flags)
@@ -0,0 +1,357 @@
+"""
+job_queue.py — database-backed background jobs for AptitudePro.
+
+Heavy admin work (CSV exports, regrades) runs here instead of inside the
+HTTP request. Jobs are rows in the `job` table, so no broker is needed:
+
+    job = job_queue.enqueue('export_submissions', created_by=current_user.id)
+    # the jobs page polls /admin/jobs/<id> until the status is 'succeeded'
+
+Workers claim a job with a conditional UPDATE (status 'queued' → 'running'),
+so any number of threads and processes can poll the same table and each
+attempt runs exactly once. A running job's heartbeat is refreshed every
+JOB_LEASE_SECONDS / 3; when a worker dies, the next worker to notice puts
+its job back in the queue (or fails it once max_attempts is used up).
+
+Handlers are registered with @job_queue.handler('kind') and get a JobContext:
+    ctx.params                 the JSON parameters given to enqueue()
+    ctx.progress(done, total)  report progress; raises JobCancelled once an
+                               admin has cancelled the job
+    ctx.artifact_path(name)    where to write the result file
+                               (JOB_ARTIFACT_DIR/<job id>/<name>)
+and return a short summary message. A handler that raises is retried after
+JOB_RETRY_BACKOFF * 2**(attempt - 1) seconds until max_attempts is reached.
+
+Workers:
+    JOB_INLINE_WORKERS   threads per web process, started on the first request (1)
+    python worker.py     dedicated worker processes (then set JOB_INLINE_WORKERS=0)
+"""
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import OperationalError
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_state = {'app': None, 'db': None, 'model': None, 'now': datetime.now, 'artifact_dir': None,
+          'lease': 120.0, 'poll': 2.0, 'backoff': 30.0, 'inline_workers': 1, 'started': False}
+_handlers = {}
+_wake = threading.Event()
+_start_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler once its job has been cancelled (or taken over by another worker)."""
+
+
+def handler(kind):
+    """Register `fn(ctx)` as the handler for jobs of this kind."""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _table():
+    return _state['model'].__table__
+
+
+def _write(stmt, tries=5):
+    """Run one UPDATE on its own connection, outside the handler's session. Returns the rowcount."""
+    for n in range(tries):
+        try:
+            with _state['db'].engine.begin() as conn:
+                return conn.execute(stmt).rowcount
+        except OperationalError:
+            if n == tries - 1:
+                raise
+            time.sleep(0.1 * 2 ** n)
+
+
+def _owned(job_id, worker_id):
+    t = _table()
+    return (t.c.id == job_id, t.c.status == RUNNING, t.c.locked_by == worker_id)
+
+
+def artifact_file(job):
+    """Absolute path of a finished job's result file, or None."""
+    if not job.artifact_path:
+        return None
+    path = os.path.join(_state['artifact_dir'], job.artifact_path)
+    return path if os.path.isfile(path) else None
+
+
+def _discard_artifacts(job_id):
+    shutil.rmtree(os.path.join(_state['artifact_dir'], str(job_id)), ignore_errors=True)
+
+
+class JobContext:
+    """What a handler sees of its job."""
+
+    def __init__(self, job_id, params, attempt, worker_id):
+        self.job_id = job_id
+        self.params = params
+        self.attempt = attempt
+        self.worker_id = worker_id
+        self.artifact_name = None
+        self._last_report = 0.0
+
+    def progress(self, done, total=None, message=None):
+        """Record progress (as a fraction of `total`, else a percentage) and check for cancellation.
+
+        Writes are throttled to two a second and are best-effort: a busy
+        database delays the progress bar, never the job.
+        """
+        now = time.monotonic()
+        if now - self._last_report < 0.5:
+            return
+        self._last_report = now
+        pct = int(done * 100 / total) if total else int(done)
+        values = {'progress': max(0, min(99, pct)), 'heartbeat_at': _state['now']()}  # 100 means finished
+        if message is not None:
+            values['message'] = message[:255]
+        t = _table()
+        try:
+            updated = _write(update(t).where(*_owned(self.job_id, self.worker_id),
+                                             t.c.cancel_requested.isnot(True)).values(**values), tries=1)
+        except OperationalError:
+            return
+        if not updated:
+            raise JobCancelled()
+
+    def artifact_path(self, filename):
+        """Path the handler should write its result file to; the file is offered for download."""
+        directory = os.path.join(_state['artifact_dir'], str(self.job_id))
+        os.makedirs(directory, exist_ok=True)
+        self.artifact_name = filename
+        return os.path.join(directory, filename)
+
+
+# --- Producer side (called from request handlers) ---
+
+def enqueue(kind, params=None, created_by=None, max_attempts=3, delay=0, unique=False):
+    """Queue a job and return it. With unique=True an identical queued/running job is returned instead."""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    db, Job = _state['db'], _state['model']
+    payload = json.dumps(params or {}, sort_keys=True)
+    if unique:
+        existing = Job.query.filter(Job.kind == kind, Job.params == payload,
+                                    Job.status.in_(ACTIVE)).order_by(Job.id.desc()).first()
+        if existing:
+            return existing
+    now = _state['now']()
+    job = Job(kind=kind, params=payload, status=QUEUED, progress=0, attempts=0, max_attempts=max_attempts,
+              created_by=created_by, created_at=now, run_after=now + timedelta(seconds=delay))
+    db.session.add(job)
+    db.session.commit()
+    _wake.set()
+    return job
+
+
+def cancel(job_id):
+    """Cancel a queued job now, or ask a running one to stop at its next progress report."""
+    t, now = _table(), _state['now']()
+    if _write(update(t).where(t.c.id == job_id, t.c.status == QUEUED)
+              .values(status=CANCELLED, message='Cancelled', finished_at=now)):
+        return True
+    return bool(_write(update(t).where(t.c.id == job_id, t.c.status == RUNNING)
+                       .values(cancel_requested=True, message='Cancelling…')))
+
+
+def retry(job_id):
+    """Put a failed or cancelled job back in the queue with a fresh set of attempts."""
+    t = _table()
+    updated = _write(update(t).where(t.c.id == job_id, t.c.status.in_((FAILED, CANCELLED))).values(
+        status=QUEUED, progress=0, attempts=0, message=None, error=None, cancel_requested=False,
+        run_after=_state['now'](), started_at=None, finished_at=None, artifact_path=None, artifact_name=None))
+    if updated:
+        _discard_artifacts(job_id)
+        _wake.set()
+    return bool(updated)
+
+
+def purge(older_than_days):
+    """Delete finished jobs (and their files) that ended more than `older_than_days` ago. Returns how many."""
+    t = _table()
+    cutoff = _state['now']() - timedelta(days=older_than_days)
+    with _state['db'].engine.connect() as conn:
+        ids = conn.execute(select(t.c.id).where(t.c.status.in_(FINISHED), t.c.finished_at < cutoff)).scalars().all()
+    for start in range(0, len(ids), 500):
+        batch = ids[start:start + 500]
+        with _state['db'].engine.begin() as conn:
+            conn.execute(delete(t).where(t.c.id.in_(batch)))
+        for job_id in batch:
+            _discard_artifacts(job_id)
+    return len(ids)
+
+
+def as_dict(job):
+    """JSON-safe status of a job for the polling endpoint."""
+    end = job.finished_at or (_state['now']() if job.status == RUNNING else None)
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress or 0,
+        'message': job.message,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'duration_sec': round((end - job.started_at).total_seconds(), 1) if end and job.started_at else None,
+        'cancel_requested': bool(job.cancel_requested),
+        'artifact_name': job.artifact_name,
+        'error': (job.error or '').strip().splitlines()[-1] if job.error else None,
+    }
+
+
+# --- Worker side ---
+
+def reap_stale():
+    """Requeue (or fail) running jobs whose worker stopped sending heartbeats. Returns how many."""
+    t, now = _table(), _state['now']()
+    stale = (t.c.status == RUNNING, t.c.heartbeat_at < now - timedelta(seconds=_state['lease']))
+    n = _write(update(t).where(*stale, t.c.cancel_requested.is_(True)).values(
+        status=CANCELLED, message='Cancelled', finished_at=now, locked_by=None))
+    n += _write(update(t).where(*stale, t.c.attempts < t.c.max_attempts).values(
+        status=QUEUED, run_after=now, locked_by=None, message='Requeued: worker stopped responding'))
+    n += _write(update(t).where(*stale).values(
+        status=FAILED, finished_at=now, locked_by=None, message='Failed',
+        error='Worker stopped responding'))
+    return n
+
+
+def _claim(worker_id):
+    t, now = _table(), _state['now']()
+    with _state['db'].engine.connect() as conn:
+        candidates = conn.execute(
+            select(t.c.id)
+            .where(t.c.status == QUEUED, t.c.kind.in_(list(_handlers)),
+                   or_(t.c.run_after.is_(None), t.c.run_after <= now))
+            .order_by(t.c.run_after, t.c.id).limit(5)
+        ).scalars().all()
+    for job_id in candidates:
+        # Only one worker's UPDATE can match status='queued'; the others move on
+        if _write(update(t).where(t.c.id == job_id, t.c.status == QUEUED).values(
+                status=RUNNING, locked_by=worker_id, started_at=now, heartbeat_at=now,
+                attempts=t.c.attempts + 1, cancel_requested=False, message='Running')):
+            return job_id
+    return None
+
+
+def _heartbeat(job_id, worker_id, stop):
+    t = _table()
+    with _state['app'].app_context():
+        while not stop.wait(_state['lease'] / 3):
+            try:
+                _write(update(t).where(*_owned(job_id, worker_id)).values(heartbeat_at=_state['now']()), tries=1)
+            except OperationalError:
+                pass  # next beat; the lease allows a few misses
+
+
+def run_job(job_id, worker_id):
+    """Run one claimed job to completion and record the outcome."""
+    app, db, Job = _state['app'], _state['db'], _state['model']
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        kind, attempt, max_attempts = job.kind, job.attempts, job.max_attempts
+        ctx = JobContext(job_id, json.loads(job.params or '{}'), attempt, worker_id)
+        db.session.rollback()  # don't hold a read transaction open while the handler runs
+
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(job_id, worker_id, stop), daemon=True)
+        beat.start()
+        try:
+            summary = _handlers[kind](ctx)
+            values = {'status': SUCCEEDED, 'progress': 100, 'message': (summary or 'Done')[:255], 'error': None}
+            if ctx.artifact_name:
+                values.update(artifact_path=f"{job_id}/{ctx.artifact_name}", artifact_name=ctx.artifact_name)
+        except JobCancelled:
+            db.session.rollback()
+            _discard_artifacts(job_id)
+            values = {'status': CANCELLED, 'message': 'Cancelled'}
+        except Exception as exc:
+            db.session.rollback()
+            _discard_artifacts(job_id)
+            print(f"  [JOBS] Job {job_id} ({kind}) attempt {attempt}/{max_attempts} failed: {exc!r}")
+            values = {'error': traceback.format_exc()[-4000:]}
+            if attempt < max_attempts:
+                delay = _state['backoff'] * 2 ** (attempt - 1)
+                values.update(status=QUEUED, run_after=_state['now']() + timedelta(seconds=delay),
+                              message=f"Attempt {attempt} failed, retrying in {delay:.0f}s")
+            else:
+                values.update(status=FAILED, message='Failed')
+        finally:
+            stop.set()
+            beat.join()
+            db.session.remove()
+
+        if values['status'] != QUEUED:
+            values['finished_at'] = _state['now']()
+        _write(update(_table()).where(*_owned(job_id, worker_id)).values(locked_by=None, **values))
+        return values['status']
+
+
+def work(worker_id=None, stop=None, once=False):
+    """Claim and run jobs until `stop` is set (or, with once=True, until nothing is due)."""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+    stop = stop or threading.Event()
+    next_reap = 0.0
+    with _state['app'].app_context():
+        while not stop.is_set():
+            try:
+                if time.monotonic() >= next_reap:
+                    reap_stale()
+                    next_reap = time.monotonic() + _state['lease'] / 2
+                job_id = _claim(worker_id)
+            except Exception as exc:  # database unreachable — keep the worker alive
+                print(f"  [JOBS] Worker {worker_id}: {exc!r}")
+                job_id = None
+            if job_id is not None:
+                run_job(job_id, worker_id)
+                continue
+            if once:
+                return
+            _wake.wait(_state['poll'])
+            _wake.clear()
+
+
+def ensure_workers():
+    """Start JOB_INLINE_WORKERS worker threads in this process (once)."""
+    if _state['started'] or _state['inline_workers'] <= 0:
+        return
+    with _start_lock:
+        if _state['started']:
+            return
+        for i in range(_state['inline_workers']):
+            threading.Thread(target=work, name=f'job-worker-{i}', daemon=True).start()
+        _state['started'] = True
+
+
+def init_app(app, db, model, now=None):
+    app.config.setdefault('JOB_ARTIFACT_DIR', os.path.join(app.instance_path, 'job_artifacts'))
+    app.config.setdefault('JOB_LEASE_SECONDS', 120)
+    app.config.setdefault('JOB_POLL_SECONDS', 2)
+    app.config.setdefault('JOB_RETRY_BACKOFF', 30)
+    app.config.setdefault('JOB_INLINE_WORKERS', 1)
+    _state.update(app=app, db=db, model=model, now=now or datetime.now,
+                  artifact_dir=app.config['JOB_ARTIFACT_DIR'],
+                  lease=float(app.config['JOB_LEASE_SECONDS']),
+                  poll=float(app.config['JOB_POLL_SECONDS']),
+                  backoff=float(app.config['JOB_RETRY_BACKOFF']),
+                  inline_workers=int(app.config['JOB_INLINE_WORKERS']))
+    os.makedirs(_state['artifact_dir'], exist_ok=True)
+    # Threads are started lazily so a gunicorn master (preload) never forks with them running
+    app.before_request(ensure_workers)
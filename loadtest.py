@@ -0,0 +1,370 @@
+"""
+loadtest.py — AptitudePro Exam-Spike Load Test
+================================================
+Drives a real server (waitress or gunicorn) with concurrent student and
+admin personas and reports per-route latency percentiles, throughput and
+error rates as JSON so runs can be compared across commits. 429 responses
+from the rate limiter are counted as `limited`, apart from the errors, and
+--serve starts the server with the limits off (--rate-limits keeps them).
+
+    # seed accounts + questions into a scratch DB, start waitress, run 60s
+    DATABASE_URL=sqlite:////tmp/load.db python loadtest.py --seed --serve waitress \\
+        --students 200 --admins 2 --duration 60 --out results.json
+
+    # against an already running server
+    python loadtest.py --url http://localhost:5000 --students 50
+
+    # compare two runs
+    python loadtest.py --compare before.json after.json
+
+Student accounts are expected as student000000, student000001, ... with a
+shared password (see --password), which is what --seed creates.
+
+Personas
+--------
+  student : login → loop { dashboard, heartbeat, start_attempt, submit (optional upload) }
+  admin   : login → loop { notifications poll, occasional admin dashboard }
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTION_ID_RE = re.compile(r'name="question_id" value="(\d+)"')
+
+# Tiny valid PNG used for "upload your solution image" traffic
+PNG_1X1 = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+
+
+def student_username(i):
+    return f"student{i:06d}"
+
+
+# ── Stats ────────────────────────────────────────────────────────────────────
+
+class RouteStats:
+    """Thread-safe latency/error collector keyed by route label."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._errors = {}
+        self._limited = {}
+
+    def record(self, route, elapsed_ms, ok, limited=False):
+        with self._lock:
+            self._latencies.setdefault(route, []).append(elapsed_ms)
+            if limited:
+                self._limited[route] = self._limited.get(route, 0) + 1
+            elif not ok:
+                self._errors[route] = self._errors.get(route, 0) + 1
+
+    def summary(self, wall_sec):
+        def pct(sorted_vals, p):
+            if not sorted_vals:
+                return 0.0
+            idx = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * len(sorted_vals))) - 1))
+            return round(sorted_vals[idx], 2)
+
+        routes = {}
+        total = errors = limited = 0
+        with self._lock:
+            for route, vals in sorted(self._latencies.items()):
+                vals = sorted(vals)
+                errs = self._errors.get(route, 0)
+                refused = self._limited.get(route, 0)
+                total += len(vals)
+                errors += errs
+                limited += refused
+                routes[route] = {
+                    'count': len(vals),
+                    'errors': errs,
+                    'error_rate': round(errs / len(vals), 4),
+                    'limited': refused,
+                    'throughput_rps': round(len(vals) / wall_sec, 2) if wall_sec else 0,
+                    'p50_ms': pct(vals, 50),
+                    'p95_ms': pct(vals, 95),
+                    'p99_ms': pct(vals, 99),
+                    'max_ms': round(vals[-1], 2),
+                }
+        return {
+            'total_requests': total,
+            'total_errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0,
+            'total_limited': limited,
+            'throughput_rps': round(total / wall_sec, 2) if wall_sec else 0,
+            'routes': routes,
+        }
+
+
+class Client:
+    """requests.Session wrapper that times every call under a route label."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def call(self, method, path, label=None, ok_status=(200,), **kwargs):
+        label = label or f"{method} {path}"
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('allow_redirects', False)
+        t0 = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + path, **kwargs)
+            ok = resp.status_code in ok_status
+        except requests.RequestException:
+            resp, ok = None, False
+        limited = resp is not None and resp.status_code == 429
+        self.stats.record(label, (time.perf_counter() - t0) * 1000, ok, limited)
+        return resp
+
+    def login(self, username, password):
+        resp = self.call('POST', '/login', data={'username': username, 'password': password}, ok_status=(302,))
+        # A failed login re-renders the form with 200; a success redirects to the dashboard
+        return resp is not None and resp.status_code == 302
+
+
+# ── Personas ─────────────────────────────────────────────────────────────────
+
+def student_persona(client, username, password, stop, opts, rng):
+    if not client.login(username, password):
+        return
+    question_ids = []
+    while not stop.is_set():
+        resp = client.call('GET', '/student/dashboard')
+        if resp is not None and resp.status_code == 200:
+            question_ids = [int(q) for q in QUESTION_ID_RE.findall(resp.text)]
+
+        for _ in range(opts.heartbeats_per_cycle):
+            client.call('POST', '/api/heartbeat')
+            if stop.wait(opts.think_time * rng.random()):
+                return
+
+        if question_ids:
+            qid = rng.choice(question_ids)
+            client.call('POST', '/student/start_attempt', json={'question_id': qid})
+            stop.wait(opts.think_time * rng.random())
+            files = None
+            if rng.random() < opts.upload_ratio:
+                files = {'file': ('solution.png', PNG_1X1, 'image/png')}
+            client.call('POST', '/api/submit_answer',
+                        data={'question_id': qid, 'selected_option': rng.choice('ABCD')},
+                        files=files, ok_status=(200,))
+        if stop.wait(opts.think_time * rng.random()):
+            return
+
+
+def admin_persona(client, username, password, stop, opts, rng):
+    if not client.login(username, password):
+        return
+    polls = 0
+    while not stop.is_set():
+        client.call('GET', '/admin/notifications')
+        polls += 1
+        if polls % 10 == 0:
+            client.call('GET', '/admin/dashboard')
+        # The layout polls notifications on a fixed interval
+        if stop.wait(opts.admin_poll_interval):
+            return
+
+
+# ── Server / seed helpers ────────────────────────────────────────────────────
+
+def seed(students, questions, password):
+    """Create load-test students and today's questions through the app models."""
+    from werkzeug.security import generate_password_hash
+    from app import app, db, User, Question, get_now_ist
+
+    with app.app_context():
+        pw_hash = generate_password_hash(password)
+        existing = {u for (u,) in db.session.query(User.username).filter(User.username.like('student%'))}
+        new_users = [
+            dict(username=student_username(i), full_name=f"Load Student {i}", password=pw_hash,
+                 visible_password=password, role='student')
+            for i in range(students) if student_username(i) not in existing
+        ]
+        if new_users:
+            db.session.execute(User.__table__.insert(), new_users)
+        today = get_now_ist().date()
+        have = Question.query.filter_by(scheduled_date=today).count()
+        if have < questions:
+            db.session.execute(Question.__table__.insert(), [
+                dict(text=f"Load test question {i}", topic='Load', option_a='1', option_b='2',
+                     option_c='3', option_d='4', correct_answer=random.choice('ABCD'),
+                     timer_minutes=30, timer_days=0, timer_hours=0, timer_seconds=0,
+                     scheduled_date=today, created_at=get_now_ist())
+                for i in range(have, questions)
+            ])
+        db.session.commit()
+    print(f"[LOADTEST] Seeded {len(new_users)} students, {max(0, questions - have)} questions.")
+
+
+def start_server(kind, port, workers, threads, rate_limits=False):
+    env = os.environ.copy()
+    if not rate_limits:
+        # Hundreds of personas from one address would mostly measure the 429 path
+        env['RATE_LIMIT_ENABLED'] = 'false'
+    if kind == 'waitress':
+        cmd = [sys.executable, '-m', 'waitress', f'--port={port}', f'--threads={threads}', 'app:app']
+    else:
+        cmd = ['gunicorn', '-w', str(workers), '--threads', str(threads), '-b', f'127.0.0.1:{port}', 'app:app']
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return proc
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{kind} exited with code {proc.returncode}")
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{kind} did not start listening on port {port}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+
+def run(opts):
+    stats = RouteStats()
+    stop = threading.Event()
+    threads = []
+    rng_root = random.Random(opts.random_seed)
+
+    def spawn(target, username, password):
+        client = Client(opts.url, stats, opts.timeout)
+        rng = random.Random(rng_root.random())
+        t = threading.Thread(target=target, args=(client, username, password, stop, opts, rng), daemon=True)
+        threads.append(t)
+
+    for i in range(opts.students):
+        spawn(student_persona, student_username(i), opts.password)
+    for _ in range(opts.admins):
+        spawn(admin_persona, opts.admin_user, opts.admin_password)
+
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+        if opts.ramp_up:
+            time.sleep(opts.ramp_up / max(1, len(threads)))
+    stop.wait(opts.duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=opts.timeout + 1)
+    wall = time.perf_counter() - t0
+
+    result = stats.summary(wall)
+    result['meta'] = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'url': opts.url,
+        'students': opts.students,
+        'admins': opts.admins,
+        'duration_sec': round(wall, 2),
+        'think_time': opts.think_time,
+        'server': opts.serve,
+        'rate_limits': opts.rate_limits if opts.serve else None,
+    }
+    return result
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'route':40} {'p50':>16} {'p95':>16} {'p99':>16} {'rps':>14} {'err%':>12} {'429s':>12}")
+    for route in sorted(set(before['routes']) | set(after['routes'])):
+        b = before['routes'].get(route, {})
+        a = after['routes'].get(route, {})
+
+        def cell(key, scale=1):
+            return f"{b.get(key, 0) * scale:.1f}→{a.get(key, 0) * scale:.1f}"
+        print(f"{route:40} {cell('p50_ms'):>16} {cell('p95_ms'):>16} {cell('p99_ms'):>16} "
+              f"{cell('throughput_rps'):>14} {cell('error_rate', 100):>12} {cell('limited'):>12}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Exam-spike load test for AptitudePro")
+    p.add_argument('--url', default=None, help="Base URL of a running server (default: the --serve one)")
+    p.add_argument('--serve', choices=['waitress', 'gunicorn'], help="Start a server for the duration of the run")
+    p.add_argument('--port', type=int, default=5077)
+    p.add_argument('--workers', type=int, default=2, help="gunicorn workers")
+    p.add_argument('--server-threads', type=int, default=8)
+    p.add_argument('--rate-limits', action='store_true', help="Keep the rate limits on in the --serve server")
+    p.add_argument('--seed', action='store_true', help="Create students/questions before the run")
+    p.add_argument('--questions', type=int, default=10, help="Questions to seed for today")
+    p.add_argument('--students', type=int, default=20)
+    p.add_argument('--admins', type=int, default=1)
+    p.add_argument('--password', default='loadtest')
+    p.add_argument('--admin-user', default='admin')
+    p.add_argument('--admin-password', default='admin123')
+    p.add_argument('--duration', type=float, default=30.0)
+    p.add_argument('--ramp-up', type=float, default=5.0, help="Seconds over which personas start")
+    p.add_argument('--think-time', type=float, default=1.0, help="Max random pause between actions")
+    p.add_argument('--heartbeats-per-cycle', type=int, default=2)
+    p.add_argument('--upload-ratio', type=float, default=0.3, help="Share of submissions with an image")
+    p.add_argument('--admin-poll-interval', type=float, default=5.0)
+    p.add_argument('--timeout', type=float, default=30.0)
+    p.add_argument('--random-seed', type=int, default=42)
+    p.add_argument('--out', help="Write the JSON report to this file (default: stdout)")
+    p.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Diff two JSON reports and exit")
+    opts = p.parse_args(argv)
+
+    if opts.compare:
+        compare(*opts.compare)
+        return
+
+    if opts.seed:
+        seed(opts.students, opts.questions, opts.password)
+
+    proc = None
+    if opts.serve:
+        proc = start_server(opts.serve, opts.port, opts.workers, opts.server_threads, opts.rate_limits)
+        opts.url = opts.url or f"http://127.0.0.1:{opts.port}"
+    opts.url = opts.url or "http://localhost:5000"
+
+    try:
+        print(f"[LOADTEST] {opts.students} students + {opts.admins} admins → {opts.url} for {opts.duration}s",
+              file=sys.stderr)
+        result = run(opts)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = json.dumps(result, indent=2)
+    if opts.out:
+        with open(opts.out, 'w') as f:
+            f.write(report)
+        print(f"[LOADTEST] ✅ Report written to {opts.out}", file=sys.stderr)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
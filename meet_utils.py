@@ -1,8 +1,29 @@
-import requests
-from bs4 import BeautifulSoup
 import re
+from concurrent.futures import ThreadPoolExecutor
 
-def get_meet_info(url):
+# requests / BeautifulSoup are imported inside get_meet_info(): they cost
+# ~100 ms at import time and are only needed when a link is actually checked.
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+def make_session(pool_size=10):
+    """A requests.Session whose connection pool is shared by all checker threads."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_meet_info(url, session=None, timeout=8):
     """
     Attempts to fetch basic info from a Google Meet link.
     Returns a dictionary with 'title' and 'status'.
@@ -10,6 +31,9 @@ def get_meet_info(url):
     if not url:
         return {"title": "No Link", "status": "Inactive"}
 
+    import requests
+    from bs4 import BeautifulSoup
+
     # Extract meeting ID as fallback
     meeting_id = "Unknown"
     match = re.search(r'meet\.google\.com/([a-z0-9-]+)', url)
@@ -19,13 +43,9 @@ def get_meet_info(url):
         meeting_id = "New Meeting"
 
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9',
-        }
         # We use a session for potential redirects and cookies
-        session = requests.Session()
-        response = session.get(url, headers=headers, timeout=8, allow_redirects=True)
+        session = session or requests.Session()
+        response = session.get(url, headers=HEADERS, timeout=timeout, allow_redirects=True)
         
         if response.status_code != 200:
             return {"title": f"Meeting {meeting_id} (Code {response.status_code})", "status": "Inaccessible"}
@@ -58,6 +78,23 @@ def get_meet_info(url):
         print(f"Scraping error: {e}")
         return {"title": f"Meeting {meeting_id} (Scrape Failed)", "status": "Unknown"}
 
+
+def check_links(urls, workers=8, timeout=5):
+    """
+    Check `urls` concurrently on a thread pool sharing one HTTP connection
+    pool. Returns {url: info}; blank and repeated URLs are skipped.
+    """
+    urls = list(dict.fromkeys(u for u in urls if u))
+    if not urls:
+        return {}
+    session = make_session(workers)
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, len(urls)), thread_name_prefix='meet-check') as pool:
+            return dict(zip(urls, pool.map(lambda url: get_meet_info(url, session=session, timeout=timeout), urls)))
+    finally:
+        session.close()
+
+
 if __name__ == "__main__":
     # Test
     test_url = "https://meet.google.com/abc-defg-hij"
@@ -0,0 +1,182 @@
+"""
+metrics.py — Prometheus metrics for AptitudePro.
+
+Exposes request latency histograms per route, in-flight requests, DB pool
+checkout wait, DB statement counts, cache hit/miss counters and domain
+counters (submissions, logins, heartbeats, active attempts) on /metrics
+in the Prometheus text format.
+
+Across gunicorn workers the values are aggregated through
+prometheus_client's file-backed multiprocess mode: set
+PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does this) and every worker
+writes to mmap'd files in that directory, which /metrics merges on scrape.
+
+prometheus_client is optional — without it every helper here is a no-op
+and /metrics answers 503.
+
+Hot path cost is one histogram observe + two counter/gauge updates per
+request; statement counts are taken from sql_instrumentation's per-request
+record instead of a second cursor listener.
+"""
+
+import os
+import time
+
+from flask import g, request
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    prometheus_client = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+_m = {}
+
+
+def enabled():
+    return bool(_m)
+
+
+def _multiproc_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def _create_metrics():
+    _m['latency'] = Histogram('aptipro_http_request_duration_seconds', 'Request latency by route',
+                              ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+    _m['requests'] = Counter('aptipro_http_requests_total', 'Requests by route and status',
+                             ['endpoint', 'method', 'status'])
+    _m['in_flight'] = Gauge('aptipro_http_requests_in_flight', 'Requests currently being served',
+                            multiprocess_mode='livesum')
+    _m['pool_wait'] = Histogram('aptipro_db_pool_checkout_wait_seconds',
+                                'Time spent waiting for a pooled DB connection', buckets=POOL_WAIT_BUCKETS)
+    _m['db_queries'] = Counter('aptipro_db_queries_total', 'SQL statements executed', ['endpoint'])
+    _m['db_seconds'] = Counter('aptipro_db_query_seconds_total', 'Time spent in SQL statements', ['endpoint'])
+    _m['cache'] = Counter('aptipro_cache_requests_total', 'Cache lookups by result', ['cache', 'result'])
+    _m['submissions'] = Counter('aptipro_submissions_total', 'Answer submissions', ['status'])
+    _m['logins'] = Counter('aptipro_logins_total', 'Login attempts', ['status'])
+    _m['heartbeats'] = Counter('aptipro_heartbeats_total', 'Student heartbeats')
+    _m['rate_limited'] = Counter('aptipro_rate_limited_total', 'Requests refused by a rate limit', ['policy'])
+    _m['active_attempts'] = Gauge('aptipro_active_attempts', 'Attempts started and still within their timer',
+                                  multiprocess_mode='mostrecent')
+
+
+# ── Domain helpers (safe to call when metrics are disabled) ──────────────────
+
+def count_submission(status):
+    if _m:
+        _m['submissions'].labels(status).inc()
+
+
+def count_login(status):
+    if _m:
+        _m['logins'].labels(status).inc()
+
+
+def count_heartbeat():
+    if _m:
+        _m['heartbeats'].inc()
+
+
+def count_rate_limited(policy):
+    if _m:
+        _m['rate_limited'].labels(policy).inc()
+
+
+def cache_hit(cache):
+    if _m:
+        _m['cache'].labels(cache, 'hit').inc()
+
+
+def cache_miss(cache):
+    if _m:
+        _m['cache'].labels(cache, 'miss').inc()
+
+
+def count_cache(cache, hit):
+    """on_cache callback for the generic modules (versions, compression)."""
+    (cache_hit if hit else cache_miss)(cache)
+
+
+# ── Request hooks ────────────────────────────────────────────────────────────
+
+def _start_request():
+    g._metrics_t0 = time.perf_counter()
+    g._metrics_in_flight = True
+    _m['in_flight'].inc()
+
+
+def _finish_request(response):
+    t0 = g.pop('_metrics_t0', None)
+    if t0 is None:
+        return response
+    endpoint = request.endpoint or '<unmatched>'
+    _m['latency'].labels(endpoint, request.method).observe(time.perf_counter() - t0)
+    _m['requests'].labels(endpoint, request.method, str(response.status_code)).inc()
+    # Runs before sql_instrumentation's after_request (registered later → called earlier)
+    rec = g.get('_sql')
+    if rec is not None and rec['queries']:
+        _m['db_queries'].labels(endpoint).inc(rec['queries'])
+        _m['db_seconds'].labels(endpoint).inc(rec['db_ms'] / 1000.0)
+    return response
+
+
+def _teardown_request(exc):
+    # Teardown runs even when a view raised, so the gauge can't drift upwards
+    if g.pop('_metrics_in_flight', False):
+        _m['in_flight'].dec()
+
+
+def instrument_pool(engine):
+    """Time pool checkouts by wrapping the pool's internal getter (re-apply after engine.dispose())."""
+    pool = engine.pool
+    if getattr(pool, '_aptipro_timed', False) or not hasattr(pool, '_do_get'):
+        return
+    original = pool._do_get
+    observe = _m['pool_wait'].observe
+
+    def timed_do_get():
+        t0 = time.perf_counter()
+        try:
+            return original()
+        finally:
+            observe(time.perf_counter() - t0)
+
+    pool._do_get = timed_do_get
+    pool._aptipro_timed = True
+
+
+def render(active_attempts=None):
+    """Prometheus exposition text for all workers (or this process outside multiprocess mode)."""
+    if active_attempts is not None:
+        _m['active_attempts'].set(active_attempts)
+    if _multiproc_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+def is_local_request():
+    """Loopback callers without a proxy hop, or a matching METRICS_TOKEN bearer."""
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        return True
+    return request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+
+
+def init_app(app, db):
+    app.config.setdefault('METRICS_ENABLED', True)
+    if prometheus_client is None or not app.config['METRICS_ENABLED']:
+        return
+    if not _m:
+        _create_metrics()
+    with app.app_context():
+        instrument_pool(db.engine)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
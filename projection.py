@@ -0,0 +1,67 @@
+"""
+projection.py — slotted, read-only rows for list pages.
+
+A list page that loads ORM entities pays for every column (blobs
+included), an InstanceState and a __dict__ per object, and identity-map
+bookkeeping, while its template reads three or four fields. A projection
+selects only the columns it names and copies each result row into a
+__slots__ object that no session knows about:
+
+    QuestionRow = projection.define('QuestionRow', Question.id, Question.text, Question.topic)
+    rows = QuestionRow.all(QuestionRow.query(db.session).order_by(Question.created_at.desc()))
+
+Subclass a projection to add derived values; extra slots are filled by
+keyword and default to None:
+
+    class MemberRow(projection.define('MemberBase', User.id, User.username)):
+        __slots__ = ('answer_count',)
+
+        @property
+        def has_answered(self):
+            return bool(self.answer_count)
+
+Rows are not attached to anything, so changing one writes nothing back,
+and a lazy relationship on the entity is simply not there.
+"""
+
+
+class Row:
+    __slots__ = ()
+    columns = ()
+    fields = ()
+    extra = ()  # slots added by subclasses, filled by keyword
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.extra = tuple(name for klass in reversed(cls.__mro__)
+                          for name in klass.__dict__.get('__slots__', ()) if name not in cls.fields)
+
+    def __init__(self, *values, **extra):
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
+        for name in self.extra:
+            setattr(self, name, extra.get(name))
+
+    @classmethod
+    def query(cls, session):
+        """A Query selecting exactly this projection's columns, to filter and order further."""
+        return session.query(*cls.columns)
+
+    @classmethod
+    def all(cls, rows, **extra):
+        """Rows (an iterable of result tuples, e.g. a Query) as projection objects."""
+        return [cls(*row, **extra) for row in rows]
+
+    def asdict(self):
+        return {name: getattr(self, name) for name in self.fields}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{n}={getattr(self, n)!r}' for n in self.fields)})"
+
+
+def define(name, *columns):
+    """A Row subclass holding `columns` (ORM attributes or labelled expressions), named by key."""
+    fields = tuple(column.key for column in columns)
+    if len(set(fields)) != len(fields):
+        raise ValueError(f"{name}: duplicate column names {fields}; label them apart")
+    return type(name, (Row,), {'__slots__': fields, 'columns': columns, 'fields': fields})
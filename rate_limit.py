@@ -0,0 +1,329 @@
+"""
+rate_limit.py — token-bucket rate limits shared by the workers on one host.
+
+Each policy is a bucket of `capacity` tokens that refills evenly over
+`period` seconds, written "capacity/period" ("10/60" allows bursts of 10
+and 10 a minute after that). Routes take one token per request from the
+bucket of their key:
+
+    @app.route('/login', methods=['GET', 'POST'])
+    @rate_limit.limit('login_ip', key='ip', methods=('POST',))
+    @rate_limit.limit('login_account', key=lambda: request.form.get('username'), methods=('POST',))
+    def login(): ...
+
+    @app.route('/messages/send', methods=['POST'])
+    @login_required
+    @rate_limit.limit('message')            # key='user': the logged-in user, else the IP
+    def send_message(): ...
+
+A request that finds its bucket empty gets 429 with Retry-After (JSON for
+/api/ routes and JSON requests, plain text otherwise) and the view is not
+run. A key function that returns None or '' skips the limit.
+
+key='ip' needs RATE_LIMIT_PROXY_HOPS behind a proxy (nginx, Render,
+Vercel). A request carrying X-Forwarded-For while it is 0 skips the per-IP
+limits, with a warning, instead of sharing the proxy's address.
+
+Buckets live in a small SQLite file (RATE_LIMIT_STORAGE, default
+instance/ratelimit.db) that every gunicorn worker on the host opens, so a
+client cannot multiply its allowance by the number of workers. A check
+is a primary-key read plus the bucket and counter upserts in one write
+transaction (synchronous=OFF: losing the last buckets on a crash only
+refills them early). Buckets that have refilled completely are pruned once
+a minute.
+RATE_LIMIT_STORAGE=memory keeps them per process instead (tests, single
+worker). When the file cannot be used the request is allowed and the error
+is counted — a broken limiter never locks students out.
+
+Allowed / limited counts per policy and the keys limited most over the
+last day are kept in the same store for the admin page (stats()).
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_login import current_user
+
+log = logging.getLogger(__name__)
+
+Policy = namedtuple('Policy', 'name capacity period')
+
+_state = {'policies': {}, 'store': None, 'proxy_hops': 0, 'enabled': True, 'on_limited': None, 'errors': 0,
+          'unknown_ip': 0}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, at REAL NOT NULL,"
+    " full_at REAL NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_bucket_full_at ON bucket (full_at)",
+    "CREATE TABLE IF NOT EXISTS counter (policy TEXT NOT NULL, outcome TEXT NOT NULL, n INTEGER NOT NULL,"
+    " PRIMARY KEY (policy, outcome)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS limited (key TEXT PRIMARY KEY, policy TEXT NOT NULL, n INTEGER NOT NULL,"
+    " last_at REAL NOT NULL) WITHOUT ROWID",
+)
+
+
+def parse(name, spec):
+    """Policy from "capacity/period"; None when the spec is empty or "0" (limit off)."""
+    spec = (spec or '').strip()
+    if spec in ('', '0'):
+        return None
+    try:
+        capacity, period = spec.split('/')
+        policy = Policy(name, int(capacity), float(period))
+    except ValueError:
+        raise ValueError(f"Rate limit {name}: expected 'capacity/seconds', got {spec!r}") from None
+    if policy.capacity < 1 or policy.period <= 0:
+        raise ValueError(f"Rate limit {name}: capacity and period must be positive, got {spec!r}")
+    return policy
+
+
+def _refill(policy, tokens, at, now):
+    return min(policy.capacity, tokens + (now - at) * policy.capacity / policy.period)
+
+
+def _full_at(policy, tokens, now):
+    """When a bucket holding `tokens` at `now` will be full again (and can be forgotten)."""
+    return now + (policy.capacity - tokens) * policy.period / policy.capacity
+
+
+class MemoryStore:
+    """Buckets in this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._counters = {}
+        self._limited = {}
+
+    def take(self, policy, key, now):
+        with self._lock:
+            tokens, at, _ = self._buckets.get(key, (policy.capacity, now, now))
+            tokens = _refill(policy, tokens, at, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, _full_at(policy, tokens, now))
+            outcome = 'allowed' if allowed else 'limited'
+            self._counters[policy.name, outcome] = self._counters.get((policy.name, outcome), 0) + 1
+            if not allowed:
+                n = self._limited.get(key, (policy.name, 0, now))[1]
+                self._limited[key] = (policy.name, n + 1, now)
+            if len(self._buckets) > 10000:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] >= now}
+            return allowed, tokens
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def top_limited(self, limit):
+        with self._lock:
+            rows = sorted(self._limited.items(), key=lambda kv: kv[1][1], reverse=True)[:limit]
+        return [(key, policy, n, at) for key, (policy, n, at) in rows]
+
+    def active(self):
+        now = time.time()
+        with self._lock:
+            return sum(1 for _, _, full_at in self._buckets.values() if full_at >= now)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._limited.clear()
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file shared by every process that opens it."""
+
+    def __init__(self, path, timeout=2.0):
+        self.path, self.timeout = path, timeout
+        self._local = threading.local()
+        self._pruned_at = 0.0
+        conn = self._connect()
+        for statement in _SCHEMA:
+            conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():  # never reuse a connection across fork()
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, policy, key, now):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, at FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(policy, *row, now) if row else float(policy.capacity)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute("INSERT INTO bucket (key, tokens, at, full_at) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, at = excluded.at, "
+                         "full_at = excluded.full_at", (key, tokens, now, _full_at(policy, tokens, now)))
+            conn.execute("INSERT INTO counter (policy, outcome, n) VALUES (?, ?, 1) "
+                         "ON CONFLICT (policy, outcome) DO UPDATE SET n = n + 1",
+                         (policy.name, 'allowed' if allowed else 'limited'))
+            if not allowed:
+                conn.execute("INSERT INTO limited (key, policy, n, last_at) VALUES (?, ?, 1, ?) "
+                             "ON CONFLICT (key) DO UPDATE SET n = n + 1, last_at = excluded.last_at",
+                             (key, policy.name, now))
+            if now - self._pruned_at > 60:
+                self._pruned_at = now
+                conn.execute("DELETE FROM bucket WHERE full_at < ?", (now,))
+                conn.execute("DELETE FROM limited WHERE last_at < ?", (now - 86400,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def counters(self):
+        rows = self._connect().execute("SELECT policy, outcome, n FROM counter")
+        return {(policy, outcome): n for policy, outcome, n in rows}
+
+    def top_limited(self, limit):
+        return self._connect().execute(
+            "SELECT key, policy, n, last_at FROM limited ORDER BY n DESC LIMIT ?", (limit,)).fetchall()
+
+    def active(self):
+        return self._connect().execute("SELECT count(*) FROM bucket WHERE full_at >= ?", (time.time(),)).fetchone()[0]
+
+    def reset(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM counter")
+        conn.execute("DELETE FROM limited")
+
+
+def client_ip():
+    """The client's address; with RATE_LIMIT_PROXY_HOPS = n, the n-th X-Forwarded-For entry from the right.
+
+    None when X-Forwarded-For arrives but no hops are configured: the socket
+    address is then most likely the proxy's, shared by every client, so the
+    per-IP limits are skipped rather than putting the whole site in one bucket.
+    """
+    hops = _state['proxy_hops']
+    route = request.access_route
+    if hops and len(route) >= hops:
+        return route[-hops]
+    if not hops and 'X-Forwarded-For' in request.headers:
+        if not _state['unknown_ip']:
+            log.warning("X-Forwarded-For received but RATE_LIMIT_PROXY_HOPS is 0; per-IP limits are skipped "
+                        "until it is set (see DEPLOYMENT.md)")
+        _state['unknown_ip'] += 1
+        return None
+    return request.remote_addr or 'unknown'
+
+
+def _ip_key():
+    ip = client_ip()
+    return f"ip:{ip}" if ip else None
+
+
+def _user_key():
+    if current_user and current_user.is_authenticated:
+        return f"user:{current_user.get_id()}"
+    return _ip_key()
+
+
+_KEYS = {'ip': _ip_key, 'user': _user_key}
+
+
+def check(name, key):
+    """(allowed, retry_after seconds) for one request against policy `name` for `key`."""
+    policy = _state['policies'].get(name)
+    store = _state['store']
+    if policy is None or store is None or not _state['enabled']:
+        return True, 0
+    try:
+        allowed, tokens = store.take(policy, f"{name}:{key}", time.time())
+    except sqlite3.Error as exc:
+        _state['errors'] += 1
+        log.warning("Rate limiter unavailable, allowing request: %s", exc)
+        return True, 0
+    if allowed:
+        return True, 0
+    if _state['on_limited']:
+        _state['on_limited'](name)
+    return False, max(1, math.ceil((1 - tokens) * policy.period / policy.capacity))
+
+
+def too_many_requests(retry_after):
+    message = f"Too many requests. Try again in {retry_after} seconds."
+    if request.path.startswith('/api/') or request.is_json or \
+            request.accept_mimetypes.best == 'application/json':
+        response = jsonify(error='Too many requests', retry_after=retry_after)
+    else:
+        response = current_app.response_class(message, mimetype='text/plain')
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def limit(name, key='user', methods=None):
+    """Decorator: one token from policy `name` per request (only for `methods`, if given)."""
+    key_func = _KEYS[key] if isinstance(key, str) else key
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if methods is None or request.method in methods:
+                value = key_func()
+                if value:
+                    allowed, retry_after = check(name, str(value).lower())
+                    if not allowed:
+                        return too_many_requests(retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stats(top=20):
+    """Per-policy settings and counts, plus the keys limited most, for the admin page."""
+    store = _state['store']
+    counters = store.counters() if store else {}
+    policies = [{'name': p.name, 'capacity': p.capacity, 'period': p.period,
+                 'allowed': counters.get((p.name, 'allowed'), 0), 'limited': counters.get((p.name, 'limited'), 0)}
+                for p in _state['policies'].values()]
+    return {
+        'enabled': _state['enabled'] and store is not None,
+        'storage': 'memory' if isinstance(store, MemoryStore) else getattr(store, 'path', None),
+        'policies': policies,
+        'top_limited': [{'key': k, 'policy': p, 'count': n, 'last_at': at} for k, p, n, at in
+                        (store.top_limited(top) if store else [])],
+        'active_buckets': store.active() if store else 0,
+        'errors': _state['errors'],
+        'unknown_ip': _state['unknown_ip'],
+    }
+
+
+def reset_counters():
+    if _state['store']:
+        _state['store'].reset()
+
+
+def init_app(app, policies, on_limited=None):
+    """`policies` maps policy name to its "capacity/period" spec; `on_limited(name)` is called per 429."""
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMIT_STORAGE', os.path.join(app.instance_path, 'ratelimit.db'))
+    app.config.setdefault('RATE_LIMIT_PROXY_HOPS', 0)
+    parsed = {name: parse(name, spec) for name, spec in policies.items()}
+    storage = app.config['RATE_LIMIT_STORAGE']
+    _state.update(policies={name: p for name, p in parsed.items() if p}, on_limited=on_limited,
+                  enabled=bool(app.config['RATE_LIMIT_ENABLED']),
+                  proxy_hops=int(app.config['RATE_LIMIT_PROXY_HOPS']), errors=0, unknown_ip=0)
+    try:
+        _state['store'] = MemoryStore() if storage == 'memory' else SQLiteStore(storage)
+    except sqlite3.Error as exc:
+        log.warning("Rate limit store %s unusable (%s); limiting per process instead", storage, exc)
+        _state['store'] = MemoryStore()
@@ -0,0 +1,218 @@
+"""
+request_profiler.py — on-demand request profiling for AptitudePro admins.
+
+A request is profiled when it carries a signed profiling token (query
+`?_profile=<token>` or header `X-Profile-Token`), when a logged-in admin
+adds `?_profile=1`, or when it falls into the PROFILE_SAMPLE_RATE sample.
+Tokens are minted from the admin profiles page and expire after
+PROFILE_TOKEN_MAX_AGE seconds.
+
+For a profiled request we record:
+  • a cProfile call profile (top functions by cumulative time, .prof dump),
+  • wall-clock stack samples from a sampler thread, exported as folded
+    stacks ("a;b;c 12") for flamegraph.pl / speedscope,
+  • the SQL timeline from sql_instrumentation.
+
+Results are JSON files in instance/profiles/, capped at PROFILE_MAX_FILES
+(oldest removed first). Requests that are not profiled only pay for the
+trigger check; no profiler or thread is started for them.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+_state = {'dir': None, 'max_files': 50, 'sample_rate': 0.0, 'max_age': 3600, 'interval': 0.001,
+          'serializer': None, 'is_admin': None}
+
+
+def make_token():
+    """A signed, expiring token that turns on profiling for whoever presents it."""
+    return _state['serializer'].dumps('profile')
+
+
+def _valid_token(token):
+    try:
+        return _state['serializer'].loads(token, max_age=_state['max_age']) == 'profile'
+    except BadSignature:
+        return False
+
+
+def _should_profile():
+    flag = request.args.get('_profile') or request.headers.get('X-Profile-Token')
+    if flag:
+        if flag == '1':
+            return bool(_state['is_admin'] and _state['is_admin']())
+        return _valid_token(flag)
+    rate = _state['sample_rate']
+    return rate > 0 and random.random() < rate
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _start():
+    if not _should_profile():
+        return
+    sampler = _StackSampler(threading.get_ident(), _state['interval'])
+    profiler = cProfile.Profile()
+    g._profile = {'t0': time.perf_counter(), 'profiler': profiler, 'sampler': sampler}
+    sampler.start()
+    profiler.enable()
+
+
+def _top_functions(profiler, limit=40):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, lineno, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({'function': func, 'file': f"{os.path.basename(filename)}:{lineno}",
+                     'calls': nc, 'self_ms': round(tt * 1000, 3), 'cum_ms': round(ct * 1000, 3)})
+    rows.sort(key=lambda r: r['cum_ms'], reverse=True)
+    return rows[:limit]
+
+
+def _finish(response):
+    prof = g.pop('_profile', None)
+    if prof is None:
+        return response
+    prof['profiler'].disable()
+    prof['sampler'].stop()
+    total_ms = (time.perf_counter() - prof['t0']) * 1000
+
+    sql = g.get('_sql') or {}
+    profile_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{(request.endpoint or 'unmatched')}"
+    record = {
+        'id': profile_id,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'status': response.status_code,
+        'total_ms': round(total_ms, 2),
+        'db_ms': round(sql.get('db_ms', 0.0), 2),
+        'queries': sql.get('queries', 0),
+        'top_functions': _top_functions(prof['profiler']),
+        'sql_timeline': [{'offset_ms': round(o, 2), 'ms': round(d, 2), 'sql': ' '.join(s.split())[:1000]}
+                         for o, d, s in sql.get('timeline', [])],
+        'folded': prof['sampler'].counts,
+    }
+    try:
+        _save(record, prof['profiler'])
+        response.headers['X-Profile-Id'] = profile_id
+    except OSError:
+        pass  # profiling must never break the request
+    return response
+
+
+def _save(record, profiler):
+    os.makedirs(_state['dir'], exist_ok=True)
+    base = os.path.join(_state['dir'], record['id'])
+    with open(base + '.json', 'w') as f:
+        json.dump(record, f)
+    profiler.dump_stats(base + '.prof')
+    _rotate()
+
+
+def _rotate():
+    files = sorted(f for f in os.listdir(_state['dir']) if f.endswith('.json'))
+    for name in files[:max(0, len(files) - _state['max_files'])]:
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(_state['dir'], name[:-5] + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _path_for(profile_id, ext):
+    # Ids are generated by us; refuse anything that could escape the directory
+    if os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(_state['dir'], profile_id + ext)
+    return path if os.path.exists(path) else None
+
+
+def list_profiles(limit=50):
+    """Most recent first; each entry is the stored record without the bulky parts."""
+    if not os.path.isdir(_state['dir']):
+        return []
+    out = []
+    for name in sorted((f for f in os.listdir(_state['dir']) if f.endswith('.json')), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(_state['dir'], name)) as f:
+                rec = json.load(f)
+        except (OSError, ValueError):
+            continue
+        rec['top_functions'] = rec['top_functions'][:5]
+        rec.pop('folded', None)
+        rec.pop('sql_timeline', None)
+        out.append(rec)
+    return out
+
+
+def load_profile(profile_id):
+    path = _path_for(profile_id, '.json')
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def pstats_path(profile_id):
+    return _path_for(profile_id, '.prof')
+
+
+def folded_stacks(record):
+    """Brendan Gregg's collapsed format, one "frame;frame;frame count" per line."""
+    return ''.join(f"{stack} {count}\n" for stack, count in sorted(record.get('folded', {}).items()))
+
+
+def init_app(app, is_admin=None):
+    """`is_admin` is a zero-arg callable used to honour `?_profile=1` for logged-in admins."""
+    app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config.setdefault('PROFILE_MAX_FILES', 50)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILE_TOKEN_MAX_AGE', 3600)
+    _state.update(
+        dir=app.config['PROFILE_DIR'],
+        max_files=int(app.config['PROFILE_MAX_FILES']),
+        sample_rate=float(app.config['PROFILE_SAMPLE_RATE']),
+        max_age=int(app.config['PROFILE_TOKEN_MAX_AGE']),
+        serializer=URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='request-profile'),
+        is_admin=is_admin,
+    )
+    app.before_request(_start)
+    app.after_request(_finish)
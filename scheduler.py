@@ -0,0 +1,253 @@
+"""
+scheduler.py — periodic tasks that run in exactly one worker per tick.
+
+Tasks are registered with a cron spec read against the app's clock (IST):
+
+    @scheduler.task('log_retention', '15 3 * * *')    # 03:15 IST every day
+    def log_retention():
+        ...
+        return "1,204 rows removed"                    # shown on the dashboard
+
+Specs use the usual five fields (minute, hour, day of month, month, day of
+week with 0 = Sunday). Each field takes *, lists, ranges and */step. The
+shortcuts @hourly, @daily and @weekly also work.
+
+Every web process runs a scheduler thread that wakes every
+SCHEDULER_POLL_SECONDS. Each task has a row in `scheduled_task` holding its
+next_run_at. A due task is claimed with one conditional UPDATE that moves
+next_run_at forward and takes a lease (lease_owner / lease_until). Only the
+process whose UPDATE matched runs that tick, however many gunicorn workers
+are polling. While the lease is held (up to SCHEDULER_LEASE_SECONDS) the
+task is not started again, even if its next tick comes round. Ticks missed
+while nothing was running are run once, not replayed.
+
+The outcome, duration and failure count of the last run are kept on the row
+for the admin dashboard. Heavy work (backups, exports) should be handed to
+job_queue rather than run on the scheduler thread.
+"""
+
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+ALIASES = {'@hourly': '0 * * * *', '@daily': '0 0 * * *', '@weekly': '0 0 * * 0'}
+
+_state = {'app': None, 'db': None, 'model': None, 'now': datetime.now, 'enabled': True,
+          'poll': 30.0, 'lease': 600.0, 'started': False, 'synced': False}
+_tasks = {}
+_start_lock = threading.Lock()
+
+
+class CronSpec:
+    """A parsed five-field cron expression."""
+
+    FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 6))
+
+    def __init__(self, spec):
+        self.spec = spec
+        parts = ALIASES.get(spec.strip(), spec).split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron spec needs 5 fields: {spec!r}")
+        for (name, lo, hi), part in zip(self.FIELDS, parts):
+            setattr(self, name, self._parse(part, lo, hi, spec))
+        self.weekday = {d % 7 for d in self.weekday}  # accept 7 as Sunday too
+        # Standard cron: when both day fields are restricted, either one matching is enough
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse(part, lo, hi, spec):
+        values = set()
+        for item in part.split(','):
+            rng, _, step = item.partition('/')
+            if rng == '*':
+                start, end = lo, hi
+            elif '-' in rng:
+                start, end = (int(x) for x in rng.split('-', 1))
+            else:
+                start = end = int(rng)
+                if step:
+                    end = hi
+            if not (lo <= start <= end <= (7 if hi == 6 else hi)):
+                raise ValueError(f"Cron field {item!r} out of range in {spec!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, d):
+        dom = d.day in self.day
+        dow = (d.weekday() + 1) % 7 in self.weekday  # Python: Monday=0; cron: Sunday=0
+        if self._any_day or self._any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, dt):
+        """The first matching minute strictly after `dt`."""
+        start = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 5):  # enough to find 29 February
+            if day.month in self.month and self._day_matches(day):
+                for hour in sorted(self.hour):
+                    for minute in sorted(self.minute):
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron spec never matches: {self.spec!r}")
+
+
+def task(name, spec):
+    """Register `fn()` to run on `spec`. Its return value is recorded as the run's message."""
+    cron = CronSpec(spec)
+
+    def register(fn):
+        _tasks[name] = {'fn': fn, 'spec': spec, 'cron': cron}
+        return fn
+    return register
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock across the processes on this host (no-op where fcntl is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _table():
+    return _state['model'].__table__
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def sync():
+    """Create the row for each registered task and reschedule tasks whose spec has changed."""
+    t, now = _table(), _state['now']()
+    engine = _state['db'].engine
+    for name, info in _tasks.items():
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(t).values(name=name, spec=info['spec'], run_count=0, failure_count=0,
+                                              next_run_at=info['cron'].next_after(now)))
+        except IntegrityError:  # another worker (or an earlier boot) created it
+            with engine.begin() as conn:
+                conn.execute(update(t).where(t.c.name == name, or_(t.c.spec != info['spec'], t.c.spec.is_(None)))
+                             .values(spec=info['spec'], next_run_at=info['cron'].next_after(now)))
+    _state['synced'] = True
+
+
+def _claim(name, due_at, now):
+    t = _table()
+    with _state['db'].engine.begin() as conn:
+        return conn.execute(
+            update(t)
+            .where(t.c.name == name, t.c.next_run_at == due_at,
+                   or_(t.c.lease_until.is_(None), t.c.lease_until < now))
+            .values(next_run_at=_tasks[name]['cron'].next_after(now), lease_owner=_owner(),
+                    lease_until=now + timedelta(seconds=_state['lease']), last_started_at=now)
+        ).rowcount == 1
+
+
+def _run(name):
+    t0 = time.perf_counter()
+    try:
+        with _state['app'].app_context():
+            try:
+                message = _tasks[name]['fn']()
+            finally:
+                _state['db'].session.remove()
+        values = {'last_status': 'ok', 'last_message': str(message or 'Done')[:255], 'last_error': None}
+    except Exception as exc:
+        print(f"  [SCHED] Task {name} failed: {exc!r}")
+        values = {'last_status': 'failed', 'last_message': f"{type(exc).__name__}: {exc}"[:255],
+                  'last_error': traceback.format_exc()[-4000:]}
+    t = _table()
+    with _state['db'].engine.begin() as conn:
+        conn.execute(update(t).where(t.c.name == name, t.c.lease_owner == _owner()).values(
+            lease_owner=None, lease_until=None, last_finished_at=_state['now'](),
+            last_duration_ms=round((time.perf_counter() - t0) * 1000, 1),
+            run_count=t.c.run_count + 1,
+            failure_count=t.c.failure_count + (1 if values['last_status'] == 'failed' else 0),
+            **values))
+    return values['last_status']
+
+
+def tick():
+    """Run every task that is due and not leased elsewhere. Returns the names this process ran."""
+    if not _state['synced']:
+        sync()
+    t, now = _table(), _state['now']()
+    with _state['db'].engine.connect() as conn:
+        due = conn.execute(
+            select(t.c.name, t.c.next_run_at)
+            .where(t.c.name.in_(list(_tasks)), t.c.next_run_at <= now,
+                   or_(t.c.lease_until.is_(None), t.c.lease_until < now))
+            .order_by(t.c.next_run_at)
+        ).all()
+    ran = []
+    for name, due_at in due:
+        if _claim(name, due_at, now):
+            _run(name)
+            ran.append(name)
+    return ran
+
+
+def run_now(name):
+    """Make a task due immediately; the next tick (in whichever worker) runs it."""
+    t = _table()
+    with _state['db'].engine.begin() as conn:
+        return conn.execute(update(t).where(t.c.name == name).values(next_run_at=_state['now']())).rowcount == 1
+
+
+def run_forever(stop=None):
+    stop = stop or threading.Event()
+    with _state['app'].app_context():
+        while True:
+            try:
+                tick()
+            except Exception as exc:  # database unreachable — try again next poll
+                print(f"  [SCHED] Tick failed: {exc!r}")
+            if stop.wait(_state['poll']):
+                return
+
+
+def ensure_started():
+    """Start this process's scheduler thread (once)."""
+    if _state['started'] or not _state['enabled']:
+        return
+    with _start_lock:
+        if _state['started']:
+            return
+        threading.Thread(target=run_forever, name='scheduler', daemon=True).start()
+        _state['started'] = True
+
+
+def init_app(app, db, model, now=None):
+    app.config.setdefault('SCHEDULER_ENABLED', True)
+    app.config.setdefault('SCHEDULER_POLL_SECONDS', 30)
+    app.config.setdefault('SCHEDULER_LEASE_SECONDS', 600)
+    _state.update(app=app, db=db, model=model, now=now or datetime.now, synced=False,
+                  enabled=bool(app.config['SCHEDULER_ENABLED']),
+                  poll=float(app.config['SCHEDULER_POLL_SECONDS']),
+                  lease=float(app.config['SCHEDULER_LEASE_SECONDS']))
+    # Started lazily so a gunicorn master (preload) never forks with the thread running
+    app.before_request(ensure_started)
@@ -0,0 +1,369 @@
+"""
+search.py — full-text search over questions, messages and user names.
+
+Each searchable model is registered with the columns to index, the first
+one being its title:
+
+    search.register('question', Question, ('text', 'topic', 'explanation'))
+
+    search.query('prob geo', kinds=['question'], limit=20)
+    → [('question', 812), ('question', 77), ...]    best match first
+
+Every word of the query has to match, and each word also matches as a
+prefix ("prob" finds "probability"), so the same call serves a
+search-as-you-type box. Punctuation is ignored.
+
+The backend follows the database (SEARCH_BACKEND=auto):
+
+  sqlite      an FTS5 table `search_index` with prefix indexes for 2 and 3
+              letters. Its rowid is id * 16 + the kind's number, so updating
+              one document is a single-row delete and insert. Mapper events
+              write it inside the same transaction as the row itself. Only
+              the newest RANK_WINDOW matches are ranked (bm25, titles count
+              double): scoring every hit of a two-letter prefix over 200k
+              rows takes ~100 ms, the window keeps it to a few ms.
+  mysql       FULLTEXT indexes on the tables, queried IN BOOLEAN MODE
+              (MariaDB ignores words shorter than innodb_ft_min_token_size).
+  postgresql  GIN indexes on to_tsvector('simple', ...) of the columns
+  memory      an inverted index held by each process, for SQLite builds
+              without FTS5 (or SEARCH_BACKEND=memory). It is built on first
+              use, applies this process's writes, and is rebuilt in the
+              background every SEARCH_MEMORY_REFRESH seconds to pick up
+              other processes' writes.
+
+MariaDB and PostgreSQL keep their indexes up to date themselves.
+Bulk Query.update()/delete() calls skip the mapper events, so callers that
+use them call remove() / reindex(); stale hits whose row is gone are
+dropped by the caller when it loads the rows anyway. create_indexes() is
+idempotent and runs from init_db(); rebuild() refills the sqlite/memory
+index from the tables.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from sqlalchemy import event, inspect, select, text
+
+KIND_BITS = 4
+RANK_WINDOW = 500
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+_state = {'app': None, 'db': None, 'backend': None, 'configured': 'auto', 'refresh': 300.0}
+_kinds = {}   # name -> {'code', 'model', 'fields'}
+_by_code = {}
+_memory = {'index': None, 'built_at': 0.0, 'refreshing': False}
+_memory_lock = threading.Lock()
+
+
+def tokenize(value):
+    return _WORD.findall((value or '').lower())
+
+
+def register(kind, model, fields):
+    """Index `fields` of `model` as `kind`. Kinds are numbered in registration
+    order and the number is part of the stored rowid, so add new kinds last."""
+    code = len(_kinds) + 1
+    if code >= 1 << KIND_BITS:
+        raise ValueError(f"Too many search kinds (max {(1 << KIND_BITS) - 1})")
+    info = _kinds[kind] = _by_code[code] = {'kind': kind, 'code': code, 'model': model, 'fields': tuple(fields)}
+    event.listen(model, 'after_insert', _after_write(info))
+    event.listen(model, 'after_update', _after_write(info, updating=True))
+    event.listen(model, 'after_delete', _after_delete(info))
+
+
+def _docid(info, obj_id):
+    return (obj_id << KIND_BITS) | info['code']
+
+
+def _split(docid):
+    return _by_code[docid & ((1 << KIND_BITS) - 1)]['kind'], docid >> KIND_BITS
+
+
+def _document(values):
+    """(title, body) text for one row given its indexed column values in order."""
+    title, *rest = values
+    return title or '', ' '.join(v for v in rest if v)
+
+
+# ── Backend selection ────────────────────────────────────────────────────────
+
+def backend(connection=None):
+    """The active backend name, worked out once per process."""
+    if _state['backend'] is None:
+        conn = connection or _state['db'].session.connection()
+        name = conn.dialect.name
+        if _state['configured'] != 'auto':
+            _state['backend'] = _state['configured']
+        elif name == 'sqlite':
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")).first()
+            _state['backend'] = 'sqlite' if exists else 'memory'
+        elif name in ('mysql', 'mariadb'):
+            _state['backend'] = 'mysql'
+        elif name == 'postgresql':
+            _state['backend'] = 'postgresql'
+        else:
+            _state['backend'] = 'memory'
+    return _state['backend']
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _pg_vector(conn, fields):
+    cols = " || ' ' || ".join(f"coalesce({_quote(conn, f)}, '')" for f in fields)
+    return f"to_tsvector('simple', {cols})"
+
+
+def create_indexes(conn):
+    """Create whatever the backend needs. Returns True when the SQLite index was
+    just created and still has to be filled with rebuild()."""
+    name = conn.dialect.name
+    if name == 'sqlite' and _state['configured'] in ('auto', 'sqlite'):
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")).first()
+        if exists:
+            return False
+        try:
+            conn.execute(text("CREATE VIRTUAL TABLE search_index USING fts5("
+                              "title, body, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"))
+            conn.commit()
+        except Exception as exc:  # SQLite compiled without FTS5
+            conn.rollback()
+            print(f"  [SEARCH] FTS5 unavailable ({exc}); using the in-memory index.")
+            return False
+        _state['backend'] = None
+        return True
+    for kind, info in _kinds.items():
+        table = _quote(conn, info['model'].__table__.name)
+        index = f"ix_{info['model'].__table__.name}_fts"
+        try:
+            if name in ('mysql', 'mariadb'):
+                cols = ', '.join(_quote(conn, f) for f in info['fields'])
+                conn.execute(text(f"CREATE FULLTEXT INDEX {index} ON {table} ({cols})"))
+            elif name == 'postgresql':
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} "
+                                  f"USING gin (({_pg_vector(conn, info['fields'])}))"))
+            conn.commit()
+        except Exception:
+            conn.rollback()  # index already exists
+    return False
+
+
+# ── Keeping the index current ────────────────────────────────────────────────
+
+def _fts_write(conn, docid, values=None):
+    conn.execute(text("DELETE FROM search_index WHERE rowid = :r"), {'r': docid})
+    if values is not None:
+        title, body = _document(values)
+        conn.execute(text("INSERT INTO search_index (rowid, title, body) VALUES (:r, :t, :b)"),
+                     {'r': docid, 't': title, 'b': body})
+
+
+def _after_write(info, updating=False):
+    def listener(mapper, connection, target):
+        if updating:
+            state = inspect(target)
+            if not any(state.attrs[f].history.has_changes() for f in info['fields']):
+                return
+        _apply(connection, info, target.id, [getattr(target, f) for f in info['fields']])
+    return listener
+
+
+def _after_delete(info):
+    def listener(mapper, connection, target):
+        _apply(connection, info, target.id, None)
+    return listener
+
+
+def _apply(conn, info, obj_id, values):
+    which = backend(conn)
+    if which == 'sqlite':
+        _fts_write(conn, _docid(info, obj_id), values)
+    elif which == 'memory' and _memory['index'] is not None:
+        with _memory_lock:
+            _memory['index'].put(_docid(info, obj_id), values)
+
+
+def reindex(kind, obj_id, values=None):
+    """Index (or with values=None, drop) one document — for writes that skip the ORM."""
+    _apply(_state['db'].session.connection(), _kinds[kind], obj_id, values)
+
+
+def remove(kind, obj_id):
+    reindex(kind, obj_id, None)
+
+
+def _rows(conn, info):
+    model = info['model']
+    cols = [model.__table__.c.id] + [model.__table__.c[f] for f in info['fields']]
+    return conn.execute(select(*cols).order_by(model.__table__.c.id))
+
+
+def rebuild():
+    """Refill the SQLite FTS table (or this process's memory index) from the tables.
+    The SQLite rebuild commits the session."""
+    which = backend()
+    if which == 'sqlite':
+        count = 0
+        session = _state['db'].session
+        conn = session.connection()  # not a second connection: one would keep the file busy
+        conn.execute(text("DELETE FROM search_index"))
+        for kind, info in _kinds.items():
+            batch = []
+            for row in _rows(conn, info):
+                title, body = _document(row[1:])
+                batch.append({'r': _docid(info, row[0]), 't': title, 'b': body})
+                if len(batch) >= 2000:
+                    conn.execute(text("INSERT INTO search_index (rowid, title, body) VALUES (:r, :t, :b)"), batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                conn.execute(text("INSERT INTO search_index (rowid, title, body) VALUES (:r, :t, :b)"), batch)
+                count += len(batch)
+        conn.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+        session.commit()
+        return count
+    if which == 'memory':
+        index = InvertedIndex()
+        with _state['db'].engine.connect() as conn:
+            for kind, info in _kinds.items():
+                for row in _rows(conn, info):
+                    index.put(_docid(info, row[0]), row[1:])
+        with _memory_lock:
+            _memory.update(index=index, built_at=time.monotonic())
+        return len(index.docs)
+    return 0
+
+
+class InvertedIndex:
+    """token -> docids, plus a sorted vocabulary for prefix lookups."""
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}      # docid -> its tokens
+        self._vocab = None  # sorted tokens, rebuilt lazily after new words arrive
+
+    def put(self, docid, values):
+        for token in self.docs.pop(docid, ()):
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(docid)
+                if not ids:
+                    del self.postings[token]
+                    self._vocab = None
+        if values is None:
+            return
+        tokens = set()
+        for value in values:
+            tokens.update(tokenize(value))
+        self.docs[docid] = tokens
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                self._vocab = None
+            self.postings[token].add(docid)
+
+    def _prefixed(self, prefix):
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        vocab, i = self._vocab, bisect.bisect_left(self._vocab, prefix)
+        ids = set()
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            ids |= self.postings.get(vocab[i], set())
+            i += 1
+        return ids
+
+    def search(self, tokens, codes, limit):
+        result = None
+        for token in sorted(tokens, key=len, reverse=True):  # longest prefix is the most selective
+            ids = self._prefixed(token)
+            result = ids if result is None else result & ids
+            if not result:
+                return []
+        mask = (1 << KIND_BITS) - 1
+        # Newest first: docids grow with the row id
+        return heapq.nlargest(limit, (d for d in result if d & mask in codes))
+
+
+def _refresh_memory():
+    try:
+        with _state['app'].app_context():
+            rebuild()
+    finally:
+        _memory['refreshing'] = False
+
+
+def _memory_index():
+    with _memory_lock:
+        index = _memory['index']
+        stale = time.monotonic() - _memory['built_at'] > _state['refresh'] and not _memory['refreshing']
+        if index is not None and stale:
+            # Keep answering from the old index while a thread builds the new one
+            _memory['refreshing'] = True
+            threading.Thread(target=_refresh_memory, name='search-refresh', daemon=True).start()
+    if index is None:
+        rebuild()
+    return _memory['index']
+
+
+# ── Queries ──────────────────────────────────────────────────────────────────
+
+def query(q, kinds=None, limit=20):
+    """[(kind, id), ...] best match first for every word of `q` (each also as a prefix)."""
+    tokens = tokenize(q)[:8]
+    kinds = [k for k in (kinds or _kinds) if k in _kinds]
+    if not tokens or not kinds:
+        return []
+    which = backend()
+    session = _state['db'].session
+    if which == 'sqlite':
+        codes = ', '.join(str(_kinds[k]['code']) for k in kinds)
+        match = ' '.join(f'"{t}"*' for t in tokens)
+        rows = session.execute(text(
+            f"SELECT rowid FROM (SELECT rowid, bm25(search_index, 2.0, 1.0) AS score FROM search_index "
+            f"WHERE search_index MATCH :m AND (rowid & {(1 << KIND_BITS) - 1}) IN ({codes}) "
+            f"ORDER BY rowid DESC LIMIT :w) ORDER BY score LIMIT :n"),
+            {'m': match, 'w': max(RANK_WINDOW, limit), 'n': limit})
+        return [_split(r[0]) for r in rows]
+    if which == 'memory':
+        codes = {_kinds[k]['code'] for k in kinds}
+        index = _memory_index()
+        with _memory_lock:
+            return [_split(d) for d in index.search(tokens, codes, limit)]
+
+    conn = session.connection()
+    scored = []
+    for kind in kinds:
+        info = _kinds[kind]
+        table = _quote(conn, info['model'].__table__.name)
+        if which == 'mysql':
+            cols = ', '.join(_quote(conn, f) for f in info['fields'])
+            match = f"MATCH ({cols}) AGAINST (:q IN BOOLEAN MODE)"
+            sql = f"SELECT id, {match} FROM {table} WHERE {match} ORDER BY 2 DESC LIMIT :n"
+            params = {'q': ' '.join(f'+{t}*' for t in tokens), 'n': limit}
+        else:
+            vector = _pg_vector(conn, info['fields'])
+            sql = (f"SELECT id, ts_rank({vector}, to_tsquery('simple', :q)) FROM {table} "
+                   f"WHERE {vector} @@ to_tsquery('simple', :q) ORDER BY 2 DESC LIMIT :n")
+            params = {'q': ' & '.join(f'{t}:*' for t in tokens), 'n': limit}
+        scored += [(score, kind, obj_id) for obj_id, score in session.execute(text(sql), params)]
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return [(kind, obj_id) for _, kind, obj_id in scored[:limit]]
+
+
+def ids(q, kind, limit=200):
+    """Matching ids of one kind, best first."""
+    return [obj_id for _, obj_id in query(q, [kind], limit)]
+
+
+def init_app(app, db):
+    app.config.setdefault('SEARCH_BACKEND', 'auto')
+    app.config.setdefault('SEARCH_MEMORY_REFRESH', 300)
+    _state.update(app=app, db=db, backend=None,
+                  configured=app.config['SEARCH_BACKEND'],
+                  refresh=float(app.config['SEARCH_MEMORY_REFRESH']))
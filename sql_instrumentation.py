@@ -0,0 +1,192 @@
+"""
+sql_instrumentation.py — per-request SQL accounting for AptitudePro.
+
+Hooks SQLAlchemy cursor events and Flask request hooks to record, for
+every request: number of statements, total DB time, the slowest statement
+and rows touched (ORM entities loaded + rows affected by DML).
+
+Each response gets a Server-Timing header (visible in the browser's
+network tab), requests/statements above the configured thresholds are
+written as JSON lines to the slow log, and per-endpoint totals are kept
+in memory for the admin "SQL Profile" page.
+
+Config (app.config, defaults from env):
+    SQL_INSTRUMENTATION   on/off switch                    (true)
+    SQL_SLOW_QUERY_MS     log statements slower than this  (100)
+    SQL_SLOW_REQUEST_MS   log requests slower than this    (500)
+    SQL_SLOW_LOG          path of the JSON-lines log       (instance/slow_sql.log)
+"""
+
+import json
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('aptipro.sql')
+
+_lock = threading.Lock()
+_endpoints = {}
+_thresholds = {'query_ms': 100.0, 'request_ms': 500.0}
+TIMELINE_LIMIT = 500
+
+
+def _statement_preview(statement, limit=500):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '…'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_sql' in g:
+        conn.info.setdefault('_sql_t0', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_sql_t0')
+    if not starts or not has_request_context():
+        return
+    t_start = starts.pop()
+    elapsed_ms = (time.perf_counter() - t_start) * 1000
+    rec = g.get('_sql')
+    if rec is None:
+        return
+    rec['queries'] += 1
+    rec['db_ms'] += elapsed_ms
+    if cursor.rowcount and cursor.rowcount > 0:
+        rec['rows'] += cursor.rowcount
+    if elapsed_ms > rec['slowest_ms']:
+        rec['slowest_ms'] = elapsed_ms
+        rec['slowest_sql'] = statement
+    if len(rec['timeline']) < TIMELINE_LIMIT:
+        # (offset from request start, duration, statement) — used by the request profiler
+        rec['timeline'].append(((t_start - rec['t0']) * 1000, elapsed_ms, statement))
+    if elapsed_ms >= _thresholds['query_ms']:
+        logger.warning(json.dumps({
+            'type': 'slow_query',
+            'endpoint': request.endpoint,
+            'path': request.path,
+            'ms': round(elapsed_ms, 2),
+            'sql': _statement_preview(statement),
+        }))
+
+
+def _handle_error(context):
+    # A statement that raises never reaches after_cursor_execute; drop its start
+    # time so it does not stay behind on the pooled connection
+    starts = context.connection.info.get('_sql_t0') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def _on_entity_load(target, context):
+    if has_request_context():
+        rec = g.get('_sql')
+        if rec is not None:
+            rec['rows'] += 1
+
+
+def _start_request():
+    g._sql = {'t0': time.perf_counter(), 'queries': 0, 'db_ms': 0.0, 'rows': 0,
+              'slowest_ms': 0.0, 'slowest_sql': None, 'timeline': []}
+
+
+def _finish_request(response):
+    rec = g.pop('_sql', None)
+    if rec is None:
+        return response
+    total_ms = (time.perf_counter() - rec['t0']) * 1000
+    endpoint = request.endpoint or '<unmatched>'
+
+    timing = (f'db;dur={rec["db_ms"]:.1f};desc="{rec["queries"]} queries", '
+              f'app;dur={max(0.0, total_ms - rec["db_ms"]):.1f}, total;dur={total_ms:.1f}')
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+    with _lock:
+        s = _endpoints.get(endpoint)
+        if s is None:
+            s = _endpoints[endpoint] = {'endpoint': endpoint, 'requests': 0, 'queries': 0, 'db_ms': 0.0,
+                                        'total_ms': 0.0, 'rows': 0, 'max_queries': 0, 'max_db_ms': 0.0,
+                                        'slowest_sql': None, 'slowest_ms': 0.0}
+        s['requests'] += 1
+        s['queries'] += rec['queries']
+        s['db_ms'] += rec['db_ms']
+        s['total_ms'] += total_ms
+        s['rows'] += rec['rows']
+        s['max_queries'] = max(s['max_queries'], rec['queries'])
+        s['max_db_ms'] = max(s['max_db_ms'], rec['db_ms'])
+        if rec['slowest_ms'] > s['slowest_ms']:
+            s['slowest_ms'] = rec['slowest_ms']
+            s['slowest_sql'] = _statement_preview(rec['slowest_sql'] or '', 300)
+
+    if total_ms >= _thresholds['request_ms']:
+        logger.warning(json.dumps({
+            'type': 'slow_request',
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(total_ms, 2),
+            'db_ms': round(rec['db_ms'], 2),
+            'queries': rec['queries'],
+            'rows': rec['rows'],
+            'slowest_ms': round(rec['slowest_ms'], 2),
+            'slowest_sql': _statement_preview(rec['slowest_sql'] or ''),
+        }))
+    return response
+
+
+def current_request_stats():
+    """The live record for the current request (or None outside instrumentation)."""
+    return g.get('_sql') if has_request_context() else None
+
+
+def endpoint_report():
+    """Per-endpoint totals for this worker, heaviest DB time first."""
+    with _lock:
+        rows = [dict(s) for s in _endpoints.values()]
+    for r in rows:
+        n = r['requests'] or 1
+        r['avg_queries'] = r['queries'] / n
+        r['avg_db_ms'] = r['db_ms'] / n
+        r['avg_total_ms'] = r['total_ms'] / n
+        r['db_share'] = (r['db_ms'] / r['total_ms'] * 100) if r['total_ms'] else 0
+    rows.sort(key=lambda r: r['db_ms'], reverse=True)
+    return rows
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+def init_app(app, db):
+    """Attach instrumentation to `app`; engine-level listeners cover every engine."""
+    app.config.setdefault('SQL_INSTRUMENTATION', True)
+    app.config.setdefault('SQL_SLOW_QUERY_MS', 100)
+    app.config.setdefault('SQL_SLOW_REQUEST_MS', 500)
+    app.config.setdefault('SQL_SLOW_LOG', None)
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+
+    _thresholds['query_ms'] = float(app.config['SQL_SLOW_QUERY_MS'])
+    _thresholds['request_ms'] = float(app.config['SQL_SLOW_REQUEST_MS'])
+
+    if not logger.handlers:
+        handler = logging.FileHandler(app.config['SQL_SLOW_LOG'] or f"{app.instance_path}/slow_sql.log")
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        event.listen(db.Model, 'load', _on_entity_load, propagate=True)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
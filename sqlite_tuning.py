@@ -0,0 +1,159 @@
+"""
+sqlite_tuning.py — production profile for the SQLite deployment.
+
+Every new SQLite connection gets:
+    journal_mode=WAL        readers never block the writer and vice versa
+    synchronous=NORMAL      fsync at checkpoints only (safe with WAL)
+    busy_timeout            wait for the write lock instead of failing at once
+    cache_size / mmap_size  keep hot pages in memory
+    temp_store=MEMORY
+
+WAL still returns SQLITE_BUSY immediately when a transaction that started
+as a reader tries to write after another writer committed (busy_timeout
+cannot help there), so write paths are wrapped in retry_on_lock(), which
+rolls back and retries with jittered exponential backoff. It retries the
+server databases' transient lock errors too: MySQL/MariaDB deadlocks and
+lock wait timeouts, PostgreSQL deadlocks and serialization failures.
+
+A daemon thread per process runs `PRAGMA wal_checkpoint(PASSIVE)`
+periodically (TRUNCATE once the -wal file grows past a limit) so the WAL
+does not grow unbounded between SQLite's automatic checkpoints.
+
+Other databases are left untouched.
+"""
+
+import functools
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+DEFAULTS = {
+    'SQLITE_WAL': True,
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_CACHE_SIZE_KB': 20000,
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_CHECKPOINT_SECONDS': 300,
+    'SQLITE_WAL_TRUNCATE_BYTES': 64 * 1024 * 1024,
+    'DB_LOCK_RETRIES': 5,
+    'DB_LOCK_RETRY_BASE_MS': 20,
+}
+
+_settings = dict(DEFAULTS)
+_checkpointer = {'thread': None, 'pid': None}
+
+
+# SQLite busy, MySQL/MariaDB 1213 and 1205, PostgreSQL 40P01 and 40001
+_LOCK_ERRORS = ('database is locked', 'database table is locked', 'deadlock found', 'lock wait timeout exceeded',
+                'deadlock detected', 'could not serialize access')
+
+
+def is_lock_error(exc):
+    msg = str(getattr(exc, 'orig', exc)).lower()
+    return any(text in msg for text in _LOCK_ERRORS)
+
+
+def connection_pragmas(settings=None):
+    s = settings or _settings
+    pragmas = [
+        f"PRAGMA busy_timeout={int(s['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={s['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size=-{int(s['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(s['SQLITE_MMAP_SIZE'])}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if s['SQLITE_WAL']:
+        pragmas.insert(0, "PRAGMA journal_mode=WAL")
+    return pragmas
+
+
+def configure_engine(engine, settings=None):
+    """Attach the pragma profile to `engine` (no-op for non-SQLite engines)."""
+    if engine.dialect.name != 'sqlite':
+        return False
+    pragmas = connection_pragmas(settings)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_conn, conn_record):
+        cur = dbapi_conn.cursor()
+        try:
+            for p in pragmas:
+                cur.execute(p)
+        finally:
+            cur.close()
+
+    return True
+
+
+def retry_on_lock(session_factory=None, retries=None, base_ms=None):
+    """
+    Decorator: on "database is locked"/busy errors (or a server database's
+    deadlock, see is_lock_error) roll the session back and
+    call the function again, sleeping base_ms * 2^n plus jitter between tries.
+    `session_factory` returns the session to roll back (e.g. lambda: db.session).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            attempts = retries if retries is not None else int(_settings['DB_LOCK_RETRIES'])
+            base = (base_ms if base_ms is not None else float(_settings['DB_LOCK_RETRY_BASE_MS'])) / 1000.0
+            for n in range(attempts + 1):
+                try:
+                    return fn(*args, **kwargs)
+                except OperationalError as exc:
+                    if n == attempts or not is_lock_error(exc):
+                        raise
+                    if session_factory is not None:
+                        session_factory().rollback()
+                    time.sleep(base * (2 ** n) * (0.5 + random.random()))
+        return wrapper
+    return decorator
+
+
+def checkpoint(engine, mode='PASSIVE'):
+    """Run a WAL checkpoint; returns (busy, wal_frames, checkpointed_frames)."""
+    with engine.connect() as conn:
+        row = conn.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        conn.commit()
+    return tuple(row) if row else None
+
+
+def _checkpoint_loop(engine, interval, truncate_bytes):
+    wal_path = f"{engine.url.database}-wal" if engine.url.database else None
+    while True:
+        time.sleep(interval * (0.9 + 0.2 * random.random()))  # spread workers out
+        try:
+            big = wal_path and os.path.exists(wal_path) and os.path.getsize(wal_path) > truncate_bytes
+            checkpoint(engine, 'TRUNCATE' if big else 'PASSIVE')
+        except Exception as exc:
+            print(f"  [DB] WAL checkpoint skipped: {exc}")
+
+
+def ensure_checkpointer(engine):
+    """Start this process's checkpoint thread (idempotent; restarts after fork)."""
+    interval = float(_settings['SQLITE_CHECKPOINT_SECONDS'])
+    if engine.dialect.name != 'sqlite' or not _settings['SQLITE_WAL'] or interval <= 0:
+        return
+    pid = os.getpid()
+    if _checkpointer['pid'] == pid and _checkpointer['thread'] and _checkpointer['thread'].is_alive():
+        return
+    t = threading.Thread(target=_checkpoint_loop, name='sqlite-wal-checkpoint', daemon=True,
+                         args=(engine, interval, int(_settings['SQLITE_WAL_TRUNCATE_BYTES'])))
+    t.start()
+    _checkpointer.update(thread=t, pid=pid)
+
+
+def init_app(app, db):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+        _settings[key] = app.config[key]
+    with app.app_context():
+        engine = db.engine
+    if not configure_engine(engine):
+        return
+    # Started lazily so a gunicorn preload master does not fork a dead thread into workers
+    app.before_request(lambda: ensure_checkpointer(engine))
@@ -0,0 +1,37 @@
+// Admin dashboard: fills the count tiles and the [data-panel] fragments after first paint.
+
+(function () {
+    const script = document.currentScript;
+
+    async function loadPanel(panel, url) {
+        try {
+            const response = await fetch(url, { credentials: 'same-origin' });
+            if (!response.ok) throw new Error(response.status);
+            panel.innerHTML = await response.text();
+        } catch (err) {
+            console.error(err);
+            panel.textContent = 'Could not load this panel.';
+        }
+    }
+
+    document.querySelectorAll('[data-panel]').forEach(panel => {
+        loadPanel(panel, panel.dataset.panel);
+        // Pager links inside a fragment replace just that panel
+        panel.addEventListener('click', event => {
+            const link = event.target.closest('a[data-panel-link]');
+            if (!link) return;
+            event.preventDefault();
+            loadPanel(panel, link.href);
+        });
+    });
+
+    fetch(script.dataset.summaryUrl, { credentials: 'same-origin' })
+        .then(response => response.ok ? response.json() : Promise.reject(response.status))
+        .then(counts => {
+            document.querySelectorAll('[data-summary]').forEach(el => {
+                const value = counts[el.dataset.summary];
+                if (value !== undefined) el.textContent = value.toLocaleString();
+            });
+        })
+        .catch(err => console.error('Dashboard summary failed', err));
+})();
@@ -0,0 +1,12 @@
+// Automatic Attendance Heartbeat
+function sendHeartbeat() {
+    fetch('/api/heartbeat', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    }).catch(err => console.debug('Heartbeat failed', err));
+}
+
+// Send immediately on load
+sendHeartbeat();
+// Send every 5 minutes
+setInterval(sendHeartbeat, 300000);
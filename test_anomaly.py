@@ -0,0 +1,137 @@
+"""
+Tests for the streaming submission anomaly detector.
+
+    python -m pytest -q test_anomaly.py
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from anomaly import Detector, Event
+
+T0 = datetime(2026, 3, 2, 10, 0)
+
+
+class Stream:
+    """Builds Events with increasing answer ids and timestamps."""
+
+    def __init__(self):
+        self.next_id = 0
+
+    def __call__(self, student, question, option='A', correct=True, seconds=60, minute=0,
+                 suspicious=False, expired=False):
+        self.next_id += 1
+        return Event(self.next_id, student, question, option, correct, seconds,
+                     T0 + timedelta(minutes=minute), suspicious, expired)
+
+
+def kinds(alerts):
+    return [a['kind'] for a in alerts]
+
+
+def test_time_outlier_against_question_distribution():
+    rng, ev, det = random.Random(1), Stream(), Detector()
+    for s in range(40):
+        assert det.observe(ev(s, 1, seconds=int(rng.uniform(90, 150)))) == []
+    alerts = det.observe(ev(99, 1, seconds=8))
+    assert kinds(alerts) == ['time_outlier']
+    assert alerts[0]['score'] < -3 and 'typical is' in alerts[0]['message']
+    # Slow, wrong or untimed answers are not flagged
+    assert det.observe(ev(98, 1, seconds=900)) == []
+    assert det.observe(ev(97, 1, seconds=8, correct=False)) == []
+    assert det.observe(ev(96, 1, seconds=0)) == []
+
+
+def test_no_time_outlier_before_enough_samples():
+    ev, det = Stream(), Detector(min_samples=20)
+    for s in range(5):
+        det.observe(ev(s, 1, seconds=120))
+    assert det.observe(ev(50, 1, seconds=3)) == []
+
+
+def background(det, ev, rng, students=range(100, 140), questions=(1, 2, 3, 4)):
+    """A class that mostly gets questions right (option 'C') and spreads its mistakes."""
+    alerts = []
+    for s in students:
+        for q in questions:
+            option = 'C' if rng.random() < 0.7 else rng.choice('ABD')
+            alerts += det.observe(ev(s, q, option, option == 'C', minute=rng.randint(0, 5)))
+    return alerts
+
+
+def test_shared_wrong_answers_across_students():
+    rng, ev, det = random.Random(2), Stream(), Detector(sequence_length=4, sequence_window=600)
+    assert 'shared_sequence' not in kinds(background(det, ev, rng))
+    answers = [(1, 'B', False), (2, 'C', True), (3, 'D', False), (4, 'C', True)]
+    alerts = []
+    for student in (10, 11, 12, 13, 14):
+        for q, opt, ok in answers:
+            alerts += det.observe(ev(student, q, opt, ok, minute=6))
+    shared = [a for a in alerts if a['kind'] == 'shared_sequence']
+    assert shared and all(a['score'] < 0.001 for a in shared)
+    assert len({a['student_id'] for a in shared}) == len(shared)  # each student flagged once
+    assert {10, 11, 12, 13, 14} <= set(shared[-1]['details']['students'])
+
+
+def test_common_answer_patterns_are_not_flagged():
+    # Two-option questions answered at random collide all the time
+    rng, ev, det = random.Random(3), Stream(), Detector()
+    alerts = []
+    for s in range(25):
+        for q in range(6):
+            option = rng.choice('AB')
+            alerts += det.observe(ev(s, q, option, option == 'A', minute=rng.randint(0, 10)))
+    assert 'shared_sequence' not in kinds(alerts)
+
+
+def test_shared_sequence_needs_a_wrong_answer_and_the_window():
+    ev, det = Stream(), Detector(sequence_length=2, sequence_students=2, sequence_window=600)
+    for student in (1, 2):  # identical but all correct
+        for q in (1, 2):
+            assert 'shared_sequence' not in kinds(det.observe(ev(student, q, 'A', True)))
+    det.observe(ev(3, 1, 'B', False, minute=0))
+    det.observe(ev(3, 2, 'B', False, minute=0))
+    det.observe(ev(4, 1, 'B', False, minute=30))  # same wrong answers, 30 min later
+    assert 'shared_sequence' not in kinds(det.observe(ev(4, 2, 'B', False, minute=30)))
+
+
+def test_undated_answers_are_outside_every_window():
+    """Legacy answers without submitted_at count for streaks but never for shared sequences."""
+    ev, det = Stream(), Detector(sequence_length=2, sequence_students=2, sequence_window=600, min_samples=0,
+                                 streak_min=3, min_history=1)
+    undated = [ev(student, q, 'B', False)._replace(at=None) for student in (1, 2) for q in (1, 2)]
+    undated += [ev(3, q, 'B', False)._replace(at=None) for q in (1, 2)]
+    assert [a for e in undated for a in det.observe(e)] == []
+    assert det.sequences == {} and det.cursor == 6
+
+    # Dated answers still meet, and an undated answer between them changes nothing
+    det.observe(ev(4, 1, 'B', False))
+    det.observe(ev(4, 2, 'B', False))
+    det.observe(ev(5, 1, 'B', False)._replace(at=None))
+    assert 'shared_sequence' not in kinds(det.observe(ev(5, 2, 'B', False)))
+    assert det.students[3].n == 2 and det.students[5].n == 2
+
+
+def test_improbable_streak_is_flagged_once():
+    ev, det = Stream(), Detector(streak_min=6, streak_p=0.001, min_history=10)
+    for i in range(20):  # a 30 % student
+        det.observe(ev(1, 100 + i, correct=(i % 10) < 3))
+    flagged = []
+    for i in range(12):
+        flagged += [a for a in det.observe(ev(1, 200 + i)) if a['kind'] == 'streak']
+    assert len(flagged) == 1 and flagged[0]['score'] < 0.001
+    assert 'usual 30% accuracy' in flagged[0]['message']
+
+
+def test_strong_student_streak_is_not_flagged():
+    ev, det = Stream(), Detector()
+    for i in range(20):
+        det.observe(ev(1, i, correct=i % 10 != 0))  # 90 %
+    assert all(a['kind'] != 'streak' for i in range(15) for a in det.observe(ev(1, 100 + i)))
+
+
+def test_fast_solve_passthrough_cursor_and_expired():
+    ev, det = Stream(), Detector()
+    assert kinds(det.observe(ev(1, 1, seconds=1, suspicious=True))) == ['fast_solve']
+    assert det.observe(ev(1, 2, suspicious=True, expired=True)) == []
+    assert det.cursor == 2
@@ -0,0 +1,78 @@
+"""
+Tests for the detect_anomalies task (late commits, repeated scans and
+undated answers) against app.py on a throwaway SQLite database (see
+conftest.py).
+
+    python -m pytest -q test_anomaly_task.py
+"""
+
+import pytest
+
+import app as aptipro
+from app import AnomalyAlert, Answer, SchemaMeta, db, detect_anomalies, get_now_ist
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+
+@pytest.fixture
+def student(make_student, make_question):
+    """A student and a question, with the detector starting over."""
+    db.session.query(SchemaMeta).filter_by(key='anomaly_cursor').delete()
+    db.session.commit()
+    aptipro._anomaly_detector['instance'] = None
+    return make_student(), make_question(correct_answer='A')
+
+
+def answer(student, answer_id=None, submitted_at=True, suspicious=False, option='A'):
+    """Insert through Core, so the test picks the id and a NULL submitted_at stays NULL."""
+    user, question = student
+    values = dict(student_id=user.id, question_id=question.id, selected_option=option, is_correct=option == 'A',
+                  time_taken_sec=1 if suspicious else 60, is_suspicious=suspicious,
+                  submitted_at=get_now_ist() if submitted_at else db.null())
+    if answer_id is not None:
+        values['id'] = answer_id
+    result = db.session.execute(db.insert(Answer).values(**values))
+    db.session.commit()
+    return result.inserted_primary_key[0]
+
+
+def alerts_for(answer_id):
+    return AnomalyAlert.query.filter_by(answer_id=answer_id).count()
+
+
+def test_answer_committed_below_the_cursor_is_still_scanned(student):
+    first = answer(student)
+    answer(student, first + 5)  # a higher id commits first
+    detect_anomalies()
+    assert db.session.get(SchemaMeta, 'anomaly_cursor').value == str(first + 5)
+
+    late = answer(student, first + 2, suspicious=True)
+    assert detect_anomalies().endswith('1 new alerts')
+    assert alerts_for(late) == 1
+    assert detect_anomalies().endswith('0 new alerts')
+
+
+def test_rescanning_does_not_store_an_alert_twice(student):
+    flagged = answer(student, suspicious=True)
+    detect_anomalies()
+    assert alerts_for(flagged) == 1
+
+    # Another worker without the detector, and a lost cursor, see the same answers again
+    aptipro._anomaly_detector['instance'] = None
+    db.session.query(SchemaMeta).filter_by(key='anomaly_cursor').delete()
+    db.session.commit()
+    detect_anomalies()
+    assert alerts_for(flagged) == 1
+
+
+def test_undated_answers_do_not_stop_the_scan(student, make_student, make_question):
+    """Students sharing wrong answers on undated rows used to crash the shared-sequence window."""
+    others = [make_student() for _ in range(3)]
+    questions = [make_question(correct_answer='A') for _ in range(4)]
+    detect_anomalies()
+    for user in others:
+        for question in questions:
+            answer((user, question), submitted_at=False, option='B')
+    last = answer(student, suspicious=True)
+    assert detect_anomalies().startswith(f'Scanned to answer #{last},')
+    assert alerts_for(last) == 1
@@ -0,0 +1,184 @@
+"""
+Tests for the answer archive (_archive_question, _drop_archived and the
+archive_answers job) against app.py on a throwaway SQLite database (see
+conftest.py). Every question here is dated 2001, so the job's cutoff never
+reaches the other test modules' questions.
+
+    python -m pytest -q test_archive.py
+"""
+
+import re
+from datetime import date, datetime
+
+import pytest
+
+import app as aptipro
+from app import (ARCHIVE_UNDATED, Answer, AnswerArchive, Attempt, AttemptArchive, StudentArchiveDay, Subject, User,
+                 db, record_submission)
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+BEFORE = '2001-06-01'
+
+
+class Ctx:
+    """Stands in for job_queue's JobContext when a handler is called directly."""
+
+    def __init__(self, **params):
+        self.params = params
+
+    def progress(self, done, total=None, message=None):
+        pass
+
+
+def answer(student, question, option, submitted_at):
+    db.session.execute(db.insert(Answer).values(
+        student_id=student.id, question_id=question.id, selected_option=option, is_correct=option == 'A',
+        submitted_at=submitted_at or db.null()))
+
+
+@pytest.fixture
+def term(make_student, make_question):
+    """Two 2001 questions (one in a subject) answered by two students."""
+    a, b = make_student(), make_student()
+    subject = Subject(name=f'Archive subject {a.id}')
+    db.session.add(subject)
+    db.session.commit()
+    q1 = make_question(text='Q1', correct_answer='A', scheduled_date=date(2001, 3, 1), subject_id=subject.id)
+    q2 = make_question(text='Q2', correct_answer='A', scheduled_date=date(2001, 3, 2))
+    answer(a, q1, 'B', datetime(2001, 3, 1, 10, 0))
+    answer(a, q1, 'A', datetime(2001, 3, 1, 10, 5))
+    answer(a, q2, 'A', datetime(2001, 3, 2, 9, 0))
+    answer(b, q1, 'B', datetime(2001, 3, 3, 9, 0))
+    answer(b, q2, 'A', None)  # legacy answer without a date
+    db.session.add_all([Attempt(student_id=s.id, question_id=q.id, start_time=datetime(2001, 3, 1), submission_count=1)
+                        for s in (a, b) for q in (q1, q2)])
+    db.session.commit()
+    return {'subject': subject, 'q1': q1, 'q2': q2, 'a': a, 'b': b}
+
+
+def archive_days(*students):
+    return {(row.student_id, row.day, row.subject_id): (row.answers, row.correct, row.questions, row.solved)
+            for row in StudentArchiveDay.query.filter(StudentArchiveDay.student_id.in_([s.id for s in students]))}
+
+
+def expected_days(t):
+    a, b, s = t['a'].id, t['b'].id, t['subject'].id
+    return {(a, date(2001, 3, 1), s): (2, 1, 1, 1),
+            (a, date(2001, 3, 2), 0): (1, 1, 1, 1),
+            (b, date(2001, 3, 3), s): (1, 0, 1, 0),
+            (b, ARCHIVE_UNDATED, 0): (1, 1, 1, 1)}
+
+
+def rows(model, *questions):
+    return model.query.filter(model.question_id.in_([q.id for q in questions])).count()
+
+
+def test_job_moves_rows_and_adds_up_totals(term):
+    assert aptipro.archive_answers_job(Ctx(before=BEFORE)).startswith('2 questions archived')
+    db.session.expire_all()
+    assert rows(Answer, term['q1'], term['q2']) == 0 and rows(Attempt, term['q1'], term['q2']) == 0
+    assert rows(AnswerArchive, term['q1'], term['q2']) == 5 and rows(AttemptArchive, term['q1'], term['q2']) == 4
+    assert term['q1'].archived_at and term['q2'].archived_at
+    assert archive_days(term['a'], term['b']) == expected_days(term)
+
+    # A second run finds nothing left to do
+    assert aptipro.archive_answers_job(Ctx(before=BEFORE)) == '0 questions archived, 0 answers moved'
+    assert archive_days(term['a'], term['b']) == expected_days(term)
+
+
+def test_drop_archived_takes_the_totals_back_out(term):
+    aptipro.archive_answers_job(Ctx(before=BEFORE))
+    q1 = term['q1']
+    aptipro._drop_archived(q1.id, q1.subject_id)
+    db.session.commit()
+    assert rows(AnswerArchive, q1) == 0 and rows(AttemptArchive, q1) == 0
+    assert archive_days(term['a'], term['b']) == {key: totals for key, totals in expected_days(term).items()
+                                                  if key[2] == 0}
+
+
+def test_interrupted_run_resumes_without_counting_twice(term, monkeypatch):
+    archive_question = aptipro._archive_question
+    calls = []
+
+    def crash_on_second(question_id, subject_id):
+        calls.append(question_id)
+        if len(calls) == 2:
+            raise RuntimeError('worker killed')
+        return archive_question(question_id, subject_id)
+
+    monkeypatch.setattr(aptipro, '_archive_question', crash_on_second)
+    with pytest.raises(RuntimeError):
+        aptipro.archive_answers_job(Ctx(before=BEFORE))
+    db.session.rollback()
+    assert rows(AnswerArchive, term['q1']) == 3 and rows(Answer, term['q2']) == 2
+
+    monkeypatch.setattr(aptipro, '_archive_question', archive_question)
+    assert aptipro.archive_answers_job(Ctx(before=BEFORE)).startswith('1 questions archived, 2 answers')
+    assert archive_days(term['a'], term['b']) == expected_days(term)
+
+
+def test_archived_question_takes_no_answers(term):
+    aptipro.archive_answers_job(Ctx(before=BEFORE))
+    result = record_submission(term['a'], term['q1'].id, 'A')
+    assert result['status'] == 'invalid' and 'archived' in result['message']
+    assert rows(Answer, term['q1']) == 0 and rows(Attempt, term['q1']) == 0
+
+
+def test_answer_that_slips_in_keeps_its_attempt_live(term, monkeypatch):
+    """An answer stored after the archive run read its last answer id stays live with its attempt."""
+    archive_totals = aptipro._archive_totals
+
+    def late_answer(model, criterion):
+        totals = archive_totals(model, criterion)
+        answer(term['b'], term['q1'], 'A', datetime(2001, 3, 4, 9, 0))
+        return totals
+
+    monkeypatch.setattr(aptipro, '_archive_totals', late_answer)
+    q1 = term['q1']
+    assert aptipro._archive_question(q1.id, q1.subject_id) == 3
+    db.session.commit()
+    assert [(a.student_id, a.is_correct) for a in Answer.query.filter_by(question_id=q1.id)] == [(term['b'].id, True)]
+    assert [a.student_id for a in Attempt.query.filter_by(question_id=q1.id)] == [term['b'].id]
+    assert [a.student_id for a in AttemptArchive.query.filter_by(question_id=q1.id)] == [term['a'].id]
+    # Only the answers that were moved are in the totals
+    assert archive_days(term['b'])[term['b'].id, date(2001, 3, 3), term['subject'].id] == (1, 0, 1, 0)
+
+
+def test_sqlite_table_without_autoincrement_keeps_its_newest_rows(term, monkeypatch):
+    """Databases created before AUTOINCREMENT would reuse the archived ids, so the newest rows stay live."""
+    monkeypatch.setattr(aptipro, '_autoincrement', {'answer': False, 'attempt': False})
+    q2 = term['q2']
+    assert aptipro._archive_question(q2.id, q2.subject_id) == 1
+    db.session.commit()
+    assert [a.student_id for a in Answer.query.filter_by(question_id=q2.id)] == [term['b'].id]
+    assert [a.student_id for a in Attempt.query.filter_by(question_id=q2.id)] == [term['b'].id]
+    assert (term['b'].id, ARCHIVE_UNDATED, 0) not in archive_days(term['b'])
+
+
+def student_views(student_ids, client):
+    """What the dashboard, the profile and Admin → Members show for each student."""
+    views = {}
+    members = client.get('/admin/members').get_data(as_text=True)
+    for key, student_id in student_ids.items():
+        student = db.session.get(User, student_id)
+        student.__dict__.pop('archived', None)  # cached per instance
+        shown = re.search(rf'data-username="{student.username}" data-submissions="(\d+)"\s+data-solved="(\d+)"',
+                          members)
+        views[key] = {
+            'dashboard': aptipro.dashboard_data(student.id, sections=('stats', 'history')),
+            'profile': (student.total_attempted, student.solved_count, student.accuracy),
+            'members': shown.groups() if shown else None,
+        }
+    return views
+
+
+def test_student_totals_are_the_same_after_archiving(term, make_student, login):
+    client = login(make_student(role='admin'))
+
+    student_ids = {'a': term['a'].id, 'b': term['b'].id}
+    before = student_views(student_ids, client)
+    assert before['a']['profile'] == (3, 2, pytest.approx(200 / 3))
+    assert before['a']['members'] == ('3', '2') and before['b']['members'] == ('2', '1')
+    aptipro.archive_answers_job(Ctx(before=BEFORE))
+    assert student_views(student_ids, client) == before
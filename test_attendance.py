@@ -0,0 +1,55 @@
+"""
+Tests for attendance intervals and their weekly / monthly rollups.
+
+    python -m pytest -q test_attendance.py
+"""
+
+from datetime import date, datetime, timedelta
+
+import attendance
+
+MON = datetime(2026, 3, 2)  # a Monday
+
+
+def at(day, hour, minute=0):
+    return MON + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def test_merge_joins_overlapping_and_nearby_intervals():
+    intervals = [(at(0, 10, 20), at(0, 10, 30)), (at(0, 9), at(0, 10)), (at(0, 9, 30), at(0, 9, 45)),
+                 (at(0, 10, 5), at(0, 10, 15))]
+    assert attendance.merge(intervals) == [(at(0, 9), at(0, 10)), (at(0, 10, 5), at(0, 10, 15)),
+                                           (at(0, 10, 20), at(0, 10, 30))]
+    assert attendance.merge(intervals, gap=600) == [(at(0, 9), at(0, 10, 30))]
+
+
+def test_seconds_split_at_midnight_and_a_login_alone_counts_the_day():
+    days = attendance.seconds_per_day([(at(0, 23, 30), at(1, 0, 45)), (at(2, 8), at(2, 8))])
+    assert days == {date(2026, 3, 2): 1800, date(2026, 3, 3): 2700, date(2026, 3, 4): 0}
+    # Overlapping sessions are not counted twice
+    assert attendance.seconds_per_day([(at(0, 9), at(0, 10)), (at(0, 9, 30), at(0, 10))]) == {date(2026, 3, 2): 3600}
+
+
+def test_period_boundaries():
+    assert attendance.period_start(date(2026, 3, 8), 'week') == date(2026, 3, 2)
+    assert attendance.period_start(date(2026, 3, 31), 'month') == date(2026, 3, 1)
+    assert attendance.period_end(date(2026, 12, 1), 'month') == date(2027, 1, 1)
+    assert attendance.period_end(date(2026, 2, 1), 'month') == date(2026, 3, 1)
+    assert attendance.periods_touched(at(6, 23), at(7, 1)) == {
+        ('week', date(2026, 3, 2)), ('week', date(2026, 3, 9)), ('month', date(2026, 3, 1))}
+
+
+def test_rollups_per_week_and_month():
+    # Present Mon-Wed and Fri of the first week, then Sun into Mon across the week boundary
+    intervals = [(at(d, 9), at(d, 10)) for d in (0, 1, 2, 4)] + [(at(6, 23), at(7, 0, 30))]
+    result = attendance.rollups(intervals)
+    assert result[('week', date(2026, 3, 2))] == attendance.Summary(
+        days_present=5, minutes=4 * 60 + 60, longest_streak=3, last_present=date(2026, 3, 8))
+    assert result[('week', date(2026, 3, 9))] == attendance.Summary(1, 30, 1, date(2026, 3, 9))
+    # Within the month the Sun-Mon run joins up
+    assert result[('month', date(2026, 3, 1))] == attendance.Summary(6, 5 * 60 + 30, 3, date(2026, 3, 9))
+
+
+def test_rollups_for_requested_keys_include_empty_periods():
+    result = attendance.rollups([(at(0, 9), at(0, 9, 15))], keys={('week', date(2026, 2, 23))})
+    assert result == {('week', date(2026, 2, 23)): attendance.Summary(0, 0, 0, None)}
@@ -0,0 +1,108 @@
+"""
+Tests for response compression and fingerprinted static URLs against a
+throwaway Flask app and static folder.
+
+    python -m pytest -q test_compression.py
+"""
+
+import gzip
+import os
+import tempfile
+
+from flask import Flask, Response, jsonify, render_template_string
+
+import assets
+import compression
+
+_dir = tempfile.mkdtemp(prefix='aptipro_compress_')
+os.makedirs(os.path.join(_dir, 'css'))
+with open(os.path.join(_dir, 'css', 'site.css'), 'w') as f:
+    f.write('body { color: #123456; }\n' * 100)
+with open(os.path.join(_dir, 'tiny.css'), 'w') as f:
+    f.write('a{}')
+
+app = Flask(__name__, static_folder=_dir, static_url_path='/static')
+app.config.update(COMPRESS_MIN_SIZE=200)
+compression.init_app(app)
+assets.init_app(app)
+
+PAGE = '<p>' + 'hello world ' * 200 + '</p>'
+
+
+@app.route('/page')
+def page():
+    return PAGE
+
+
+@app.route('/small')
+def small():
+    return 'tiny'
+
+
+@app.route('/data')
+def data():
+    return jsonify(items=list(range(500)))
+
+
+@app.route('/stream')
+def stream():
+    return Response((PAGE for _ in range(3)), mimetype='text/html')
+
+
+@app.route('/link')
+def link():
+    return render_template_string("{{ static_url('css/site.css') }} {{ static_url('missing.css') }}")
+
+
+client = app.test_client()
+GZIP = {'Accept-Encoding': 'gzip, deflate'}
+
+
+def test_text_responses_are_gzipped_above_the_threshold():
+    r = client.get('/page', headers=GZIP)
+    assert r.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in r.headers['Vary']
+    assert gzip.decompress(r.data).decode() == PAGE
+    assert int(r.headers['Content-Length']) == len(r.data) < len(PAGE)
+    assert client.get('/data', headers=GZIP).headers['Content-Encoding'] == 'gzip'
+
+    assert 'Content-Encoding' not in client.get('/small', headers=GZIP).headers
+    assert 'Content-Encoding' not in client.get('/stream', headers=GZIP).headers
+    assert 'Content-Encoding' not in client.get('/page').headers
+    assert 'Content-Encoding' not in client.get('/page', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+
+def test_encoding_negotiation():
+    assert compression.accepted('gzip;q=0.5, br, identity;q=0') == {'gzip', 'br'}
+    assert compression.choose_encoding('deflate') is None
+    assert compression.choose_encoding('*') == 'gzip'
+    if compression.brotli is not None:
+        assert compression.choose_encoding('gzip, br') == 'br'
+
+
+def test_static_url_fingerprints_by_content():
+    first, missing = client.get('/link').get_data(as_text=True).split()
+    assert first.startswith('/static/css/site.css?v=') and missing == '/static/missing.css'
+
+    path = os.path.join(_dir, 'css', 'site.css')
+    with open(path, 'a') as f:
+        f.write('p { margin: 0; }\n')
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = client.get('/link').get_data(as_text=True).split()[0]
+    assert second != first
+
+
+def test_fingerprinted_static_files_are_immutable_and_compressed():
+    url = client.get('/link').get_data(as_text=True).split()[0]
+    r = client.get(url, headers=GZIP)
+    assert r.headers['Cache-Control'] == assets.IMMUTABLE
+    assert r.headers['Content-Encoding'] == 'gzip'
+    plain = client.get('/static/css/site.css')
+    assert gzip.decompress(r.data) == plain.data
+    assert plain.headers.get('Cache-Control') != assets.IMMUTABLE
+    assert client.get('/static/css/site.css?v=stale').headers.get('Cache-Control') != assets.IMMUTABLE
+
+    # The weakened ETag still revalidates
+    assert r.headers['ETag'].startswith('W/')
+    assert client.get('/static/css/site.css', headers={**GZIP, 'If-None-Match': r.headers['ETag']}).status_code == 304
+    assert 'Content-Encoding' not in client.get('/static/tiny.css', headers=GZIP).headers
@@ -0,0 +1,92 @@
+"""
+Tests for db_routing's read-replica routing and fallback against throwaway
+Flask apps whose primary and replica are separate SQLite files.
+
+    python -m pytest -q test_db_routing.py
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import OperationalError
+
+import db_routing
+
+_dir = tempfile.mkdtemp(prefix='aptipro_routing_')
+
+
+def seed(path, label):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE IF NOT EXISTS note (id INTEGER PRIMARY KEY, label TEXT)')
+    conn.execute('DELETE FROM note')
+    conn.execute('INSERT INTO note (label) VALUES (?)', (label,))
+    conn.commit()
+    conn.close()
+
+
+def make_app(replica_path):
+    primary = os.path.join(_dir, 'primary.db')
+    seed(primary, 'primary')
+    app = Flask(__name__, instance_path=_dir)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}',
+                      SQLALCHEMY_BINDS={db_routing.REPLICA: db_routing.replica_bind(f'sqlite:///{replica_path}',
+                                                                                    app.config)},
+                      DB_REPLICA_RETRY_SECONDS=60)
+    db = SQLAlchemy(app, session_options={'class_': db_routing.RoutingSession})
+    db_routing.init_app(app, db)
+
+    @app.route('/label')
+    @db_routing.read_replica
+    def label():
+        return db.session.execute(db.text('SELECT label FROM note')).scalar()
+
+    return app
+
+
+@pytest.fixture(autouse=True)
+def routing_state():
+    saved, counters = dict(db_routing._state), dict(db_routing._counters)
+    db_routing._state.update(down_until=0.0, last_error=None)
+    yield
+    db_routing._state.update(saved)
+    db_routing._counters.update(counters)
+
+
+def test_reads_go_to_the_replica():
+    replica = os.path.join(_dir, 'replica.db')
+    seed(replica, 'replica')
+    client = make_app(replica).test_client()
+    before = db_routing._counters['replica_reads']
+    assert client.get('/label').get_data(as_text=True) == 'replica'
+    assert db_routing._counters['replica_reads'] == before + 1
+
+
+def test_unreachable_replica_falls_back_to_the_primary():
+    app = make_app(os.path.join(_dir, 'missing', 'replica.db'))  # the directory does not exist
+    client = app.test_client()
+    before = db_routing._counters['fallbacks']
+    assert client.get('/label').get_data(as_text=True) == 'primary'
+    assert db_routing._counters['fallbacks'] == before + 1
+    assert db_routing._state['down_until'] > time.monotonic() + 50
+    assert 'unable to open database file' in db_routing._state['last_error']
+    with app.app_context():
+        assert db_routing.pool_stats()['replica_down_for'] > 50
+
+    # While it is marked down the replica is not tried again
+    assert client.get('/label').get_data(as_text=True) == 'primary'
+    assert db_routing._counters['fallbacks'] == before + 1
+
+
+def test_query_errors_on_the_replica_are_not_swallowed():
+    replica = os.path.join(_dir, 'empty.db')
+    sqlite3.connect(replica).close()  # reachable, but without the table
+    app = make_app(replica)
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    with pytest.raises(OperationalError, match='no such table'):
+        app.test_client().get('/label')
+    assert db_routing._state['down_until'] == 0.0
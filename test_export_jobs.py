@@ -0,0 +1,37 @@
+"""
+Tests for the CSV export jobs against app.py on a throwaway SQLite
+database (see conftest.py), run through job_queue like a worker would.
+
+    python -m pytest -q test_export_jobs.py
+"""
+
+import csv
+
+import pytest
+
+import job_queue
+from app import Answer, User, db
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+
+def export(kind):
+    """Run one export job and return its CSV rows."""
+    job = job_queue.enqueue(kind)
+    job_queue.work(once=True)
+    db.session.refresh(job)
+    assert job.status == job_queue.SUCCEEDED, job.error
+    with open(job_queue.artifact_file(job), newline='', encoding='utf-8-sig') as f:
+        return list(csv.reader(f))
+
+
+def test_legacy_rows_without_dates_export_blank(make_student, make_question):
+    """Answers and members from before the date columns were filled in."""
+    user, question = make_student(full_name='No Dates'), make_question()
+    db.session.execute(db.update(User).where(User.id == user.id).values(created_at=db.null()))
+    db.session.execute(db.insert(Answer).values(student_id=user.id, question_id=question.id, selected_option='B',
+                                                is_correct=True, submitted_at=db.null()))
+    db.session.commit()
+
+    assert ['No Dates', user.username, '2 + 2?', 'CORRECT', 'N/A', ''] in export('export_submissions')
+    assert ['No Dates', user.username, 'STUDENT', ''] in export('export_members')
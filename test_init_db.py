@@ -0,0 +1,70 @@
+"""
+Tests for init_db()'s schema fingerprint fast path against app.py on a
+throwaway SQLite database (see conftest.py).
+
+    python -m pytest -q test_init_db.py
+"""
+
+import pytest
+from sqlalchemy import event
+
+import app as aptipro
+from app import SchemaMeta, app, db, init_db, schema_fingerprint
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+
+@pytest.fixture
+def statements():
+    """SQL statements run on the engine while the test runs."""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield seen
+        event.remove(db.engine, 'before_cursor_execute', record)
+        db.session.merge(SchemaMeta(key='schema_fingerprint', value=schema_fingerprint()))
+        db.session.commit()
+
+
+def alters(statements):
+    return [s for s in statements if s.lstrip().upper().startswith('ALTER TABLE')]
+
+
+def stored_fingerprint():
+    db.session.expire_all()
+    return db.session.get(SchemaMeta, 'schema_fingerprint').value
+
+
+def test_same_fingerprint_skips_the_migrations(statements, capsys):
+    assert stored_fingerprint() == schema_fingerprint()  # written by the init_db() run at import
+    statements.clear()
+    init_db()
+    assert 'up to date — skipping migrations' in capsys.readouterr().out
+    assert alters(statements) == []
+    assert len(statements) <= 2  # the schema_meta lookup
+
+
+def test_force_runs_the_migrations_again(statements, monkeypatch, capsys):
+    monkeypatch.setenv('FORCE_DB_INIT', 'true')
+    init_db()
+    assert 'Initialization complete' in capsys.readouterr().out
+    assert alters(statements)
+    assert stored_fingerprint() == schema_fingerprint()
+
+
+def test_changed_schema_runs_the_migrations_and_stores_the_new_fingerprint(statements, monkeypatch, capsys):
+    old = schema_fingerprint()
+    monkeypatch.setattr(aptipro, 'SCHEMA_REVISION', aptipro.SCHEMA_REVISION + 1)
+    assert schema_fingerprint() != old
+    init_db()
+    assert 'Initialization complete' in capsys.readouterr().out
+    assert alters(statements)
+    assert stored_fingerprint() == schema_fingerprint()
+
+    statements.clear()
+    init_db()
+    assert alters(statements) == []
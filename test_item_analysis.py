@@ -0,0 +1,102 @@
+"""
+Tests for the NumPy item analysis, checked against a plain-Python
+computation over a small random response set.
+
+    python -m pytest -q test_item_analysis.py
+"""
+
+import math
+import random
+import statistics
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import item_analysis  # noqa: E402
+
+
+def synthetic(seed=7, students=60, questions=8):
+    """Answer rows (question_id, student_id, option, seconds, expired) with abilities behind them."""
+    rng = random.Random(seed)
+    ability = {s: rng.random() for s in range(1, students + 1)}
+    keys = {q: rng.randrange(4) for q in range(100, 100 + questions)}
+    rows = []
+    for s, a in ability.items():
+        for q, key in keys.items():
+            if rng.random() < 0.3:
+                continue  # sparse: not everyone answers everything
+            expired = rng.random() < 0.05
+            if expired:
+                option = None
+            elif q == 100:
+                option = 'ABCD'[(key + 1) % 4] if rng.random() < a else 'ABCD'[key]  # mis-keyed
+            else:
+                option = 'ABCD'[key] if rng.random() < a else 'ABCD'[rng.randrange(4)]
+            rows.append((q, s, option, None if expired else rng.randint(5, 300), expired))
+    return rows, keys
+
+
+def reference(rows, keys):
+    """{question: (difficulty, discrimination, median seconds)} without NumPy."""
+    first = {}
+    for q, s, option, seconds, expired in rows:
+        first.setdefault((q, s), (None if expired else option, seconds))
+    score = {(q, s): int(o is not None and 'ABCD'.index(o) == keys[q]) for (q, s), (o, _) in first.items()}
+    answered, right = {}, {}
+    for (q, s), x in score.items():
+        answered[s] = answered.get(s, 0) + 1
+        right[s] = right.get(s, 0) + x
+    out = {}
+    for q in keys:
+        pairs = [(x, (right[s] - x) / (answered[s] - 1)) for (qq, s), x in score.items()
+                 if qq == q and answered[s] > 1]
+        xs = [x for (qq, _), x in score.items() if qq == q]
+        times = [t for (qq, _), (o, t) in first.items() if qq == q and t is not None]
+        out[q] = (sum(xs) / len(xs), statistics.correlation(*zip(*pairs)), statistics.median(times))
+    return out
+
+
+def student_totals(rows, keys):
+    """item_analysis.totals() over each student's first answers."""
+    first = {}
+    for q, s, option, _, expired in rows:
+        first.setdefault((q, s), None if expired else option)
+    totals = {}
+    for (q, s), option in first.items():
+        n, c = totals.get(s, (0, 0))
+        totals[s] = (n + 1, c + int(option is not None and 'ABCD'.index(option) == keys[q]))
+    return item_analysis.totals((s, n, c) for s, (n, c) in totals.items())
+
+
+def test_matches_the_plain_python_computation():
+    rows, keys = synthetic()
+    # Retakes after the first answer are ignored
+    rows += [(q, s, 'ABCD'[keys[q]], 1, False) for q, s, *_ in rows[:20]]
+    items = item_analysis.analyse(item_analysis.responses(rows), keys, student_totals(rows, keys))
+    expected = reference(rows, keys)
+    assert [i.question_id for i in items] == sorted(keys)
+    for item in items:
+        difficulty, discrimination, median = expected[item.question_id]
+        assert math.isclose(item.difficulty, difficulty)
+        assert math.isclose(item.discrimination, discrimination, abs_tol=1e-9)
+        assert item.times[1] == median
+        assert math.isclose(sum(o.share for o in item.options), 1, abs_tol=0.1)  # expired choose nothing
+
+
+def test_flags_a_mis_keyed_question():
+    rows, keys = synthetic(students=200)
+    items = {i.question_id: i for i in item_analysis.analyse(
+        item_analysis.responses(rows), keys, student_totals(rows, keys))}
+    assert 'negative_discrimination' in items[100].flags
+    assert 'key_beaten' in items[100].flags
+    assert not {'negative_discrimination', 'key_beaten'} & set(items[101].flags)
+
+
+def test_few_responses_and_unknown_students_are_left_alone():
+    rows = [(1, 1, 'A', 10, False), (1, 2, 'B', 20, False)]
+    items = item_analysis.analyse(item_analysis.responses(rows), {1: 0}, item_analysis.totals([]))
+    assert items[0].flags == () and math.isnan(items[0].discrimination)
+    assert items[0].times == (12.5, 15.0, 17.5, 19.0)
+    assert item_analysis.analyse(item_analysis.responses([]), {}, item_analysis.totals([])) == []
+
@@ -0,0 +1,163 @@
+"""
+Tests for job_queue against a throwaway Flask app and SQLite file.
+
+    python -m pytest -q test_job_queue.py
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import job_queue
+
+_dir = tempfile.mkdtemp(prefix='aptipro_jobs_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(_dir, 'jobs.db')}",
+                  JOB_INLINE_WORKERS=0, JOB_RETRY_BACKOFF=0, JOB_LEASE_SECONDS=3)
+db = SQLAlchemy(app)
+
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text)
+    status = db.Column(db.String(20), default='queued')
+    progress = db.Column(db.Integer, default=0)
+    message = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    created_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime)
+    run_after = db.Column(db.DateTime)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    locked_by = db.Column(db.String(100))
+    artifact_path = db.Column(db.String(255))
+    artifact_name = db.Column(db.String(255))
+
+
+job_queue.init_app(app, db, Job)
+with app.app_context():
+    db.create_all()
+
+runs = []
+
+
+@job_queue.handler('write')
+def write_job(ctx):
+    runs.append(ctx.job_id)
+    with open(ctx.artifact_path('out.csv'), 'w') as f:
+        f.write(f"n,{ctx.params['n']}\n")
+    return f"wrote {ctx.params['n']}"
+
+
+@job_queue.handler('flaky')
+def flaky_job(ctx):
+    runs.append(ctx.attempt)
+    if ctx.attempt < ctx.params['succeed_on']:
+        raise RuntimeError(f"attempt {ctx.attempt} failed")
+    return 'ok'
+
+
+@job_queue.handler('slow')
+def slow_job(ctx):
+    for i in range(100):
+        time.sleep(0.05)
+        ctx.progress(i, 100)
+    return 'finished'
+
+
+def get(job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id)
+
+
+def enqueue(*args, **kwargs):
+    with app.app_context():
+        return job_queue.enqueue(*args, **kwargs).id
+
+
+def test_job_runs_and_keeps_artifact():
+    job_id = enqueue('write', {'n': 7})
+    job_queue.work(once=True)
+    job = get(job_id)
+    assert (job.status, job.progress, job.message, job.attempts) == ('succeeded', 100, 'wrote 7', 1)
+    with app.app_context():
+        assert open(job_queue.artifact_file(job)).read() == 'n,7\n'
+
+
+def test_unique_enqueue_reuses_active_job():
+    first = enqueue('write', {'n': 1}, unique=True)
+    assert enqueue('write', {'n': 1}, unique=True) == first
+    assert enqueue('write', {'n': 2}, unique=True) != first
+    job_queue.work(once=True)
+
+
+def test_failed_attempts_are_retried_then_fail():
+    runs.clear()
+    ok = enqueue('flaky', {'succeed_on': 2})
+    bad = enqueue('flaky', {'succeed_on': 9}, max_attempts=2)
+    job_queue.work(once=True)
+    assert get(ok).status == 'succeeded' and get(ok).attempts == 2
+    job = get(bad)
+    assert job.status == 'failed' and job.attempts == 2
+    assert 'attempt 2 failed' in job_queue.as_dict(job)['error']
+
+    with app.app_context():
+        assert job_queue.retry(bad)
+    assert get(bad).status == 'queued' and get(bad).attempts == 0
+    with app.app_context():
+        job_queue.cancel(bad)
+
+
+def test_each_job_runs_once_across_workers():
+    runs.clear()
+    ids = [enqueue('write', {'n': i}) for i in range(20)]
+    workers = [threading.Thread(target=job_queue.work, kwargs={'worker_id': f'w{i}', 'once': True}) for i in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert sorted(runs) == ids
+    assert all(get(i).status == 'succeeded' for i in ids)
+
+
+def test_cancel_queued_and_running_jobs():
+    queued = enqueue('write', {'n': 0})
+    with app.app_context():
+        assert job_queue.cancel(queued)
+    assert get(queued).status == 'cancelled'
+
+    running = enqueue('slow')
+    worker = threading.Thread(target=job_queue.work, kwargs={'once': True})
+    worker.start()
+    deadline = time.time() + 5
+    while get(running).progress < 5 and time.time() < deadline:
+        time.sleep(0.05)
+    with app.app_context():
+        assert job_queue.cancel(running)
+    worker.join(timeout=10)
+    job = get(running)
+    assert job.status == 'cancelled' and 0 < job.progress < 100
+
+
+def test_stale_running_job_is_requeued():
+    job_id = enqueue('write', {'n': 3})
+    with app.app_context():
+        # A worker claimed it and then died without finishing
+        job = db.session.get(Job, job_id)
+        job.status, job.attempts, job.locked_by = 'running', 1, 'dead-worker'
+        job.heartbeat_at = datetime.now() - timedelta(seconds=60)
+        db.session.commit()
+        assert job_queue.reap_stale() == 1
+    assert get(job_id).status == 'queued'
+    job_queue.work(once=True)
+    assert get(job_id).status == 'succeeded' and get(job_id).attempts == 2
@@ -0,0 +1,77 @@
+"""
+Tests for the meet_check job, its scheduled task and the admin pages that
+show its results, against app.py on a throwaway SQLite database (see
+conftest.py) and the stub Meet server from test_meet_utils.py.
+
+    python -m pytest -q test_meet_check.py
+"""
+
+import pytest
+
+import job_queue
+from app import Classroom, Job, MeetLink, MeetLinkStatus, app, db, scheduled_meet_check
+from test_meet_utils import StubMeetHandler, start_stub
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+
+@pytest.fixture
+def stub():
+    server, base = start_stub()
+    with app.app_context():
+        MeetLink.query.delete()
+        classroom = Classroom.query.first() or Classroom()
+        classroom.active_meet_link = f'{base}/live'
+        db.session.add(classroom)
+        db.session.add(MeetLink(label='Doubts', url=f'{base}/missing'))
+        db.session.commit()
+        yield base
+        db.session.rollback()
+        MeetLink.query.delete()
+        MeetLinkStatus.query.delete()
+        Job.query.filter_by(kind='meet_check').delete()
+        db.session.commit()
+    server.shutdown()
+
+
+def statuses():
+    db.session.expire_all()
+    return {row.url: (row.title, row.status) for row in MeetLinkStatus.query}
+
+
+def test_job_stores_results_once_for_every_worker(stub):
+    assert scheduled_meet_check().startswith('Queued job')
+    job_queue.work(once=True)
+    assert statuses() == {f'{stub}/live': ('Algebra Review', 'Online'),
+                          f'{stub}/missing': ('Meeting Unknown (Code 404)', 'Inaccessible')}
+    assert Classroom.query.first().detected_title == 'Algebra Review'
+
+    # Fresh results are not checked again
+    assert scheduled_meet_check() == 'Meet links up to date'
+    assert StubMeetHandler.hits == {'/live': 1, '/missing': 1}
+
+
+def test_removed_links_lose_their_status(stub):
+    scheduled_meet_check()
+    job_queue.work(once=True)
+    MeetLink.query.delete()
+    db.session.commit()
+    job_queue.enqueue('meet_check', {'force': True})
+    job_queue.work(once=True)
+    assert set(statuses()) == {f'{stub}/live'}
+
+
+def test_refresh_queues_a_forced_check_and_pages_read_the_rows(stub, make_student, login):
+    client = login(make_student(role='admin'))
+    page = client.get('/admin/dashboard/panel/meet_links').get_data(as_text=True)
+    assert 'Checking…' in page
+
+    assert client.get('/admin/refresh_classroom').status_code == 302
+    job = Job.query.filter_by(kind='meet_check').one()
+    assert job.status == 'queued' and '"force": true' in job.params
+    job_queue.work(once=True)
+
+    page = client.get('/admin/dashboard/panel/meet_links').get_data(as_text=True)
+    assert 'Inaccessible' in page and 'Checking…' not in page
+    page = client.get('/admin/dashboard').get_data(as_text=True)
+    assert 'Algebra Review' in page
@@ -0,0 +1,95 @@
+"""
+Tests for meet_utils against a local stub HTTP server (no internet needed).
+
+    python -m pytest -q test_meet_utils.py
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import meet_utils
+
+PAGES = {
+    '/live': (200, '<html><head><title>Algebra Review - Google Meet</title></head>'
+                   '<body>Ready to join?</body></html>'),
+    '/ended': (200, '<html><head><title>Google Meet</title></head><body>This call has ended</body></html>'),
+    '/missing': (404, 'not found'),
+}
+SLOW_SECONDS = 0.4
+
+
+class StubMeetHandler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        StubMeetHandler.hits[self.path] = StubMeetHandler.hits.get(self.path, 0) + 1
+        if self.path.startswith('/slow'):
+            time.sleep(SLOW_SECONDS)
+            status, body = PAGES['/live']
+        elif self.path == '/hang':
+            time.sleep(3)
+            status, body = 200, ''
+        else:
+            status, body = PAGES.get(self.path, (404, ''))
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    StubMeetHandler.hits = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubMeetHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def test_get_meet_info_statuses():
+    server, base = start_stub()
+    try:
+        assert meet_utils.get_meet_info(f'{base}/live') == {'title': 'Algebra Review', 'status': 'Online'}
+        assert meet_utils.get_meet_info(f'{base}/ended')['status'] == 'Offline'
+        assert meet_utils.get_meet_info(f'{base}/missing')['status'] == 'Inaccessible'
+        assert meet_utils.get_meet_info(f'{base}/hang', timeout=0.5)['status'] == 'Unknown'
+        assert meet_utils.get_meet_info('')['status'] == 'Inactive'
+    finally:
+        server.shutdown()
+
+
+def test_get_meet_info_connection_error():
+    server, base = start_stub()
+    server.shutdown()
+    server.server_close()
+    assert meet_utils.get_meet_info(f'{base}/live', timeout=1)['status'] == 'Offline'
+
+
+def test_check_links_runs_concurrently():
+    server, base = start_stub()
+    try:
+        urls = [f'{base}/slow{i}' for i in range(6)]
+        t0 = time.perf_counter()
+        results = meet_utils.check_links(urls + [urls[0], None, ''], workers=6)
+        elapsed = time.perf_counter() - t0
+        assert list(results) == urls
+        assert all(info['status'] == 'Online' for info in results.values())
+        assert elapsed < SLOW_SECONDS * 3  # sequential would take 6 x SLOW_SECONDS
+        assert sum(StubMeetHandler.hits.values()) == 6
+    finally:
+        server.shutdown()
+
+
+def test_check_links_mixed_results():
+    server, base = start_stub()
+    try:
+        results = meet_utils.check_links([f'{base}/live', f'{base}/missing'])
+        assert results[f'{base}/live'] == {'title': 'Algebra Review', 'status': 'Online'}
+        assert results[f'{base}/missing']['status'] == 'Inaccessible'
+        assert meet_utils.check_links([None, '']) == {}
+    finally:
+        server.shutdown()
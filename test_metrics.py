@@ -0,0 +1,58 @@
+"""
+Tests that the caches added around app.py report hits and misses on
+/metrics, scraped from loopback like Prometheus does (see conftest.py).
+
+    python -m pytest -q test_metrics.py
+"""
+
+import pytest
+
+pytest.importorskip('prometheus_client')
+from prometheus_client.parser import text_string_to_metric_families  # noqa: E402
+
+import app as aptipro  # noqa: E402
+import compression  # noqa: E402
+import versions  # noqa: E402
+from app import app  # noqa: E402
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+
+@pytest.fixture
+def admin(make_student, login):
+    return login(make_student(role='admin'))
+
+
+def cache_counts():
+    """{(cache, result): value} from a /metrics scrape."""
+    r = app.test_client().get('/metrics')
+    assert r.status_code == 200
+    return {(s.labels['cache'], s.labels['result']): s.value
+            for family in text_string_to_metric_families(r.get_data(as_text=True))
+            if family.name == 'aptipro_cache_requests'
+            for s in family.samples if s.name == 'aptipro_cache_requests_total'}
+
+
+def delta(before, after):
+    return {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+
+
+def test_cache_lookups_are_counted(admin):
+    aptipro._summary_cache.clear()
+    aptipro._facet_cache.clear()
+    compression._static_cache.clear()
+    versions._content.update(value=None, read_at=0.0)
+    before = cache_counts()
+
+    for _ in range(2):
+        assert admin.get('/admin/dashboard/summary').status_code == 200
+        assert admin.get('/api/submissions').status_code == 200
+        assert admin.get('/static/js/admin-notifications.js', headers={'Accept-Encoding': 'gzip'}) \
+            .headers['Content-Encoding'] == 'gzip'
+        with app.app_context():
+            versions.content_version()
+
+    counted = delta(before, cache_counts())
+    assert counted == {(cache, result): 1
+                       for cache in ('admin_summary', 'submission_facets', 'static_compressed', 'content_version')
+                       for result in ('hit', 'miss')}
@@ -0,0 +1,66 @@
+"""
+Tests for slotted list-page projections against a throwaway Flask app and
+SQLite file.
+
+    python -m pytest -q test_projection.py
+"""
+
+import os
+import tempfile
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import projection
+
+_dir = tempfile.mkdtemp(prefix='aptipro_projection_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(_dir, 'projection.db')}")
+db = SQLAlchemy(app)
+
+
+class Member(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50))
+    photo = db.Column(db.LargeBinary)
+
+
+MemberRow = projection.define('MemberRow', Member.id, Member.name)
+
+
+class ScoredRow(projection.define('ScoredBase', Member.id, Member.name)):
+    __slots__ = ('answered', 'correct')
+
+    @property
+    def accuracy(self):
+        return self.correct / self.answered * 100 if self.answered else 0
+
+
+with app.app_context():
+    db.create_all()
+    db.session.add_all([Member(name='ana', photo=b'x' * 1000), Member(name='bo')])
+    db.session.commit()
+
+
+def test_rows_hold_only_the_selected_columns_and_are_untracked():
+    with app.app_context():
+        rows = MemberRow.all(MemberRow.query(db.session).order_by(Member.id))
+        assert [(r.id, r.name) for r in rows] == [(1, 'ana'), (2, 'bo')]
+        assert rows[0].asdict() == {'id': 1, 'name': 'ana'}
+        assert repr(rows[1]) == "MemberRow(id=2, name='bo')"
+        assert len(db.session.identity_map) == 0
+        assert not hasattr(rows[0], '__dict__')
+        with pytest.raises(AttributeError):
+            rows[0].photo = b''
+
+
+def test_subclass_slots_are_filled_by_keyword():
+    row = ScoredRow(1, 'ana', answered=4, correct=3)
+    assert (row.accuracy, row.extra) == (75.0, ('answered', 'correct'))
+    assert ScoredRow(2, 'bo').answered is None
+
+
+def test_duplicate_column_names_are_rejected():
+    with pytest.raises(ValueError):
+        projection.define('Bad', Member.id, Member.id)
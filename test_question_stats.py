@@ -0,0 +1,110 @@
+"""
+Tests for the question_stats rows, checked against a plain-Python
+recomputation from the answers, on app.py's throwaway SQLite database
+(see conftest.py).
+
+    python -m pytest -q test_question_stats.py
+"""
+
+import random
+import statistics
+from datetime import timedelta
+
+import pytest
+
+from app import Answer, QuestionStats, db, get_now_ist, refresh_question_stats
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+
+@pytest.fixture
+def make_bank(make_student, make_question):
+    """make_bank(rng): questions answered at random by students; returns (questions, students)."""
+    def make(rng, questions=4, students=12):
+        qs = [make_question(correct_answer='ABCD'[i % 4]) for i in range(questions)]
+        users = [make_student() for _ in range(students)]
+        answer_at_random(rng, qs[:-1], users)  # the last question stays unanswered
+        return qs, users
+    return make
+
+
+def answer_at_random(rng, questions, users):
+    for question in questions:
+        for user in users:
+            for attempt in range(rng.randint(0, 3)):
+                expired = rng.random() < 0.15
+                option = None if expired or rng.random() < 0.05 else rng.choice('ABCD')
+                db.session.add(Answer(
+                    student_id=user.id, question_id=question.id, selected_option=option,
+                    is_correct=option == question.correct_answer, is_expired=expired, attempt_number=attempt + 1,
+                    time_taken_sec=None if rng.random() < 0.1 else rng.randint(3, 600),
+                    submitted_at=get_now_ist() - timedelta(days=1)))
+    db.session.commit()
+
+
+def recompute(question):
+    answers = Answer.query.filter_by(question_id=question.id).all()
+    if not answers:
+        return None
+    on_time = [a for a in answers if not a.is_expired]
+    correct = sum(1 for a in answers if a.is_correct)
+    times = [a.time_taken_sec for a in on_time if a.time_taken_sec is not None]
+    return {
+        'attempts': len(answers),
+        'students': len({a.student_id for a in answers}),
+        'correct': correct,
+        'expired': len(answers) - len(on_time),
+        **{f'option_{o.lower()}': sum(1 for a in answers if a.selected_option == o) for o in 'ABCD'},
+        'accuracy': correct * 100.0 / len(on_time) if on_time else None,
+        'median_time': statistics.median(times) if times else None,
+    }
+
+
+def stored(question):
+    row = db.session.get(QuestionStats, question.id)
+    if row is None:
+        return None
+    return {
+        'attempts': row.attempts, 'students': row.students, 'correct': row.correct, 'expired': row.expired,
+        'option_a': row.option_a, 'option_b': row.option_b, 'option_c': row.option_c, 'option_d': row.option_d,
+        'accuracy': row.accuracy, 'median_time': row.median_time,
+    }
+
+
+def check(questions):
+    db.session.expire_all()
+    for question in questions:
+        expected = recompute(question)
+        if expected is None:
+            assert stored(question) is None, question.id
+        else:
+            assert stored(question) == pytest.approx(expected), question.id
+
+
+def test_full_refresh_matches_the_answers(make_bank):
+    questions, _ = make_bank(random.Random(47))
+    assert refresh_question_stats(full=True).startswith('Stats refreshed')
+    check(questions)
+    assert stored(questions[-1]) is None
+
+
+def test_incremental_refresh_picks_up_new_and_removed_answers(make_bank):
+    questions, users = make_bank(random.Random(11))
+    refresh_question_stats(full=True)
+
+    first, second, user = questions[0], questions[1], users[-1]
+    db.session.add_all([Answer(student_id=user.id, question_id=first.id, selected_option=first.correct_answer,
+                               is_correct=True, time_taken_sec=5, submitted_at=get_now_ist()),
+                        Answer(student_id=user.id, question_id=questions[-1].id, selected_option='A',
+                               is_correct=questions[-1].correct_answer == 'A', time_taken_sec=9,
+                               submitted_at=get_now_ist())])
+    db.session.commit()
+    assert refresh_question_stats().startswith('Stats refreshed')
+    check(questions)
+
+    # A question left without answers loses its row
+    Answer.query.filter_by(question_id=second.id).delete()
+    db.session.commit()
+    refresh_question_stats(question_ids=[second.id])
+    check(questions)
+    assert stored(second) is None
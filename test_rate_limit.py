@@ -0,0 +1,117 @@
+"""
+Tests for the token-bucket rate limiter against a throwaway Flask app and
+SQLite file.
+
+    python -m pytest -q test_rate_limit.py
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+import pytest
+from flask import Flask, jsonify
+from flask_login import LoginManager
+
+import rate_limit
+
+_dir = tempfile.mkdtemp(prefix='aptipro_rate_limit_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SECRET_KEY='test')
+LoginManager(app).user_loader(lambda user_id: None)
+rate_limit.init_app(app, {'form': '2/60', 'api': '1/30', 'off': '0'})
+
+
+@app.route('/form', methods=['GET', 'POST'])
+@rate_limit.limit('form', key='ip', methods=('POST',))
+def form():
+    return 'ok'
+
+
+@app.route('/api/thing', methods=['POST'])
+@rate_limit.limit('api')
+def api_thing():
+    return jsonify(ok=True)
+
+
+def test_parse():
+    assert rate_limit.parse('x', '10/60') == rate_limit.Policy('x', 10, 60.0)
+    assert rate_limit.parse('x', '0') is None and rate_limit.parse('x', '') is None
+    for bad in ('10', 'ten/60', '0/60', '5/0'):
+        with pytest.raises(ValueError):
+            rate_limit.parse('x', bad)
+
+
+def test_bucket_refills_evenly():
+    store = rate_limit.SQLiteStore(os.path.join(_dir, 'refill.db'))
+    policy = rate_limit.Policy('p', 3, 30)
+    assert [store.take(policy, 'k', 100)[0] for _ in range(4)] == [True, True, True, False]
+    assert store.take(policy, 'k', 105)[0] is False  # half a token back
+    assert store.take(policy, 'k', 110)[0] is True
+    assert store.take(policy, 'other', 110)[0] is True
+    assert store.counters() == {('p', 'allowed'): 5, ('p', 'limited'): 2}
+    assert store.top_limited(5) == [('k', 'p', 2, 105)]
+
+
+def _take_many(path, n, results):
+    store = rate_limit.SQLiteStore(path)
+    policy = rate_limit.Policy('shared', 50, 3600)
+    results.put(sum(store.take(policy, 'k', 1000.0)[0] for _ in range(n)))
+
+
+def test_processes_share_one_bucket():
+    path = os.path.join(_dir, 'shared.db')
+    rate_limit.SQLiteStore(path)
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_take_many, args=(path, 40, results)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    allowed = sum(results.get(timeout=30) for _ in workers)
+    for w in workers:
+        w.join()
+    assert allowed == 50
+
+
+def test_routes_get_429_with_retry_after():
+    client = app.test_client()
+    assert client.get('/form').status_code == 200
+    assert [client.post('/form').status_code for _ in range(3)] == [200, 200, 429]
+    r = client.post('/form')
+    assert r.status_code == 429 and r.mimetype == 'text/plain'
+    assert 1 <= int(r.headers['Retry-After']) <= 30
+    assert client.get('/form').status_code == 200  # only POSTs are limited
+
+    # Another address has its own bucket
+    assert client.post('/form', environ_base={'REMOTE_ADDR': '10.0.0.9'}).status_code == 200
+
+    assert client.post('/api/thing').status_code == 200
+    r = client.post('/api/thing')
+    assert r.status_code == 429 and r.get_json()['retry_after'] == int(r.headers['Retry-After'])
+
+    stats = {p['name']: p for p in rate_limit.stats()['policies']}
+    assert set(stats) == {'form', 'api'}
+    assert (stats['form']['allowed'], stats['form']['limited']) == (3, 2)
+
+
+def test_proxy_hops_pick_the_client_from_x_forwarded_for(monkeypatch):
+    client = app.test_client()
+    proxy = {'REMOTE_ADDR': '10.1.0.1'}
+    monkeypatch.setitem(rate_limit._state, 'proxy_hops', 1)
+    students = [client.post('/form', environ_base=proxy, headers={'X-Forwarded-For': f'203.0.113.{i}'}).status_code
+                for i in range(5)]
+    assert students == [200] * 5  # one bucket per student, not one for the proxy
+    spoofed = {'X-Forwarded-For': '198.51.100.7, 203.0.113.9'}  # the client's own entry is ignored
+    assert [client.post('/form', environ_base=proxy, headers=spoofed).status_code for _ in range(3)] == [200, 200, 429]
+
+
+def test_forwarded_request_without_proxy_hops_skips_the_ip_limit(caplog):
+    client = app.test_client()
+    behind = {'environ_base': {'REMOTE_ADDR': '10.2.0.1'}, 'headers': {'X-Forwarded-For': '203.0.113.50'}}
+    before = rate_limit.stats()['unknown_ip']
+    assert [client.post('/form', **behind).status_code for _ in range(5)] == [200] * 5
+    assert rate_limit.stats()['unknown_ip'] == before + 5
+    assert sum('RATE_LIMIT_PROXY_HOPS is 0' in r.message for r in caplog.records) == (0 if before else 1)
+    # Without the header the socket address is still limited
+    assert [client.post('/form', environ_base={'REMOTE_ADDR': '10.2.0.2'}).status_code
+            for _ in range(3)] == [200, 200, 429]
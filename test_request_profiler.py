@@ -0,0 +1,89 @@
+"""
+Tests for request_profiler's triggers and profile rotation against a
+throwaway Flask app.
+
+    python -m pytest -q test_request_profiler.py
+"""
+
+import os
+import tempfile
+
+import pytest
+from flask import Flask, request
+
+import request_profiler
+
+_dir = tempfile.mkdtemp(prefix='aptipro_profiler_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SECRET_KEY='test', PROFILE_DIR=os.path.join(_dir, 'profiles'), PROFILE_MAX_FILES=3)
+request_profiler.init_app(app, is_admin=lambda: request.headers.get('X-Test-Role') == 'admin')
+
+
+@app.route('/work')
+def work():
+    return str(sum(i * i for i in range(1000)))
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    saved = dict(request_profiler._state)
+    request_profiler._state.update(dir=str(tmp_path), sample_rate=0.0, max_files=3)
+    yield tmp_path
+    request_profiler._state.update(saved)
+
+
+def saved(directory):
+    return sorted(os.listdir(directory))
+
+
+def test_plain_requests_are_not_profiled(profiles):
+    client = app.test_client()
+    r = client.get('/work')
+    assert 'X-Profile-Id' not in r.headers
+    assert client.get('/work?_profile=1').headers.get('X-Profile-Id') is None  # not an admin
+    assert client.get('/work?_profile=forged').headers.get('X-Profile-Id') is None
+    assert saved(profiles) == []
+
+
+def test_admin_flag_writes_a_profile(profiles):
+    r = app.test_client().get('/work?_profile=1', headers={'X-Test-Role': 'admin'})
+    profile_id = r.headers['X-Profile-Id']
+    assert saved(profiles) == [profile_id + '.json', profile_id + '.prof']
+    record = request_profiler.load_profile(profile_id)
+    assert record['endpoint'] == 'work' and record['status'] == 200
+    assert any(row['function'] == 'work' for row in record['top_functions'])
+
+
+def test_valid_token_writes_a_profile(profiles):
+    with app.app_context():
+        token = request_profiler.make_token()
+    client = app.test_client()
+    assert client.get(f'/work?_profile={token}').headers.get('X-Profile-Id')
+    assert client.get('/work', headers={'X-Profile-Token': token}).headers.get('X-Profile-Id')
+    assert len(saved(profiles)) == 4
+
+
+def test_expired_token_is_refused(profiles):
+    with app.app_context():
+        token = request_profiler.make_token()
+    request_profiler._state['max_age'] = -1
+    assert app.test_client().get(f'/work?_profile={token}').headers.get('X-Profile-Id') is None
+    assert saved(profiles) == []
+
+
+def test_sample_hit_writes_a_profile(profiles, monkeypatch):
+    request_profiler._state['sample_rate'] = 0.5
+    client = app.test_client()
+    monkeypatch.setattr(request_profiler.random, 'random', lambda: 0.9)
+    assert client.get('/work').headers.get('X-Profile-Id') is None
+    monkeypatch.setattr(request_profiler.random, 'random', lambda: 0.1)
+    assert client.get('/work').headers.get('X-Profile-Id')
+    assert len(saved(profiles)) == 2
+
+
+def test_rotation_keeps_the_newest_files(profiles):
+    client = app.test_client()
+    ids = [client.get('/work?_profile=1', headers={'X-Test-Role': 'admin'}).headers['X-Profile-Id']
+           for _ in range(5)]
+    assert saved(profiles) == sorted(f'{i}{ext}' for i in ids[-3:] for ext in ('.json', '.prof'))
+    assert [p['id'] for p in request_profiler.list_profiles()] == ids[-3:][::-1]
@@ -0,0 +1,143 @@
+"""
+Tests for scheduler (cron specs, single-runner ticks) against a throwaway
+Flask app and SQLite file with a controllable clock.
+
+    python -m pytest -q test_scheduler.py
+"""
+
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import scheduler
+from scheduler import CronSpec
+
+_dir = tempfile.mkdtemp(prefix='aptipro_sched_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(_dir, 'sched.db')}",
+                  SCHEDULER_ENABLED=False, SCHEDULER_LEASE_SECONDS=600)
+db = SQLAlchemy(app)
+clock = [datetime(2026, 3, 2, 9, 58)]  # a Monday
+
+
+class ScheduledTask(db.Model):
+    __tablename__ = 'scheduled_task'
+    name = db.Column(db.String(50), primary_key=True)
+    spec = db.Column(db.String(100))
+    next_run_at = db.Column(db.DateTime)
+    lease_owner = db.Column(db.String(100))
+    lease_until = db.Column(db.DateTime)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_duration_ms = db.Column(db.Float)
+    last_status = db.Column(db.String(20))
+    last_message = db.Column(db.String(255))
+    last_error = db.Column(db.Text)
+    run_count = db.Column(db.Integer, default=0)
+    failure_count = db.Column(db.Integer, default=0)
+
+
+scheduler._tasks.clear()  # drop tasks registered by app.py if another test module imported it
+scheduler.init_app(app, db, ScheduledTask, now=lambda: clock[0])
+with app.app_context():
+    db.create_all()
+
+calls = []
+
+
+@scheduler.task('every_ten', '*/10 * * * *')
+def every_ten():
+    calls.append(clock[0])
+    return f"call {len(calls)}"
+
+
+@scheduler.task('nightly_fail', '@daily')
+def nightly_fail():
+    raise RuntimeError('disk full')
+
+
+def row(name):
+    with app.app_context():
+        return db.session.get(ScheduledTask, name)
+
+
+def tick():
+    with app.app_context():
+        return scheduler.tick()
+
+
+@pytest.mark.parametrize('spec, after, expected', [
+    ('*/15 * * * *', datetime(2026, 3, 2, 10, 7, 30), datetime(2026, 3, 2, 10, 15)),
+    ('30 2 * * *', datetime(2026, 3, 2, 2, 30), datetime(2026, 3, 3, 2, 30)),
+    ('0 9 * * 1-5', datetime(2026, 3, 7, 12, 0), datetime(2026, 3, 9, 9, 0)),       # Saturday → Monday
+    ('0 0 29 2 *', datetime(2026, 3, 1), datetime(2028, 2, 29)),
+    ('0 8 1 * 0', datetime(2026, 3, 2, 9, 0), datetime(2026, 3, 8, 8, 0)),          # 1st of month OR Sunday
+    ('5,35 8-9 * * 7', datetime(2026, 3, 8, 8, 5), datetime(2026, 3, 8, 8, 35)),
+    ('@hourly', datetime(2026, 12, 31, 23, 59), datetime(2027, 1, 1, 0, 0)),
+])
+def test_cron_next_after(spec, after, expected):
+    assert CronSpec(spec).next_after(after) == expected
+
+
+@pytest.mark.parametrize('spec', ['* * * *', '60 * * * *', '0 24 * * *', '0 0 30 2 *', 'x * * * *'])
+def test_cron_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        CronSpec(spec).next_after(datetime(2026, 1, 1))
+
+
+def test_due_task_runs_once_across_workers():
+    assert tick() == []  # first tick only registers the tasks
+    assert row('every_ten').next_run_at == datetime(2026, 3, 2, 10, 0)
+
+    clock[0] = datetime(2026, 3, 2, 10, 0, 5)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tick())) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(sum(results, [])) == ['every_ten']
+    assert calls == [clock[0]]
+    task = row('every_ten')
+    assert (task.last_status, task.last_message, task.run_count, task.lease_owner) == ('ok', 'call 1', 1, None)
+    assert task.next_run_at == datetime(2026, 3, 2, 10, 10)
+
+    # Missed ticks are run once, not replayed
+    clock[0] = datetime(2026, 3, 2, 10, 47)
+    assert tick() == ['every_ten'] and len(calls) == 2
+    assert row('every_ten').next_run_at == datetime(2026, 3, 2, 10, 50)
+
+
+def test_failure_is_recorded_and_lease_released():
+    clock[0] = datetime(2026, 3, 3, 0, 0, 10)
+    assert 'nightly_fail' in tick()
+    task = row('nightly_fail')
+    assert task.last_status == 'failed' and task.failure_count == 1 and task.lease_owner is None
+    assert 'disk full' in task.last_message and 'Traceback' in task.last_error
+    assert task.next_run_at == datetime(2026, 3, 4, 0, 0)
+
+
+def test_leased_task_is_skipped_and_run_now():
+    with app.app_context():
+        task = db.session.get(ScheduledTask, 'every_ten')
+        task.lease_owner, task.lease_until = 'other-host:1', clock[0] + timedelta(minutes=5)
+        db.session.commit()
+        assert scheduler.run_now('every_ten')
+    before = len(calls)
+    assert 'every_ten' not in tick()  # still leased by another worker
+    clock[0] += timedelta(minutes=6)
+    assert 'every_ten' in tick() and len(calls) == before + 1
+
+
+def test_changed_spec_is_rescheduled():
+    scheduler._tasks['every_ten'] = dict(scheduler._tasks['every_ten'], spec='0 12 * * *',
+                                         cron=CronSpec('0 12 * * *'))
+    with app.app_context():
+        scheduler.sync()
+    task = row('every_ten')
+    assert task.spec == '0 12 * * *' and task.next_run_at.hour == 12
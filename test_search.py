@@ -0,0 +1,103 @@
+"""
+Tests for search (FTS5 and in-memory backends) against a throwaway Flask app
+and SQLite file.
+
+    python -m pytest -q test_search.py
+"""
+
+import os
+import tempfile
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import search
+
+_dir = tempfile.mkdtemp(prefix='aptipro_search_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(_dir, 'search.db')}")
+db = SQLAlchemy(app)
+
+
+class Question(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+    topic = db.Column(db.String(100))
+    explanation = db.Column(db.Text)
+
+
+class Note(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content = db.Column(db.Text)
+
+
+search._kinds.clear()  # drop kinds registered by app.py if another test module imported it
+search._by_code.clear()
+search.init_app(app, db)
+search.register('question', Question, ('text', 'topic', 'explanation'))
+search.register('note', Note, ('content',))
+
+with app.app_context():
+    db.create_all()
+    with db.engine.connect() as conn:
+        assert search.create_indexes(conn)
+    db.session.add_all([
+        Question(text='A train crosses a platform in 20 seconds', topic='Speed',
+                 explanation='Relative speed of the train'),
+        Question(text='Probability of two heads', topic='Probability', explanation='Independent coin tosses'),
+        Question(text='Find the speed of the boat', topic='Boats and Streams'),
+        Note(content='Remember the train question uses relative speed'),
+    ])
+    db.session.commit()
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def backend(request):
+    search._state['backend'] = request.param
+    search._memory.update(index=None, built_at=0.0)
+    with app.app_context():
+        yield request.param
+    search._state['backend'] = None
+
+
+def test_words_match_as_prefixes_and_all_must_match(backend):
+    assert search.query('prob') == [('question', 2)]
+    assert sorted(search.query('spe')) == [('note', 1), ('question', 1), ('question', 3)]
+    assert sorted(search.query('train SPEED!')) == [('note', 1), ('question', 1)]
+    assert search.query('train boat') == []
+    assert search.query('  ?! ') == []
+
+
+def test_kinds_filter(backend):
+    assert search.ids('train', 'question') == [1]
+    assert search.query('train', kinds=['note']) == [('note', 1)]
+    assert search.query('train', kinds=['unknown']) == []
+
+
+def test_orm_writes_keep_the_index_current(backend):
+    search.query('x')  # the memory index is built before the writes
+    q = db.session.get(Question, 3)
+    q.text = 'Downstream speed of a motorboat'
+    db.session.add(Question(id=4, text='Permutations of letters', topic='Combinatorics'))
+    db.session.commit()
+    assert search.ids('motorb', 'question') == [3]
+    assert search.ids('permut', 'question') == [4]
+
+    db.session.delete(db.session.get(Question, 4))
+    db.session.commit()
+    assert search.ids('permut', 'question') == []
+
+    # Bulk deletes skip the mapper events and drop the document explicitly
+    Question.query.filter_by(id=3).delete()
+    search.remove('question', 3)
+    db.session.commit()
+    assert search.ids('motorb', 'question') == []
+    db.session.add(Question(id=3, text='Find the speed of the boat', topic='Boats and Streams'))
+    db.session.commit()
+
+
+def test_sqlite_rebuild_matches_incremental_index(backend):
+    before = sorted(search.query('the'))
+    assert search.rebuild() == 4
+    assert sorted(search.query('the')) == before
@@ -0,0 +1,95 @@
+"""
+Tests for the per-request SQL instrumentation against a throwaway Flask app
+and SQLite file.
+
+    python -m pytest -q test_sql_instrumentation.py
+"""
+
+import json
+import logging
+import os
+import tempfile
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import sql_instrumentation
+
+_dir = tempfile.mkdtemp(prefix='aptipro_sql_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(_dir, 'sql.db')}",
+                  SQL_SLOW_LOG=os.path.join(_dir, 'slow_sql.log'))
+db = SQLAlchemy(app)
+sql_instrumentation.init_app(app, db)
+
+
+@app.route('/three')
+def three():
+    for _ in range(3):
+        db.session.execute(db.text('SELECT 1'))
+    return 'ok'
+
+
+@app.route('/broken')
+def broken():
+    with pytest.raises(Exception):
+        db.session.execute(db.text('SELECT * FROM no_such_table'))
+    db.session.rollback()
+    return json.dumps(db.session.connection().info.get('_sql_t0'))
+
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+@pytest.fixture
+def slow_log():
+    handler = Collect()
+    sql_instrumentation.logger.addHandler(handler)
+    saved = dict(sql_instrumentation._thresholds)
+    yield handler.records
+    sql_instrumentation.logger.removeHandler(handler)
+    sql_instrumentation._thresholds.update(saved)
+
+
+def test_server_timing_and_endpoint_totals():
+    sql_instrumentation.reset()
+    client = app.test_client()
+    for _ in range(2):
+        r = client.get('/three')
+        assert 'desc="3 queries"' in r.headers['Server-Timing']
+        assert 'total;dur=' in r.headers['Server-Timing']
+    report = {row['endpoint']: row for row in sql_instrumentation.endpoint_report()}
+    assert report['three']['requests'] == 2
+    assert report['three']['queries'] == 6 and report['three']['max_queries'] == 3
+    assert report['three']['avg_queries'] == 3
+
+
+def test_slow_log_thresholds(slow_log):
+    client = app.test_client()
+    sql_instrumentation._thresholds.update(query_ms=10 ** 6, request_ms=10 ** 6)
+    client.get('/three')
+    assert slow_log == []
+
+    sql_instrumentation._thresholds.update(query_ms=0)
+    client.get('/three')
+    assert [r['type'] for r in slow_log] == ['slow_query'] * 3
+    assert slow_log[0]['endpoint'] == 'three' and slow_log[0]['sql'] == 'SELECT 1'
+
+    slow_log.clear()
+    sql_instrumentation._thresholds.update(query_ms=10 ** 6, request_ms=0)
+    client.get('/three')
+    assert [(r['type'], r['queries']) for r in slow_log] == [('slow_request', 3)]
+
+
+def test_failed_statements_leave_no_start_times_behind():
+    client = app.test_client()
+    for _ in range(3):
+        assert json.loads(client.get('/broken').data) in (None, [])
+    assert 'desc="3 queries"' in client.get('/three').headers['Server-Timing']
@@ -0,0 +1,103 @@
+"""
+Tests for sqlite_tuning: retry_on_lock and the per-connection pragmas.
+
+    python -m pytest -q test_sqlite_tuning.py
+"""
+
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import sqlite_tuning
+
+
+def operational_error(message):
+    return OperationalError('INSERT INTO answer ...', {}, Exception(message))
+
+
+class Session:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(sqlite_tuning.time, 'sleep', slept.append)
+    return slept
+
+
+def flaky(failures, message='database is locked'):
+    """A function that raises `message` on its first `failures` calls."""
+    calls = []
+
+    def fn(value):
+        calls.append(value)
+        if len(calls) <= failures:
+            raise operational_error(message)
+        return value * 2
+
+    return fn, calls
+
+
+def test_retries_a_locked_database_then_succeeds(sleeps):
+    session = Session()
+    fn, calls = flaky(2)
+    wrapped = sqlite_tuning.retry_on_lock(lambda: session, retries=5, base_ms=10)(fn)
+    assert wrapped(21) == 42
+    assert len(calls) == 3 and session.rollbacks == 2
+    # Exponential backoff with jitter: base * 2^n * [0.5, 1.5)
+    assert 0.005 <= sleeps[0] < 0.015 and 0.01 <= sleeps[1] < 0.03
+
+
+def test_gives_up_after_the_last_retry(sleeps):
+    session = Session()
+    fn, calls = flaky(10, 'database table is locked')
+    wrapped = sqlite_tuning.retry_on_lock(lambda: session, retries=3, base_ms=1)(fn)
+    with pytest.raises(OperationalError, match='locked'):
+        wrapped(1)
+    assert len(calls) == 4 and session.rollbacks == 3 and len(sleeps) == 3
+
+
+@pytest.mark.parametrize('message', ['(1213, Deadlock found when trying to get lock; try restarting transaction)',
+                                     '(1205, Lock wait timeout exceeded; try restarting transaction)',
+                                     'deadlock detected', 'could not serialize access due to concurrent update'])
+def test_server_database_deadlocks_are_retried(sleeps, message):
+    session = Session()
+    fn, calls = flaky(1, message)
+    assert sqlite_tuning.retry_on_lock(lambda: session, retries=2, base_ms=1)(fn)(3) == 6
+    assert len(calls) == 2 and session.rollbacks == 1
+
+
+def test_other_errors_are_raised_at_once(sleeps):
+    session = Session()
+    fn, calls = flaky(1, 'no such table: answer')
+    wrapped = sqlite_tuning.retry_on_lock(lambda: session, retries=5)(fn)
+    with pytest.raises(OperationalError, match='no such table'):
+        wrapped(1)
+    assert len(calls) == 1 and session.rollbacks == 0 and sleeps == []
+
+    def not_operational(value):
+        calls.append(value)
+        raise ValueError('database is locked')
+
+    with pytest.raises(ValueError):
+        sqlite_tuning.retry_on_lock(lambda: session)(not_operational)(1)
+    assert len(calls) == 2
+
+
+def test_connections_get_the_pragma_profile():
+    path = os.path.join(tempfile.mkdtemp(prefix='aptipro_sqlite_'), 'tuned.db')
+    engine = create_engine(f'sqlite:///{path}')
+    settings = dict(sqlite_tuning.DEFAULTS, SQLITE_BUSY_TIMEOUT_MS=1234)
+    assert sqlite_tuning.configure_engine(engine, settings)
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 1234
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
@@ -0,0 +1,114 @@
+"""
+Tests for the submission service (record_submission and /api/submit_answer)
+against app.py on a throwaway SQLite database (see conftest.py).
+
+    python -m pytest -q test_submission_service.py
+"""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import Query
+
+import app as aptipro
+from app import Answer, Attempt, Question, db, record_submission
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+
+def attempt_of(user, question):
+    return Attempt.query.filter_by(student_id=user.id, question_id=question.id).one()
+
+
+def test_counter_numbers_every_submission(make_student, make_question):
+    user, question = make_student(), make_question()
+    results = [record_submission(user, question.id, option) for option in 'ABB']
+    assert [r['attempt_number'] for r in results] == [1, 2, 3]
+    assert [r['is_correct'] for r in results] == [False, True, True]
+    attempt = attempt_of(user, question)
+    assert attempt.submission_count == 3
+    assert attempt.start_time is None  # answered without being started
+    assert [a.attempt_number for a in Answer.query.filter_by(student_id=user.id).order_by(Answer.id)] == [1, 2, 3]
+
+
+def test_counter_increments_in_sql_not_from_the_loaded_row(make_student, make_question):
+    user, question = make_student(), make_question()
+    record_submission(user, question.id, 'A')
+    stale = attempt_of(user, question)  # another request bumps the row after this one loaded it
+    db.session.execute(db.update(Attempt).where(Attempt.id == stale.id).values(submission_count=5))
+    assert aptipro._next_attempt_number(stale) == 6
+
+
+def test_legacy_null_counter_starts_from_the_answer_count(make_student, make_question):
+    user, question = make_student(), make_question()
+    db.session.add_all([Answer(student_id=user.id, question_id=question.id, selected_option='A', attempt_number=n)
+                        for n in (1, 2)])
+    db.session.execute(db.insert(Attempt).values(student_id=user.id, question_id=question.id,
+                                                 start_time=aptipro.get_now_ist(), submission_count=db.null()))
+    db.session.commit()
+    assert record_submission(user, question.id, 'B')['attempt_number'] == 3
+    assert attempt_of(user, question).submission_count == 3
+
+
+def test_a_timed_question_never_started_does_not_expire(make_student, make_question, monkeypatch):
+    user, question = make_student(), make_question(timer_minutes=5)
+    assert record_submission(user, question.id, 'A')['status'] == 'submitted'
+    later = aptipro.get_now_ist() + timedelta(hours=2)
+    monkeypatch.setattr(aptipro, 'get_now_ist', lambda: later)
+    result = record_submission(user, question.id, 'B')
+    assert result['status'] == 'submitted' and result['time_taken_sec'] == 0
+    assert result['attempt_number'] == 2
+
+
+def test_a_started_timed_question_expires(make_student, make_question, monkeypatch):
+    user, question = make_student(), make_question(timer_minutes=5)
+    db.session.add(Attempt(student_id=user.id, question_id=question.id, start_time=aptipro.get_now_ist(),
+                           submission_count=0))
+    db.session.commit()
+    later = aptipro.get_now_ist() + timedelta(minutes=10)
+    monkeypatch.setattr(aptipro, 'get_now_ist', lambda: later)
+    result = record_submission(user, question.id, 'B')
+    assert result['status'] == 'expired' and result['attempt_number'] == 1
+
+
+@pytest.mark.parametrize('dialect', ['sqlite', 'mysql'])
+def test_only_the_question_row_is_share_locked(make_student, make_question, monkeypatch, dialect):
+    """MySQL has no FOR SHARE OF, so there the question is locked on its own, never the attempt."""
+    locks = []
+    with_for_update = Query.with_for_update
+
+    def spy(query, **kw):
+        locks.append(([d['entity'] for d in query.column_descriptions], kw))
+        return with_for_update(query, **kw)
+
+    monkeypatch.setattr(Query, 'with_for_update', spy)
+    monkeypatch.setattr(db.engine.dialect, 'name', dialect)
+    user, question = make_student(), make_question()
+    record_submission(user, question.id, 'A')
+    assert record_submission(user, question.id, 'B')['attempt_number'] == 2
+    if dialect == 'mysql':
+        assert locks == [([Question], {'read': True})] * 2
+    else:
+        assert locks == [([Question, Attempt], {'read': True, 'of': Question})] * 2
+
+
+def test_json_endpoint(make_student, make_question, login):
+    user, question = make_student(), make_question()
+    client = login(user)
+
+    r = client.post('/api/submit_answer', data={'question_id': question.id, 'selected_option': 'B'})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body['status'] == 'submitted' and body['is_correct'] is True and body['attempt_number'] == 1
+    r = client.post('/api/submit_answer', data={'question_id': question.id, 'selected_option': 'A'})
+    assert r.get_json()['attempt_number'] == 2
+
+    assert client.post('/api/submit_answer', data={'question_id': question.id}).status_code == 400
+    r = client.post('/api/submit_answer', data={'question_id': 10 ** 9, 'selected_option': 'A'})
+    assert r.status_code == 404 and r.get_json()['status'] == 'not_found'
+
+    # Starting it afterwards starts the timer from now
+    r = client.post('/student/start_attempt', json={'question_id': question.id})
+    assert r.get_json()['start_time'] > 0
+    db.session.expire_all()
+    assert attempt_of(user, question).start_time is not None
@@ -0,0 +1,114 @@
+"""
+Tests for the admin submissions view query (keyset cursor and facet
+counts) against app.py on a throwaway SQLite database (see conftest.py).
+
+    python -m pytest -q test_submissions_query.py
+"""
+
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as aptipro
+from app import Answer, Subject, db, query_submissions
+
+pytestmark = pytest.mark.usefixtures('app_state')
+
+DAY = datetime(2026, 3, 2, 9, 0)
+
+
+@pytest.fixture(autouse=True)
+def facet_cache():
+    aptipro._facet_cache.clear()
+    yield
+    aptipro._facet_cache.clear()
+
+
+def answer(user, question, submitted_at, option='A', **extra):
+    """Insert through Core so a None submitted_at stays NULL instead of taking the column default."""
+    return db.session.execute(db.insert(Answer).values(
+        student_id=user.id, question_id=question.id, selected_option=option, is_correct=option == 'A',
+        submitted_at=submitted_at if submitted_at else db.null(), **extra)).inserted_primary_key[0]
+
+
+def walk(filters, limit):
+    """Every page's answer ids, following the cursor."""
+    pages, cursor = [], None
+    while True:
+        page = query_submissions(filters, cursor, limit=limit, with_facets=False)
+        pages.append([item['id'] for item in page['items']])
+        cursor = page['next']
+        if not cursor:
+            return pages
+
+
+def test_cursor_pages_through_legacy_answers_without_a_date(make_student, make_question):
+    user, question = make_student(), make_question()
+    dated = [answer(user, question, DAY + timedelta(minutes=m)) for m in (0, 5, 5, 9)]
+    undated = [answer(user, question, None) for _ in range(3)]
+    db.session.commit()
+
+    expected = [dated[3], dated[2], dated[1], dated[0]] + undated[::-1]  # SQLite sorts NULL last in DESC
+    for limit in (1, 2, 3, 50):
+        pages = walk({'student': user.id}, limit)
+        assert list(itertools.chain(*pages)) == expected, limit
+
+
+@pytest.mark.parametrize('nulls_first', [False, True])
+def test_after_cursor_follows_where_the_database_sorts_nulls(make_student, make_question, nulls_first):
+    user, question = make_student(), make_question()
+    dated = [answer(user, question, DAY + timedelta(minutes=m)) for m in (0, 5)]
+    undated = [answer(user, question, None) for _ in range(2)]
+    db.session.commit()
+    rows = db.session.query(Answer.id, Answer.submitted_at).filter(Answer.student_id == user.id).all()
+    # submitted_at DESC, id DESC, with the NULL stamps first or last
+    rows.sort(key=lambda r: ((r.submitted_at is None) == nulls_first, r.submitted_at or datetime.min, r.id),
+              reverse=True)
+    assert [i for i, _ in rows] == (undated[::-1] + dated[::-1] if nulls_first else dated[::-1] + undated[::-1])
+
+    # After each row, the cursor must select exactly the rows that follow it
+    for n, (last_id, last_stamp) in enumerate(rows):
+        after = db.session.query(Answer.id).filter(
+            Answer.student_id == user.id, aptipro._after_cursor(last_stamp, last_id, nulls_first)).all()
+        assert sorted(i for (i,) in after) == sorted(i for i, _ in rows[n + 1:])
+
+
+def test_api_cursor_round_trip(make_student, make_question, login):
+    user, question = make_student(), make_question()
+    ids = [answer(user, question, None) for _ in range(3)]
+    db.session.commit()
+    client = login(make_student(role='admin'))
+
+    body = client.get(f'/api/submissions?student={user.id}&limit=2&facets=0').get_json()
+    assert [item['id'] for item in body['items']] == [ids[2], ids[1]]
+    assert body['items'][0]['submitted_at'] is None
+    body = client.get(f"/api/submissions?student={user.id}&limit=2&facets=0&after={body['next']}").get_json()
+    assert [item['id'] for item in body['items']] == [ids[0]] and body['next'] is None
+
+
+def test_facets_count_subjects_from_the_grouped_query(make_student, make_question):
+    user = make_student()
+    subject = Subject(name=f'Query subject {user.id}')
+    db.session.add(subject)
+    db.session.commit()
+    algebra, loose = make_question(subject_id=subject.id), make_question()
+    answer(user, algebra, DAY, 'A')
+    answer(user, algebra, DAY, 'B', file_path='upload.png')
+    answer(user, algebra, DAY, 'A', is_expired=True)
+    answer(user, loose, DAY, 'B')
+    db.session.commit()
+
+    facets = query_submissions({'student': user.id})['facets']
+    assert facets['total'] == 4
+    assert {f['id']: f['count'] for f in facets['question']} == {algebra.id: 3, loose.id: 1}
+    assert facets['subject'] == [{'id': subject.id, 'label': subject.name, 'count': 3}]
+    assert facets['outcome'] == {'correct': 1, 'incorrect': 2, 'expired': 1, 'suspicious': 0}
+    assert facets['has_file'] == {'yes': 1, 'no': 3}
+
+    # Each facet counts with every other filter applied
+    facets = query_submissions({'student': user.id, 'subject': subject.id, 'outcome': 'incorrect'})['facets']
+    assert facets['total'] == 1
+    assert {f['id']: f['count'] for f in facets['question']} == {algebra.id: 1}
+    assert facets['subject'] == [{'id': subject.id, 'label': subject.name, 'count': 1}]
+    assert facets['outcome']['incorrect'] == 1 and facets['outcome']['expired'] == 1
@@ -0,0 +1,128 @@
+"""
+Tests for the ETag version counters against a throwaway Flask app and
+SQLite file.
+
+    python -m pytest -q test_versions.py
+"""
+
+import os
+import tempfile
+
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+
+import versions
+
+_dir = tempfile.mkdtemp(prefix='aptipro_versions_')
+app = Flask(__name__, instance_path=_dir)
+app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(_dir, 'versions.db')}",
+                  VERSION_CACHE_SECONDS=60)
+db = SQLAlchemy(app)
+
+
+class Owner(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    data_version = db.Column(db.Integer, default=0)
+
+
+class Item(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('owner.id'))
+    value = db.Column(db.Integer)
+
+
+class Shared(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50))
+
+
+class Meta(db.Model):
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(200))
+
+
+versions.init_app(app, db, Meta)
+versions.track_owner(Item, 'owner_id', Owner, 'data_version')
+versions.track_content(Shared)
+
+with app.app_context():
+    db.create_all()
+    db.session.add_all([Owner(id=1), Owner(id=2)])
+    db.session.commit()
+
+
+@app.route('/thing')
+def thing():
+    tag = versions.etag('t', versions.content_version())
+    if versions.matches(tag):
+        return versions.not_modified(tag)
+    response = jsonify(ok=True)
+    response.set_etag(tag)
+    return response
+
+
+def owner_version(owner_id):
+    return db.session.get(Owner, owner_id, populate_existing=True).data_version
+
+
+def test_writes_bump_their_owner_once_per_flush():
+    with app.app_context():
+        before = owner_version(1), owner_version(2)
+        db.session.add_all([Item(owner_id=1, value=1), Item(owner_id=1, value=2)])
+        db.session.commit()
+        assert (owner_version(1), owner_version(2)) == (before[0] + 1, before[1])
+
+        item = Item.query.filter_by(owner_id=1).first()
+        item.value = item.value  # no net change: no bump
+        db.session.commit()
+        assert owner_version(1) == before[0] + 1
+
+        other = Item.query.filter_by(owner_id=1, value=2).one()
+        item.value = 99
+        db.session.delete(other)
+        db.session.commit()
+        assert owner_version(1) == before[0] + 2
+
+        versions.bump_owners(db.session, Owner, [2], 'data_version')
+        db.session.commit()
+        assert owner_version(2) == before[1] + 1
+
+
+def test_rolled_back_writes_do_not_bump():
+    with app.app_context():
+        before = owner_version(2)
+        db.session.add(Item(owner_id=2, value=1))
+        db.session.flush()
+        db.session.rollback()
+        assert owner_version(2) == before
+
+
+def test_content_counter_is_cached_and_refreshed_by_local_commits():
+    with app.app_context():
+        first = versions.content_version()
+        db.session.add(Shared(name='a'))
+        db.session.commit()
+        second = versions.content_version()
+        assert int(second) == int(first) + 1
+
+        # Another process's bump is only seen once the cache expires
+        with db.engine.begin() as conn:
+            versions._write_content(conn)
+        assert versions.content_version() == second
+        versions._content['read_at'] -= 61
+        assert int(versions.content_version()) == int(second) + 1
+
+        versions.bump_content(db.session)
+        db.session.commit()
+        assert int(versions.content_version()) == int(second) + 2
+
+
+def test_matching_etag_revalidates_even_when_weakened():
+    client = app.test_client()
+    r = client.get('/thing')
+    tag = r.headers['ETag']
+    assert r.status_code == 200 and not tag.startswith('W/')
+    assert client.get('/thing', headers={'If-None-Match': tag}).status_code == 304
+    assert client.get('/thing', headers={'If-None-Match': 'W/' + tag}).status_code == 304
+    assert client.get('/thing', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert versions.etag('v1', 5, None, '20261019') == 'v1-5-0-20261019'
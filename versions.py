@@ -0,0 +1,189 @@
+"""
+versions.py — version counters that let JSON endpoints answer 304 Not
+Modified without querying the data behind them.
+
+Two kinds of counter:
+
+  owner    an integer column on the row that owns the data (User.data_version
+           for a student's answers and attempts). Any insert, update or
+           delete of a tracked row bumps its owner's counter inside the same
+           transaction, once per owner and flush. Views usually have the
+           owner loaded already (current_user), so reading it is free.
+  content  one shared counter in the key/value table, bumped by writes to
+           shared rows (questions, meet links, the classroom). Each process
+           caches it for VERSION_CACHE_SECONDS, so another worker's change
+           shows up within that long; the process that made the change
+           drops its copy on commit.
+
+    versions.init_app(app, db, SchemaMeta)
+    versions.track_owner(Answer, 'student_id', User, 'data_version')
+    versions.track_content(Question, MeetLink)
+
+    tag = versions.etag('dash', user.id, user.data_version, versions.content_version())
+    if versions.matches(tag):
+        return versions.not_modified(tag)
+
+Bulk Query.update()/delete() calls skip the mapper events, so callers that
+use them call bump_owners() / bump_content() before committing.
+"""
+
+import time
+
+from flask import current_app, request
+from sqlalchemy import Integer, String, cast, event, func, inspect, insert, select, update
+from sqlalchemy.orm import object_session
+
+CONTENT_KEY = 'content_version'
+
+_state = {'db': None, 'meta': None, 'ttl': 5.0, 'on_cache': None}
+_content = {'value': None, 'read_at': 0.0}
+_PENDING_OWNERS = 'versions.owners'
+_PENDING_CONTENT = 'versions.content'
+_BUMPED_CONTENT = 'versions.content_bumped'
+
+
+def _pending(session):
+    return session.info.setdefault(_PENDING_OWNERS, set())
+
+
+def track_owner(model, foreign_key, owner, column):
+    """Bump owner.<column> whenever a `model` row whose `foreign_key` points at it is written."""
+    table = owner.__table__
+    pk = inspect(owner).primary_key[0].name
+
+    def record(mapper, connection, target):
+        session = object_session(target)
+        owner_id = getattr(target, foreign_key)
+        if session is not None and owner_id is not None:
+            _pending(session).add((table, pk, column, owner_id))
+
+    def record_update(mapper, connection, target):
+        # after_update also fires for dirty rows that ended up with no changes
+        session = object_session(target)
+        if session is not None and session.is_modified(target, include_collections=False):
+            record(mapper, connection, target)
+
+    event.listen(model, 'after_insert', record)
+    event.listen(model, 'after_update', record_update)
+    event.listen(model, 'after_delete', record)
+
+
+def track_content(*models):
+    """Bump the shared content counter whenever a row of one of `models` is written."""
+    def record(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info[_PENDING_CONTENT] = True
+
+    def record_update(mapper, connection, target):
+        session = object_session(target)
+        if session is not None and session.is_modified(target, include_collections=False):
+            session.info[_PENDING_CONTENT] = True
+
+    for model in models:
+        event.listen(model, 'after_insert', record)
+        event.listen(model, 'after_update', record_update)
+        event.listen(model, 'after_delete', record)
+
+
+def _increment(column):
+    return func.coalesce(column, 0) + 1
+
+
+def bump_owners(session, owner, ids, column):
+    """Bump owner.<column> for `ids` in the session's transaction (for bulk updates)."""
+    pk = inspect(owner).primary_key[0].name
+    for owner_id in ids:
+        _pending(session).add((owner.__table__, pk, column, owner_id))
+    _flush_owners(session)
+
+
+def bump_content(session):
+    """Bump the shared content counter in the session's transaction (for bulk updates)."""
+    _write_content(session.connection())
+    session.info[_BUMPED_CONTENT] = True
+
+
+def _flush_owners(session):
+    pending = session.info.pop(_PENDING_OWNERS, None)
+    if not pending:
+        return
+    grouped = {}
+    for table, pk, column, owner_id in pending:
+        grouped.setdefault((table, pk, column), set()).add(owner_id)
+    connection = session.connection()
+    for (table, pk, column), ids in grouped.items():
+        connection.execute(update(table).where(table.c[pk].in_(sorted(ids)))
+                           .values({column: _increment(table.c[column])}))
+
+
+def _write_content(connection):
+    meta = _state['meta'].__table__
+    bumped = connection.execute(
+        update(meta).where(meta.c.key == CONTENT_KEY)
+        .values(value=cast(cast(func.coalesce(meta.c.value, '0'), Integer) + 1, String)))
+    if bumped.rowcount == 0:
+        connection.execute(insert(meta).values(key=CONTENT_KEY, value='1'))
+
+
+def _after_flush(session, flush_context):
+    _flush_owners(session)
+    if session.info.pop(_PENDING_CONTENT, False) and _state['meta'] is not None:
+        _write_content(session.connection())
+        session.info[_BUMPED_CONTENT] = True
+
+
+def _after_commit(session):
+    if session.info.pop(_BUMPED_CONTENT, False):
+        _content['value'] = None
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_OWNERS, None)
+    session.info.pop(_PENDING_CONTENT, None)
+    session.info.pop(_BUMPED_CONTENT, None)
+
+
+def content_version():
+    """The shared content counter, cached per process for VERSION_CACHE_SECONDS."""
+    now = time.monotonic()
+    hit = _content['value'] is not None and now - _content['read_at'] <= _state['ttl']
+    if not hit:
+        meta = _state['meta'].__table__
+        value = _state['db'].session.execute(
+            select(meta.c.value).where(meta.c.key == CONTENT_KEY)).scalar()
+        _content.update(value=value or '0', read_at=now)
+    if _state['on_cache']:
+        _state['on_cache']('content_version', hit)
+    return _content['value']
+
+
+def etag(*parts):
+    """Strong ETag value (unquoted) from version parts."""
+    return '-'.join(str(part if part is not None else 0) for part in parts)
+
+
+def matches(tag):
+    """True if the request's If-None-Match names `tag`. Compression weakens ETags, so W/ is ignored."""
+    return request.if_none_match.contains_weak(tag)
+
+
+def not_modified(tag):
+    response = current_app.response_class(status=304)
+    response.set_etag(tag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def init_app(app, db, meta_model, on_cache=None):
+    """
+    Register the session hooks. `meta_model` is the key/value table with
+    key/value columns; `on_cache(name, hit)` is called per content_version() lookup.
+    """
+    app.config.setdefault('VERSION_CACHE_SECONDS', 5)
+    _state.update(db=db, meta=meta_model, ttl=float(app.config['VERSION_CACHE_SECONDS']), on_cache=on_cache)
+    _content.update(value=None, read_at=0.0)
+    for name, fn in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                     ('after_rollback', _after_rollback)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
@@ -0,0 +1,71 @@
+"""
+worker.py — run background jobs (see job_queue.py) in dedicated processes.
+
+    python worker.py                  # one worker process
+    python worker.py --processes 4    # four, e.g. for several large exports at once
+    python worker.py --drain          # run every job that is due now, then exit
+    python worker.py --scheduler      # also run the periodic tasks (scheduler.py)
+
+By default each web process also runs JOB_INLINE_WORKERS job threads. When
+you run worker.py alongside gunicorn, set JOB_INLINE_WORKERS=0 for the web
+service so exports never compete with requests for the web workers' CPU.
+Likewise, with --scheduler you can set SCHEDULER_ENABLED=false for the web
+service; the lease in scheduled_task keeps each tick to one process either way.
+
+SIGTERM / Ctrl-C lets the current job finish, then the worker exits. A
+worker that is killed outright loses its lease after JOB_LEASE_SECONDS and
+its job is picked up again by another worker.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+
+def run(drain=False, with_scheduler=False):
+    from app import app  # noqa: F401 — registers the models, job handlers and scheduled tasks
+    import job_queue
+    import scheduler
+
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    if with_scheduler and not drain:
+        threading.Thread(target=scheduler.run_forever, args=(stop,), name='scheduler', daemon=True).start()
+    print(f"  [JOBS] Worker {name} started")
+    job_queue.work(worker_id=name, stop=stop, once=drain)
+    print(f"  [JOBS] Worker {name} stopped")
+
+
+def main():
+    p = argparse.ArgumentParser(description="AptitudePro background job worker")
+    p.add_argument('--processes', type=int, default=1)
+    p.add_argument('--drain', action='store_true', help="exit once no job is due")
+    p.add_argument('--scheduler', action='store_true', help="also run the periodic tasks")
+    opts = p.parse_args()
+
+    if opts.processes <= 1:
+        run(opts.drain, opts.scheduler)
+        return
+
+    procs = [multiprocessing.Process(target=run, args=(opts.drain, opts.scheduler and i == 0))
+             for i in range(opts.processes)]
+    for proc in procs:
+        proc.start()
+
+    def forward(*_):
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()  # SIGTERM: finish the current job, then exit
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # children get Ctrl-C from the terminal themselves
+    for proc in procs:
+        proc.join()
+
+
+if __name__ == '__main__':
+    main()